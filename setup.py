@@ -27,8 +27,9 @@ setuptools.setup(
     author='Eric Anderton',
     author_email='eric.t.anderton@gmail.com',
     url='http://github.com/eanderton/xcomp',
-    packages=['xcomp'],
+    packages=['xcomp', 'xcomp.benchmarks'],
     test_suite='tests',
+    python_requires='>=3.9',
     install_requires=[
         'ansicolors',
         'cbmcodecs',
@@ -53,6 +54,7 @@ setuptools.setup(
     entry_points={
         'console_scripts': [
             'xcomp=xcomp.cli:main',
+            'xcomp-bench=xcomp.benchmarks.cli:main',
         ],
     },
     license='MIT License',
@@ -64,5 +66,5 @@ setuptools.setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
     ])
@@ -0,0 +1,33 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import tempfile
+import unittest
+
+
+class FileTestCase(unittest.TestCase):
+    '''Base for tests of files on disk.  Each test gets its own temporary
+       directory, self.path, which is removed after tearDown.'''
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = tmpdir.name
+
+    def write(self, name, data='nop', mtime=None):
+        """Writes text or bytes to name, relative to self.path, and returns
+        its full path.  Directories are created as needed.  If mtime is set,
+        the file's times are set to it, in nanoseconds."""
+        filename = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(filename, ns=(mtime, mtime))
+        return filename
+
+    def read(self, name, mode='rb'):
+        with open(os.path.join(self.path, name), mode) as f:
+            return f.read()
@@ -0,0 +1,75 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+from inspect import cleandoc
+from filetest import FileTestCase
+from xcomp.batch import BatchCompiler
+from xcomp.batch import BatchSource
+from xcomp.batch import compile_batch
+
+
+class BatchCompilerTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write('lib.asm', '.def value $CA')
+
+    def sources(self, count):
+        return [(f'src{ii}.asm', cleandoc(f"""
+            .include "lib.asm"
+            .text $1000
+            start{ii}:
+                lda #value
+                ldx #{ii}
+            """)) for ii in range(count)]
+
+    def test_batch(self):
+        batch = BatchCompiler([self.path], ['text'])
+        results = list(batch.compile(self.sources(3)))
+        self.assertEqual([x.name for x in results],
+                ['src0.asm', 'src1.asm', 'src2.asm'])
+        for ii, result in enumerate(results):
+            self.assertIsNone(result.error)
+            self.assertEqual((result.start, result.end), (0x1000, 0x1004))
+            self.assertEqual(result.data, bytes([0xA9, 0xCA, 0xA2, ii]))
+            self.assertEqual(result.map, {f'start{ii}': 0x1000})
+
+        # include parsed once, images reused and cleared
+        self.assertEqual(batch.ast_cache.misses, 4)
+        self.assertEqual(len(batch.pool.images), 1)
+        self.assertEqual(batch.pool.images[0], bytearray(0xFFFF))
+
+    def test_error(self):
+        batch = BatchCompiler([self.path], ['text'])
+        results = list(batch.compile([
+            BatchSource('bad.asm', 'jmp nowhere'),
+            BatchSource('good.asm', '.text $1000\nnop'),
+        ]))
+        self.assertIsNotNone(results[0].error)
+        self.assertIsNone(results[1].error)
+        self.assertEqual(results[1].data, b'\xEA')
+
+    def test_struct_init_cleared(self):
+        # initialized struct fields write outside of every segment
+        batch = BatchCompiler([self.path], ['text'])
+        results = list(batch.compile([
+            BatchSource('struct.asm', '.struct foo $C000\n.var x word, $AA\n.end'),
+            BatchSource('dim.asm', '.text $C000\n.dim 2\nnop'),
+        ]))
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].data, bytes([0x00, 0x00, 0xEA]))
+        self.assertEqual(batch.pool.images[0], bytearray(0xFFFF))
+
+    def test_disk_source(self):
+        self.write('main.asm', cleandoc("""
+        .include "lib.asm"
+        .text $1000
+        .byte value
+        """))
+        result, = compile_batch(['main.asm'], [self.path], ['text'])
+        self.assertEqual(result.data, b'\xCA')
+
+    def test_workers(self):
+        results = list(compile_batch(self.sources(4), [self.path],
+                ['text'], workers=2))
+        self.assertEqual([x.data[-1] for x in results], [0, 1, 2, 3])
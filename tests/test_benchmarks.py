@@ -0,0 +1,87 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import unittest
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.benchmarks.generator import ROOT
+from xcomp.benchmarks.generator import BANK_SIZE
+from xcomp.benchmarks.generator import DATA_START
+from xcomp.benchmarks.generator import TABLE_SIZE
+from xcomp.benchmarks.generator import generate
+from xcomp.benchmarks.generator import line_count
+from xcomp.benchmarks.suite import PHASES
+from xcomp.benchmarks.suite import run_benchmark
+from xcomp.benchmarks.compare import mann_whitney
+from xcomp.benchmarks.compare import compare
+from xcomp.benchmarks.compare import REGRESSED
+from xcomp.benchmarks.compare import UNCHANGED
+
+
+class GeneratorTest(unittest.TestCase):
+    def test_generate(self):
+        files = generate(200, depth=3)
+        self.assertEqual(set(files), {ROOT, 'lib0.asm', 'lib1.asm', 'lib2.asm'})
+        self.assertGreaterEqual(line_count(files), 200)
+        self.assertLess(line_count(files), 230)
+
+        ctx_manager = FileContextManager()
+        ctx_manager.files.update(files)
+        compiler = Compiler(ctx_manager)
+        compiler.compile_file(ROOT)
+        self.assertEqual(compiler.preprocessor.stats['includes_deduplicated'], 1)
+        self.assertGreater(compiler.preprocessor.stats['macro_expansions'], 0)
+        self.assertGreater(compiler.stats['fixup_retries'], 0)
+
+    def test_generate_banks(self):
+        files = generate(200, bank_size=2)
+        banks = files[ROOT].split(f'.data ${DATA_START:04x}')[1:]
+        self.assertGreater(len(banks), 1)
+        for bank in banks[:-1]:
+            self.assertEqual(bank.count('\ntable'), 2)
+
+    def test_bank_size(self):
+        # a full bank of tables ends within the 64K image
+        self.assertLessEqual(DATA_START + BANK_SIZE * TABLE_SIZE - 1, 0xFFFF)
+
+
+class SuiteTest(unittest.TestCase):
+    def test_run_benchmark(self):
+        results = run_benchmark(100, samples=2)
+        self.assertEqual(list(results['phases']), PHASES)
+        for phase in results['phases'].values():
+            self.assertEqual(len(phase['samples']), 2)
+            self.assertGreater(phase['lines_per_sec'], 0)
+            self.assertGreater(phase['peak_memory'], 0)
+
+
+class CompareTest(unittest.TestCase):
+    def result(self, samples, memory=1000):
+        return {'benchmarks': {'synthetic-100': {'size': 100, 'phases': {
+            'parse': {'samples': samples, 'peak_memory': memory},
+        }}}}
+
+    def test_mann_whitney(self):
+        self.assertAlmostEqual(mann_whitney([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]),
+                2 / 252)
+        self.assertEqual(mann_whitney([1, 3, 5], [2, 4, 6]), 0.7)
+        self.assertLess(mann_whitney([1, 1, 2, 2, 3] * 4, [3, 4, 4, 5, 5] * 4), 0.001)
+        self.assertEqual(mann_whitney([1, 1], [1, 1]), 1.0)
+
+    def test_compare(self):
+        baseline = self.result([1.0, 1.01, 0.99, 1.02, 0.98])
+        slower = self.result([1.2, 1.21, 1.19, 1.22, 1.18], memory=1200)
+        time, memory = compare(baseline, slower)
+        self.assertEqual((time.metric, time.status), ('time', REGRESSED))
+        self.assertAlmostEqual(time.change, 0.2)
+        self.assertEqual((memory.metric, memory.status), ('memory', REGRESSED))
+
+        time, memory = compare(baseline, baseline)
+        self.assertEqual(time.status, UNCHANGED)
+        self.assertEqual(memory.status, UNCHANGED)
+
+        # significant, but within the threshold
+        close = self.result([1.03, 1.04, 1.035, 1.045, 1.032])
+        time, _ = compare(baseline, close, threshold=0.05)
+        self.assertEqual(time.status, UNCHANGED)
@@ -0,0 +1,106 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import pickle
+from inspect import cleandoc
+from filetest import FileTestCase
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.cache import BuildCache
+
+
+class BuildCacheTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = BuildCache(os.path.join(self.path, 'cache'))
+        self.files = {}
+
+    def set_file(self, name, text):
+        self.files[name] = cleandoc(text)
+
+    def compile(self, name, **kwargs):
+        ctx_manager = FileContextManager()
+        ctx_manager.files.update(self.files)
+        compiler = Compiler(ctx_manager)
+        compiler.compile_file(name, cache=self.cache, **kwargs)
+        return compiler
+
+    def test_hit(self):
+        self.set_file('root.asm', """
+        .include "lib.asm"
+        .text $1000
+        foo:
+            nop
+        """)
+        self.set_file('lib.asm', """
+        .data $0200
+        .byte $CA, $FE
+        """)
+        first = self.compile('root.asm')
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+
+        second = self.compile('root.asm')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.map, {'foo': 0x1000})
+        self.assertEqual(second.get_extents(['data', 'text']), (0x0200, 0x1001))
+
+    def test_include_changed(self):
+        self.set_file('root.asm', """
+        .include "lib.asm"
+        """)
+        self.set_file('lib.asm', """
+        .data $0200
+        .byte $CA
+        """)
+        self.compile('root.asm')
+        self.set_file('lib.asm', """
+        .data $0200
+        .byte $FE
+        """)
+        compiler = self.compile('root.asm')
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.assertEqual(compiler.data[0x0200], 0xFE)
+
+    def test_options(self):
+        self.set_file('root.asm', """
+        nop
+        """)
+        self.compile('root.asm', options={'foo': 1})
+        self.compile('root.asm', options={'foo': 2})
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+    def test_corrupt_entry(self):
+        self.set_file('root.asm', """
+        .text $1000
+        nop
+        """)
+        self.compile('root.asm')
+        filename, = [os.path.join(self.cache.path, x) for x in os.listdir(self.cache.path)]
+        bad_entries = [
+            b'\x80\x04cno_such_module\nEntry\n.',  # stale layout: ImportError
+            pickle.dumps({'data': b''}),             # not an entry
+            b'\x80\x04K\x01K\x02\x86R.',           # cannot be called
+        ]
+        for ii, data in enumerate(bad_entries):
+            with open(filename, 'wb') as f:
+                f.write(data)
+            key = self.cache.get_key('root.asm', FileContextManager())
+            self.assertIsNone(self.cache.lookup(key, FileContextManager()))
+            self.assertFalse(os.path.exists(filename))
+
+            compiler = self.compile('root.asm')
+            self.assertEqual(compiler.data[0x1000], 0xEA)
+            self.assertEqual(self.cache.misses, 2 * ii + 3)
+        self.compile('root.asm')
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_eviction(self):
+        self.cache.max_size = 1
+        self.set_file('root.asm', """
+        nop
+        """)
+        self.compile('root.asm')
+        self.assertEqual(os.listdir(self.cache.path), [])
@@ -0,0 +1,45 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import unittest
+
+# prints the xcomp and third-party modules loaded by running argv
+SCRIPT = """
+import sys, json
+from xcomp.cli import Application
+Application().run(sys.argv[1:])
+print(json.dumps(sorted(x for x in sys.modules
+        if x.startswith(('xcomp.', 'colors', 'parsimonious', 'attr')))))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StartupTest(unittest.TestCase):
+    def modules(self, *argv):
+        with tempfile.TemporaryDirectory() as path:
+            with open(os.path.join(path, 'main.asm'), 'w') as f:
+                f.write('.text $0800\nnop\n')
+            env = dict(os.environ, PYTHONPATH=ROOT)
+            result = subprocess.run([sys.executable, '-c', SCRIPT] + list(argv),
+                    cwd=path, env=env, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_import(self):
+        modules = self.modules('find', 'none.asm')
+        self.assertNotIn('xcomp.printer', modules)
+        self.assertNotIn('colors', modules)
+        self.assertNotIn('parsimonious', modules)
+
+    def test_compile(self):
+        # a successful compile prints nothing, so needs no printer
+        modules = self.modules('compile', 'main.asm', '-o', 'main.bin')
+        self.assertIn('xcomp.compiler', modules)
+        self.assertNotIn('xcomp.printer', modules)
+        self.assertNotIn('colors', modules)
@@ -6,6 +6,8 @@ import logging
 import unittest
 import hexdump
 import io
+import os
+import tempfile
 from inspect import cleandoc
 from xcomp.compiler_base import FileContextManager
 from xcomp.compiler_base import CompilationError
@@ -13,6 +15,7 @@ from xcomp.preprocessor import PreProcessor
 from xcomp.compiler import SegmentData
 from xcomp.compiler import Compiler
 from xcomp.decompiler import ModelPrinter
+from xcomp.output import get_binary
 from xcomp.parser import Parser
 from xcomp.model import *
 
@@ -29,8 +32,9 @@ class TestBase(unittest.TestCase):
     def set_file(self, name, text):
         print(type(text))
         if isinstance(text, str):
-            text = cleandoc(text)
-        self.ctx_manager.files[name] = text
+            self.ctx_manager.files[name] = cleandoc(text)
+        else:
+            self.ctx_manager.binaries[name] = text
 
     def assertAstEqual(self, ast, ast_text):
         buf = io.StringIO()
@@ -104,6 +108,67 @@ class PreprocessorTest(TestBase):
             nop
         """)
 
+    def test_include_once(self):
+        self.set_file('root.asm',"""
+        .include "macros.asm"
+        .include "macros.asm"
+        foo
+        .include "macros.asm"
+        """)
+        self.set_file('macros.asm',"""
+        .once
+        .macro foo
+        nop
+        .end
+        """)
+        self.assertAstEqual(self.parse('root.asm'), """
+        ; <<internal>>
+        .scope
+        ; <macros.asm>
+            nop
+        ; <<internal>>
+        .end
+        """)
+        self.assertEqual(self.processor.stats, {
+            'includes': 1,
+            'includes_deduplicated': 2,
+            'macro_expansions': 1,
+            'sections_skipped': 0,
+        })
+
+    def test_include_once_path(self):
+        with tempfile.TemporaryDirectory() as path:
+            os.mkdir(os.path.join(path, 'sub'))
+            with open(os.path.join(path, 'sub', 'macros.asm'), 'w') as f:
+                f.write('.once\n.macro foo\nnop\n.end\n')
+            with open(os.path.join(path, 'root.asm'), 'w') as f:
+                f.write('.include "sub/macros.asm"\n'
+                        '.include "sub/../sub/macros.asm"\n'
+                        '.include "macros.asm"\n'
+                        'foo\n')
+            self.ctx_manager.include_paths.extend([path, os.path.join(path, 'sub')])
+            list(self.parse('root.asm'))
+        self.assertEqual(self.processor.stats['includes'], 1)
+        self.assertEqual(self.processor.stats['includes_deduplicated'], 2)
+        self.assertEqual(self.processor.stats['macro_expansions'], 1)
+
+    def test_include_cached(self):
+        self.set_file('root.asm',"""
+        .include "test.asm"
+        .include "test.asm"
+        """)
+        self.set_file('test.asm',"""
+        nop
+        """)
+        self.assertAstEqual(self.parse('root.asm'), """
+        ; <test.asm>
+            nop
+            nop
+        """)
+        self.assertEqual(self.processor.stats['includes'], 2)
+        self.assertEqual(self.processor.ast_cache.misses, 2)
+        self.assertEqual(self.processor.ast_cache.hits, 1)
+
     def test_scope(self):
         self.set_file('root.asm',"""
         .macro foo
@@ -128,6 +193,110 @@ class PreprocessorTest(TestBase):
         .end
         """)
 
+    def test_conditional(self):
+        self.set_file('root.asm',"""
+        .include "config.asm"
+        .ifdef C64
+            lda #1
+        .else
+            this section is never parsed !!!
+        .endif
+        .ifndef C64 ; comment
+            lda #2
+        .endif
+        .if VERSION - 2
+            lda #3
+        .else
+            lda #4
+        .endif
+        """)
+        self.set_file('config.asm',"""
+        .def C64 1
+        .def VERSION 1 + 1
+        """)
+        self.assertAstEqual(self.parse('root.asm'), """
+        ; <config.asm>
+            .def C64 1
+            .def VERSION 1 + 1
+        ; <root.asm>
+            lda #1
+            lda #4
+        """)
+        self.assertEqual(self.processor.stats['sections_skipped'], 3)
+
+    def test_conditional_nested(self):
+        self.set_file('root.asm',"""
+        .ifdef A
+            .if undefined_name
+                nop
+            .endif
+        .else
+            .ifdef B
+                lda #1
+            .else
+                lda #2
+            .endif
+        .endif
+        """)
+        self.processor.defines = {'B': '1'}
+        self.assertAstEqual(self.parse('root.asm'), """
+        ; <<command line>>
+            .def B 1
+        ; <root.asm>
+            lda #1
+        """)
+
+    def test_conditional_fail(self):
+        for text, msg in [
+                ('.else', r'root.asm \(1, 1\): .else without .if'),
+                ('.ifdef A\n.else\n.else\n.endif', r'root.asm \(3, 1\): .else after .else'),
+                ('nop\n  .if 1\nnop', r'root.asm \(2, 3\): .if without .endif'),
+                ('.if\n.endif', r'root.asm \(1, 1\): .if requires an argument'),
+                ('.if foo\n.endif', r'root.asm \(1, 5\): Identifier foo is undefined.'),
+                ('.macro m\n  .ifdef A\n  nop\n  .endif\n.end',
+                    r'root.asm \(2, 3\): .ifdef is not allowed inside a .macro block'),
+                ('.scope\n.if 1\n.endif\n.end',
+                    r'root.asm \(2, 1\): .if is not allowed inside a .scope block')]:
+            with self.assertRaisesRegex(CompilationError, msg):
+                self.set_file('root.asm', text)
+                list(PreProcessor(self.ctx_manager).parse('root.asm'))
+
+    def test_conditional_blocks(self):
+        # blocks closed before a conditional, or inside a section, are fine
+        self.set_file('root.asm', """
+        .macro m ; .end
+            nop
+        .end
+        .ifdef A
+        .else
+        .scope
+            m
+        .end
+        .endif
+        """)
+        self.assertAstEqual(self.parse('root.asm'), """
+        ; <root.asm>
+        .scope
+        ; <<internal>>
+        .scope
+        ; <root.asm>
+            nop
+        ; <<internal>>
+        .end
+        ; <root.asm>
+        .end
+        """)
+
+    def test_conditional_compile(self):
+        self.set_file('root.asm',"""
+        .ifdef LEVEL
+            lda #LEVEL
+        .endif
+        """)
+        self.compiler.defines = {'LEVEL': '$20'}
+        self.compiler.compile_file('root.asm')
+        self.assertDataEqual(0x0800, 0x0802, [0xA9, 0x20])
+
 
 class CompilerTest(TestBase):
     def test_segment_expr(self):
@@ -177,6 +346,18 @@ class CompilerTest(TestBase):
             0xEA, 0x90, 0xFD,
         ])
 
+    def test_absolute_8bit(self):
+        self.set_file('root.asm', """
+        .text 0x0800
+            ldx !$12
+            jmp ($34)
+            jsr $56
+        """)
+        self.compile('root.asm')
+        self.assertDataEqual(0x0800, 0x0809, [
+            0xAE, 0x12, 0x00, 0x6C, 0x34, 0x00, 0x20, 0x56, 0x00,
+        ])
+
     def test_pragma(self):
         self.set_file('root.asm', """
         .pragma foobar "baz"
@@ -389,16 +570,107 @@ class StorageTest(TestBase):
             0x01, 0x02, 0x03, 0x04
         ])
 
+    def test_bin_range(self):
+        self.set_file('root.asm', """
+        .def skip 2
+        .data 0x0200
+        .bin "foobar.dat", 1, skip
+        .bin "foobar.dat", skip
+        """)
+        self.set_file('foobar.dat', bytearray([1,2,3,4]))
+        self.compile('root.asm')
+        self.assertDataEqual(0x0200, 0x0204, [
+            0x02, 0x03, 0x03, 0x04
+        ])
+        self.assertSegAttrEqual('data', 'end', 0x0204)
+
+    def test_bin_range_error(self):
+        self.set_file('root.asm', """
+        .bin "foobar.dat", 3, 2
+        """)
+        self.set_file('foobar.dat', bytearray([1,2,3,4]))
+        with self.assertRaisesRegex(CompilationError,
+                r'root.asm \(1, 1\): Range 3, 2 is outside of "foobar.dat" \(4 bytes\)'):
+            self.compile('root.asm')
+
+    def test_bin_file(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'blob.dat')
+            with open(filename, 'wb') as f:
+                f.write(bytes(range(256)) * 16)
+            self.ctx_manager.include_paths.append(path)
+            self.set_file('root.asm', """
+            .data 0x0200
+            .bin "blob.dat", $0ffe, 2
+            """)
+            self.compile('root.asm')
+            self.assertDataEqual(0x0200, 0x0202, [0xFE, 0xFF])
+            self.assertNotIn('blob.dat', self.ctx_manager.files)
+            self.assertNotIn('blob.dat', self.ctx_manager.binaries)
+
+            # rewritten and truncated files are read afresh
+            with open(filename, 'wb') as f:
+                f.write(bytes(range(255, -1, -1)) * 16)
+            self.compile('root.asm')
+            self.assertDataEqual(0x0200, 0x0202, [0x01, 0x00])
+            with open(filename, 'wb') as f:
+                f.write(b'\x01')
+            with self.assertRaisesRegex(CompilationError,
+                    r'Range 4094, 2 is outside of "blob.dat" \(1 bytes\)'):
+                self.compile('root.asm')
+
 
 class SegmentTest(TestBase):
     def test_segment_data(self):
         d = SegmentData(1000)
-        d.offset += 5 # provoke logging of the start of the segment
+        d.offset += 5 # the first write starts the segment at its default
         d.offset += 5 #0x560
-        self.assertEqual(d.start, 1005)
+        self.assertEqual(d.start, 1000)
         self.assertEqual(d.offset, 1010)
         self.assertEqual(d.end, 1010)
 
+    def test_segment_origin(self):
+        d = SegmentData(1000)
+        d.origin(2000)
+        self.assertEqual((d.start, d.end), (2000, 2000))
+        d.offset += 5
+        d.origin(1500)
+        self.assertEqual((d.start, d.offset, d.end), (2000, 1500, 2005))
+        d.offset += 5
+        self.assertEqual((d.start, d.offset, d.end), (1500, 1505, 2005))
+
+    def test_segment_default_start(self):
+        self.set_file('root.asm', """
+        nop
+        rts
+        """)
+        self.compile('root.asm')
+        self.assertEqual(self.compiler.get_extents(['text']), (0x0800, 0x0802))
+
+    def test_segment_output(self):
+        # a plain compile writes the first instruction of a segment that
+        # has no origin, and nothing for an origin that is never used
+        self.set_file('root.asm', """
+        nop
+        rts
+        .text $0400
+        .text $0900
+        brk
+        """)
+        self.compiler.compile_file('root.asm')
+        self.assertEqual(self.compiler.get_extents(['text']), (0x0800, 0x0901))
+        self.assertEqual(get_binary(self.compiler, ['text'], 'prg'),
+                b'\x01\x08\xea\x60' + bytes(0xFE) + b'\x00')
+
+    def test_segment_unused_origin(self):
+        self.set_file('root.asm', """
+        .text $0400
+        .text $0800
+        nop
+        """)
+        self.compile('root.asm')
+        self.assertEqual(self.compiler.get_extents(['text']), (0x0800, 0x0801))
+
     def test_segment_bounds(self):
         self.set_file('root.asm', """
         .data $0300
@@ -0,0 +1,107 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import asyncio
+import threading
+from inspect import cleandoc
+from concurrent.futures import ThreadPoolExecutor
+from filetest import FileTestCase
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.preprocessor import AstCache
+
+SOURCES = 16
+ROUNDS = 4
+
+
+class ConcurrencyTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write('lib.asm', cleandoc("""
+        .once
+        .def base $20
+        .macro store, value, offset
+            lda #value
+            sta base+offset
+        .end
+        """))
+        self.write('table.dat', bytes(range(256)))
+        for ii in range(SOURCES):
+            self.write(f'src{ii}.asm', cleandoc(f"""
+            .include "lib.asm"
+            .text ${0x1000 + ii * 0x100:04x}
+            start{ii}:
+                jmp done
+                store {ii}, {ii % 4}
+                .bin "table.dat", {ii}, 4
+            done:
+                rts
+            """))
+
+        self.ctx_manager = FileContextManager([self.path])
+        self.ast_cache = AstCache()
+
+    def compile(self, ii):
+        ctx_manager = self.ctx_manager.session()
+        compiler = Compiler(ctx_manager, self.ast_cache)
+        compiler.compile_file(f'src{ii}.asm')
+        start, end = compiler.get_extents(['text'])
+        return (bytes(compiler.data[start:end]), compiler.map,
+                sorted(ctx_manager.dependencies))
+
+    def expected(self):
+        return [self.compile(ii) for ii in range(SOURCES)]
+
+    def test_threads(self):
+        expected = self.expected()
+        self.ctx_manager.invalidate()
+        self.ast_cache.invalidate()
+        misses = self.ast_cache.misses
+        barrier = threading.Barrier(8)
+
+        def run(ii):
+            if ii < 8:
+                barrier.wait()
+            return self.compile(ii % SOURCES)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(run, range(SOURCES * ROUNDS)))
+        self.assertEqual(results, expected * ROUNDS)
+        # every file is parsed once, however many compiles include it
+        self.assertEqual(self.ast_cache.misses - misses, SOURCES + 1)
+
+    def test_asyncio(self):
+        expected = self.expected()
+
+        async def run():
+            return await asyncio.gather(*[asyncio.to_thread(self.compile, ii)
+                    for ii in range(SOURCES)])
+
+        self.assertEqual(asyncio.run(run()), expected)
+
+    def test_sessions(self):
+        first = self.ctx_manager.session()
+        second = self.ctx_manager.session()
+        first.get_text('lib.asm')
+        self.assertIn('lib.asm', second.files)
+        self.assertEqual(first.dependencies, {'lib.asm': 'rt'})
+        self.assertEqual(second.dependencies, {})
+        self.assertEqual(self.ctx_manager.dependencies, {})
+
+    def test_single_load(self):
+        loads = []
+        ctx_manager = self.ctx_manager
+        release = threading.Event()
+
+        def loader():
+            loads.append(threading.get_ident())
+            release.wait(1)
+            return 'nop'
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(ctx_manager._load, ctx_manager.files,
+                    'slow.asm', loader) for _ in range(4)]
+            release.set()
+            self.assertEqual([x.result() for x in futures], ['nop'] * 4)
+        self.assertEqual(len(loads), 1)
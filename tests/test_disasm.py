@@ -0,0 +1,115 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import io
+import unittest
+from inspect import cleandoc
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.cpu6502 import AddressMode
+from xcomp.cpu6502 import opcode_xref
+from xcomp.cpu6502 import opcodes
+from xcomp.decompiler import ModelPrinter
+from xcomp.disasm import decode_table
+from xcomp.disasm import disassemble
+from xcomp.disasm import load_image
+
+
+class DisassemblerTest(unittest.TestCase):
+    def compile(self, text):
+        ctx_manager = FileContextManager()
+        ctx_manager.files['root.asm'] = cleandoc(text)
+        compiler = Compiler(ctx_manager)
+        compiler.compile_file('root.asm')
+        return compiler
+
+    def disassemble(self, data, start, end, entries=None):
+        disasm, ast = disassemble(data, start, end, entries)
+        buf = io.StringIO()
+        ModelPrinter(buf, ansimode=False).print_ast(ast)
+        return disasm, buf.getvalue()
+
+    def test_decode_table(self):
+        self.assertEqual(decode_table[0x88], ('dey', AddressMode.implied, 1))
+        self.assertEqual(decode_table[0x6c], ('jmp', AddressMode.indirect, 3))
+        self.assertIsNone(decode_table[0x02])
+        for name, modes in opcode_xref.items():
+            for mode, value in modes.items():
+                if (name, mode) != ('dec', AddressMode.implied):
+                    self.assertEqual(opcodes[value], (name, mode))
+
+    def test_decode_overflow_branches(self):
+        self.assertEqual(decode_table[0x50], ('bvc', AddressMode.relative, 2))
+        self.assertEqual(decode_table[0x70], ('bvs', AddressMode.relative, 2))
+        compiler = self.compile("""
+        .text $1000
+        start:
+            bvc start
+            bvs start
+            rts
+        """)
+        self.assertEqual(compiler.data[0x1000:0x1004], b'\x50\xfe\x70\xfc')
+        disasm, text = self.disassemble(compiler.data, 0x1000, 0x1005)
+        self.assertIn('    bvc L1000\n    bvs L1000\n    rts\n', text)
+
+    def test_code_and_data(self):
+        compiler = self.compile("""
+        .text $1000
+        start:
+            ldx #$10
+        loop:
+            lda table, x
+            sta $0400, x
+            dex
+            bpl loop
+            jsr sub
+            jmp start
+        table:
+            .byte $02, $ff, $ea, $60
+        sub:
+            lda !$20
+            jmp ($0300)
+        """)
+        disasm, text = self.disassemble(compiler.data, 0x1000, 0x101b)
+        self.assertEqual(text, cleandoc("""
+        ; <<image>>
+            .text $1000
+        L1000:
+            ldx #$10
+        L1002:
+            lda $1011, x
+            sta $0400, x
+            dex
+            bpl L1002
+            jsr L1015
+            jmp L1000
+            .byte $02, $ff, $ea, $60
+        L1015:
+            lda !$20
+            jmp ($0300)
+        """) + '\n')
+        self.assertEqual(disasm.stats, {
+            'instructions': 9,
+            'code_bytes': 23,
+            'data_bytes': 4,
+        })
+
+    def test_round_trip(self):
+        data = bytes(range(256)) * 4
+        image, start, end = load_image(b'\x00\xc0' + data, 'prg')
+        self.assertEqual((start, end), (0xc000, 0xc400))
+        _, text = self.disassemble(image, start, end, list(range(start, end, 7)))
+        compiler = self.compile(text)
+        self.assertEqual(bytes(compiler.data[start:end]), data)
+
+    def test_vectors(self):
+        data = b'\xea\x60' + bytes(0x1ff8) + b'\x00\xe0' * 3
+        image, start, end = load_image(data, 'raw', 0xe000)
+        disasm, _ = disassemble(image, start, end)
+        self.assertEqual(disasm.stats['instructions'], 2)
+        self.assertEqual(disasm.labels, {0xe000: 'Le000'})
+
+    def test_load_image_fail(self):
+        with self.assertRaisesRegex(Exception, 'does not fit in 64K'):
+            load_image(bytes(16), 'raw', 0xfff8)
@@ -121,3 +121,18 @@ class TestEval(TestBase):
         self.assertEqual(len(fixup.scope_stack), 3)
         self.assertEqual(e.eval(fixup), 3000)
         self.assertEqual(e.eval(foo), 1000)
+
+
+class TestTrace(TestBase):
+    def test_trace_enabled(self):
+        with self.assertLogs('xcomp.eval', logging.DEBUG) as logs:
+            self.evaluator.get_expr_bytes(0xCAFE)
+        self.assertEqual(logs.records[0].getMessage(), 'expr bytes 51966 51966 fe ca')
+
+    def test_trace_disabled(self):
+        logger = logging.getLogger('xcomp.eval')
+        logger.setLevel(logging.WARN)
+        try:
+            self.assertFalse(Evaluator(self.ctx_manager)._trace)
+        finally:
+            logger.setLevel(logging.DEBUG)
@@ -0,0 +1,71 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+from filetest import FileTestCase
+from xcomp.compiler_base import FileContextManager
+
+
+class FileContextManagerTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = os.path.join(self.path, 'first')
+        self.second = os.path.join(self.path, 'second')
+        os.makedirs(os.path.join(self.first, 'sub'))
+        os.makedirs(self.second)
+        self.ctx_manager = FileContextManager([self.first, self.second])
+
+    def test_search_order(self):
+        self.write('first/a.asm')
+        self.write('second/a.asm')
+        self.write('second/b.asm')
+        self.write('first/sub/c.asm')
+        self.assertEqual(self.ctx_manager.search_file('a.asm'),
+                os.path.join(self.first, 'a.asm'))
+        self.assertEqual(self.ctx_manager.search_file('b.asm'),
+                os.path.join(self.second, 'b.asm'))
+        self.assertEqual(self.ctx_manager.search_file('sub/c.asm'),
+                os.path.join(self.first, 'sub', 'c.asm'))
+        self.assertIsNone(self.ctx_manager.search_file('sub'))
+        self.assertIsNone(self.ctx_manager.search_file('missing.asm'))
+
+    def test_cached(self):
+        self.write('second/a.asm')
+        self.ctx_manager.search_file('a.asm')
+        self.ctx_manager.search_file('b.asm')
+        self.assertEqual(set(self.ctx_manager.listings),
+                {self.first, self.second})
+
+        # a file found is not looked up again until the cache is invalidated
+        self.write('first/a.asm')
+        self.assertEqual(self.ctx_manager.search_file('a.asm'),
+                os.path.join(self.second, 'a.asm'))
+        self.ctx_manager.invalidate()
+        self.assertEqual(self.ctx_manager.search_file('a.asm'),
+                os.path.join(self.first, 'a.asm'))
+
+    def test_created_after_miss(self):
+        self.assertIsNone(self.ctx_manager.search_file('a.asm'))
+        self.assertNotIn('a.asm', self.ctx_manager.resolved)
+        self.write('second/a.asm')
+        os.utime(self.second, ns=(0, 0))
+        self.assertEqual(self.ctx_manager.search_file('a.asm'),
+                os.path.join(self.second, 'a.asm'))
+
+    def test_invalidate_file(self):
+        self.write('first/a.asm')
+        self.ctx_manager.get_text('a.asm')
+        os.remove(os.path.join(self.first, 'a.asm'))
+        self.write('second/a.asm')
+        self.ctx_manager.invalidate('a.asm')
+        self.assertEqual(self.ctx_manager.search_file('a.asm'),
+                os.path.join(self.second, 'a.asm'))
+
+    def test_validate(self):
+        self.ctx_manager.validate = True
+        self.assertIsNone(self.ctx_manager.search_file('a.asm'))
+        self.write('first/a.asm')
+        os.utime(self.first, ns=(0, 0))
+        self.assertEqual(self.ctx_manager.search_file('a.asm'),
+                os.path.join(self.first, 'a.asm'))
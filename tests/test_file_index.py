@@ -0,0 +1,74 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import glob
+from filetest import FileTestCase
+from xcomp.compiler_base import FileContextManager
+from xcomp.file_index import FileIndex
+from xcomp.file_index import translate
+from xcomp.file_index import index_filename
+
+
+class FileIndexTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.path, 'root')
+        self.index_dir = os.path.join(self.path, 'index')
+        for path in ['a.asm', 'b.inc', 'lib/c.asm', 'lib/d/e.asm', 'lib/d/f.bin',
+                '.hidden/g.asm', 'lib/.h.asm', 'x[1].asm']:
+            self.write(f'root/{path}')
+
+    def test_translate_parity(self):
+        index = FileIndex(self.root).refresh()
+        for pattern in ['*', '*.asm', '**', '**/*.asm', 'lib/**/*.asm', 'lib/*',
+                '?.asm', '[ab].*', '[!a].*', 'lib/d/*.bin', '**/d', '.*',
+                '.hidden/*', 'x[[]1].asm', 'missing/*']:
+            expected = sorted(os.path.relpath(x, self.root)
+                    for x in glob.glob(os.path.join(self.root, pattern), recursive=True)
+                    if x.rstrip(os.sep) != self.root)
+            self.assertEqual(index.match(pattern), expected, pattern)
+
+    def test_translate(self):
+        self.assertEqual(translate('a.asm'), r'(?!\.)a\.asm\Z')
+
+    def test_refresh(self):
+        filename = index_filename(self.index_dir, self.root)
+        index = FileIndex(self.root, filename).refresh()
+        index.save()
+        self.assertTrue(os.path.isfile(filename))
+        self.assertFalse(index.dirty)
+
+        # unchanged directories are not listed again
+        index = FileIndex(self.root, filename)
+        index._list = None
+        index.refresh()
+        self.assertFalse(index.dirty)
+        self.assertEqual(index.match('lib/d/*'), ['lib/d/e.asm', 'lib/d/f.bin'])
+
+        # a changed directory is
+        index = FileIndex(self.root, filename)
+        self.write('root/lib/d/new.asm')
+        os.utime(os.path.join(self.root, 'lib', 'd'), ns=(0, 0))
+        index.refresh()
+        self.assertTrue(index.dirty)
+        self.assertEqual(index.match('lib/d/*.asm'), ['lib/d/e.asm', 'lib/d/new.asm'])
+
+    def test_search_expr(self):
+        second = os.path.join(self.path, 'second')
+        self.write('second/a.asm')
+        self.write('second/z.asm')
+        lib = os.path.join(self.root, 'lib')
+        for index_dir in [None, self.index_dir]:
+            ctx_manager = FileContextManager([lib, self.root, second],
+                    index_dir=index_dir)
+            self.assertEqual(list(ctx_manager.search_expr('**/*.asm')), [
+                os.path.join(lib, 'c.asm'),
+                os.path.join(lib, 'd/e.asm'),
+                os.path.join(self.root, 'a.asm'),
+                os.path.join(self.root, 'x[1].asm'),
+                os.path.join(second, 'a.asm'),
+                os.path.join(second, 'z.asm'),
+            ], index_dir)
+        self.assertEqual(len(os.listdir(self.index_dir)), 3)
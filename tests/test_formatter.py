@@ -0,0 +1,90 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+from inspect import cleandoc
+from filetest import FileTestCase
+from xcomp.formatter import Formatter
+from xcomp.formatter import find_sources
+
+FORMATTED = cleandoc("""
+    ; entry point
+    start:
+        lda #$01 ; load
+        sta $0400, x
+        rts
+    """) + '\n'
+
+
+class FormatterTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.formatter = Formatter()
+
+    def test_format_text(self):
+        text = '; entry point\nstart:\n  lda   #$01;load\n  sta $0400,x\n rts\n'
+        self.assertEqual(self.formatter.format_text(text),
+                FORMATTED.replace('; load', ';load'))
+
+    def test_format_strings(self):
+        text = '    .byte "say \\"hi\\"\\n", 0\n'
+        self.assertEqual(self.formatter.format_text(text), text)
+
+    def test_format_conditionals(self):
+        text = '  .ifdef C64 ; c64 only\n lda  #1\n.else\n    rts\n  .endif\n'
+        self.assertEqual(self.formatter.format_text(text),
+                '.ifdef C64 ; c64 only\n    lda #1\n.else\n    rts\n.endif\n')
+
+    def test_unchanged(self):
+        filename = self.write('a.asm', FORMATTED)
+        mtime = os.stat(filename).st_mtime_ns
+        result = self.formatter.format_file(filename, write=True)
+        self.assertFalse(result.changed)
+        self.assertFalse(result.written)
+        self.assertEqual(os.stat(filename).st_mtime_ns, mtime)
+
+    def test_rewrite(self):
+        filename = self.write('a.asm', FORMATTED.replace('    rts', 'rts'))
+        result = self.formatter.format_file(filename)
+        self.assertTrue(result.changed)
+        self.assertFalse(result.written)
+        self.assertEqual(result.diff[2:], [
+            '@@ -2,4 +2,4 @@\n',
+            ' start:\n',
+            '     lda #$01 ; load\n',
+            '     sta $0400, x\n',
+            '-rts\n',
+            '+    rts\n',
+        ])
+
+        result = self.formatter.format_file(filename, write=True)
+        self.assertTrue(result.written)
+        self.assertEqual(self.read(filename, 'r'), FORMATTED)
+
+    def test_error(self):
+        filename = self.write('a.asm', 'lda #\n')
+        result = self.formatter.format_file(filename, write=True)
+        self.assertIsNotNone(result.error)
+        self.assertFalse(result.written)
+        self.assertEqual(self.read(filename, 'r'), 'lda #\n')
+
+    def test_find_sources(self):
+        root = self.path
+        self.write('b.asm', '')
+        self.write('lib/a.inc', '')
+        self.write('lib/notes.txt', '')
+        self.write('.hidden/c.asm', '')
+        self.assertEqual([os.path.relpath(x, root) for x in find_sources([root])], [
+            'b.asm',
+            os.path.join('lib', 'a.inc'),
+        ])
+
+    def test_format_pool(self):
+        filenames = [self.write(f'{ii}.asm', FORMATTED.replace('    rts', 'rts'))
+                for ii in range(4)]
+        results = list(self.formatter.format(filenames, write=True, workers=2))
+        self.assertEqual([x.filename for x in results], filenames)
+        self.assertTrue(all(x.written for x in results))
+        for filename in filenames:
+            self.assertEqual(self.read(filename, 'r'), FORMATTED)
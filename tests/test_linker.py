@@ -0,0 +1,162 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import tempfile
+import unittest
+from inspect import cleandoc
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.linker import Linker
+from xcomp.linker import LinkError
+from xcomp.objfile import ObjectFile
+
+
+class LinkerTest(unittest.TestCase):
+    def setUp(self):
+        self.maxDiff = None
+        self.ctx_manager = FileContextManager()
+
+    def set_file(self, name, text):
+        self.ctx_manager.files[name] = cleandoc(text)
+
+    def assemble(self, name):
+        compiler = Compiler(self.ctx_manager)
+        compiler.compile_file(name, relocatable=True)
+        return ObjectFile.fromCompiler(compiler, name)
+
+    def link(self, *objects):
+        linker = Linker(self.ctx_manager)
+        linker.link(objects)
+        return linker
+
+    def test_object(self):
+        self.set_file('main.asm', """
+        .text $0800
+        start:
+            jsr print
+        """)
+        obj = self.assemble('main.asm')
+        self.assertEqual(obj.imports, ['print'])
+        self.assertEqual(obj.exports, {'start': 0x0800})
+        self.assertEqual(len(obj.relocations), 1)
+        self.assertEqual(obj.relocations[0].expr.scope_stack, [{}])
+        self.assertEqual(obj.segments[0].name, 'text')
+        self.assertEqual(obj.segments[0].start, 0x0800)
+
+    def test_dependencies(self):
+        with tempfile.TemporaryDirectory() as path:
+            for name, data in [('c.asm', b'.text $0800\n.bin "blob.bin"\n'),
+                    ('blob.bin', b'\x01\x02')]:
+                with open(os.path.join(path, name), 'wb') as f:
+                    f.write(data)
+            self.ctx_manager.include_paths = [path]
+            obj = self.assemble('c.asm')
+            self.assertEqual(obj.segments[0].data, b'\x01\x02')
+            self.assertEqual(sorted(obj.dependencies), [
+                os.path.join(path, 'blob.bin'), os.path.join(path, 'c.asm')])
+
+    def test_import_through_define(self):
+        self.set_file('main.asm', """
+        .def target print
+        .text $0800
+            jmp target
+        """)
+        obj = self.assemble('main.asm')
+        self.assertEqual(obj.imports, ['print'])
+        scope, = obj.relocations[0].expr.scope_stack
+        self.assertEqual(list(scope), ['target'])
+
+    def test_link(self):
+        self.set_file('main.asm', """
+        .text $0800
+        start:
+            jsr print
+            .word msg
+        """)
+        self.set_file('lib.asm', """
+        .text $1000
+        print:
+            rts
+        .data $0200
+        msg:
+            .byte $FF
+        """)
+        linker = self.link(self.assemble('main.asm'), self.assemble('lib.asm'))
+        self.assertEqual(list(linker.data[0x0800:0x0805]),
+                [0x20, 0x00, 0x10, 0x00, 0x02])
+        self.assertEqual(linker.data[0x1000], 0x60)
+        self.assertEqual(linker.get_extents(['text']), (0x0800, 0x1001))
+        self.assertEqual(linker.map, {
+            'start': 0x0800, 'print': 0x1000, 'msg': 0x0200})
+
+    def test_link_shared_header(self):
+        self.set_file('hdr.inc', """
+        .def BORDER $d020
+        """)
+        self.set_file('a.asm', """
+        .include "hdr.inc"
+        .def COLOR 1
+        .text $0800
+        start:
+            lda #COLOR
+            sta BORDER
+        """)
+        self.set_file('b.asm', """
+        .include "hdr.inc"
+        .text $0900
+        clear:
+            sta BORDER
+        """)
+        a = self.assemble('a.asm')
+        self.assertEqual(a.exports, {'COLOR': 1, 'start': 0x0800})
+        linker = self.link(a, self.assemble('b.asm'))
+        self.assertEqual(list(linker.data[0x0900:0x0903]), [0x8D, 0x20, 0xD0])
+
+    def test_link_unresolved(self):
+        self.set_file('main.asm', """
+        jsr print
+        """)
+        with self.assertRaisesRegex(LinkError,
+                r'main.asm: unresolved symbols: print'):
+            self.link(self.assemble('main.asm'))
+
+    def test_link_overlap(self):
+        self.set_file('a.asm', """
+        .text $0800
+        nop
+        nop
+        """)
+        self.set_file('b.asm', """
+        .text $0801
+        nop
+        """)
+        with self.assertRaisesRegex(LinkError, r'b.asm: segment text .* overlaps'):
+            self.link(self.assemble('a.asm'), self.assemble('b.asm'))
+
+    def test_link_default_segments(self):
+        # both units assemble into the default .text, which is not rebased
+        self.set_file('a.asm', """
+        nop
+        """)
+        self.set_file('b.asm', """
+        rts
+        """)
+        with self.assertRaisesRegex(LinkError,
+                r'b.asm: segment text \$0800-\$0801 overlaps a.asm \(text\); '
+                r'segments are not rebased'):
+            self.link(self.assemble('a.asm'), self.assemble('b.asm'))
+
+    def test_link_duplicate_symbol(self):
+        self.set_file('a.asm', """
+        .text $0800
+        foo:
+        """)
+        self.set_file('b.asm', """
+        .text $0900
+        foo:
+        """)
+        with self.assertRaisesRegex(LinkError,
+                r'b.asm: symbol "foo" is already exported by a.asm'):
+            self.link(self.assemble('a.asm'), self.assemble('b.asm'))
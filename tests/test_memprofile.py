@@ -0,0 +1,55 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import gc
+import unittest
+from inspect import cleandoc
+from xcomp.compiler_base import FileContextManager
+from xcomp.memprofile import profile_compile
+
+
+class MemoryProfilerTest(unittest.TestCase):
+    def test_profile_compile(self):
+        ctx_manager = FileContextManager()
+        ctx_manager.files['main.asm'] = cleandoc("""
+        .text $1000
+        start:
+            lda #$01
+            jmp start
+        """)
+        written = []
+        report = profile_compile(ctx_manager, 'main.asm', written.append).report()
+        phases = {x['name']: x for x in report['phases']}
+
+        self.assertEqual(list(phases), ['setup', 'parse', 'preprocess',
+                'compile', 'fixup', 'write'])
+        self.assertEqual(len(written), 1)
+        self.assertEqual(written[0].data[0x1000:0x1005], b'\xA9\x01\x4C\x00\x10')
+        self.assertGreaterEqual(report['peak'], 0xFFFF)
+
+        # the memory image is allocated when the compiler is created
+        self.assertTrue(any(x['site'].startswith('xcomp/compiler.py') and
+                x['size'] >= 0xFFFF for x in phases['setup']['sites']))
+        self.assertGreaterEqual(phases['preprocess']['nodes']['Op'], 2)
+
+    def test_profile_defines(self):
+        ctx_manager = FileContextManager()
+        ctx_manager.files['main.asm'] = cleandoc("""
+        .text $1000
+        .ifdef FAST
+            lda #FAST
+        .else
+            nop
+        .endif
+        """)
+        written = []
+        gc.collect() # so that only this compile's nodes change in number
+        report = profile_compile(ctx_manager, 'main.asm', written.append,
+                defines={'FAST': '$02'}).report()
+        self.assertEqual(written[0].data[0x1000:0x1002], b'\xA9\x02')
+
+        # a root file with conditionals is parsed as it is pre-processed
+        phases = {x['name']: x for x in report['phases']}
+        self.assertGreater(phases['preprocess']['nodes'].get('Op', 0),
+                phases['parse']['nodes'].get('Op', 0))
@@ -2,10 +2,13 @@
 # All rights reserved.
 # Published under the BSD license.  See LICENSE For details.
 
+import io
 import logging
 import unittest
 from xcomp.parser import *
 from xcomp.model import *
+from xcomp.decompiler import ModelPrinter
+from parsimonious.exceptions import ParseError as GrammarError
 #from xcomp.reduce_parser import ParseError
 from xcomp.cpu6502 import AddressMode
 
@@ -34,6 +37,19 @@ class IgnoredTest(ParserTest):
         self.assertEqual(result, [])
 
 
+    def test_ignored_rules(self):
+        # is_ignored_expr is asked about every node visited, so its answers
+        # are cached per rule name
+        self.assertTrue(self.parser.is_ignored_expr('comma_tok'))
+        self.assertTrue(self.parser.is_ignored_expr('_'))
+        self.assertFalse(self.parser.is_ignored_expr('op'))
+        self.assertEqual(self.parser._ignored,
+                {'comma_tok': True, '_': True, 'op': False})
+        result = self.parse('lda $10, x')
+        self.assertEqual(len(result), 1)
+        self.assertTrue(self.parser.is_ignored_expr('comma_tok'))
+
+
 class StatementSeparatorTest(ParserTest):
     def test_sep_newline(self):
         # test two back-to-back macro calls
@@ -83,6 +99,19 @@ class IncludeTest(ParserTest):
         result = self.parse('.include "foobar.asm"', 'include')
         self.assertEqual(result.filename, 'foobar.asm')
 
+    def test_once(self):
+        result = self.parse('.once', 'goal')
+        self.assertEqual(result, [Once(Pos(0, 5))])
+
+    def test_bin(self):
+        result = self.parse('.bin "foo.dat"', 'bin')
+        self.assertEqual(result, BinaryInclude(Pos(0, 14), 'foo.dat'))
+
+    def test_bin_range(self):
+        result = self.parse('.bin "foo.dat", 16, $20', 'bin')
+        self.assertEqual(result.offset.value, 16)
+        self.assertEqual(result.length.value, 0x20)
+
 
 class DefTest(ParserTest):
     def test_def(self):
@@ -127,6 +156,12 @@ class OperTest(ParserTest):
         result = self.parse('sta (<foo),y', 'oper')
         self.assertEqual(result.mode, AddressMode.indirect_y)
 
+    def test_abs_y(self):
+        result = self.parse('lda table, y', 'oper')
+        self.assertEqual(result.mode, AddressMode.absolute_y)
+        result = self.parse('ldx foo, y', 'oper')
+        self.assertEqual(result.mode, AddressMode.zeropage_y)
+
     def test_jsr(self):
         self.parser.debug = True
         result = self.parse('jsr foo', 'oper')
@@ -198,6 +233,25 @@ class NumberTest(ParserTest):
         result = self.parse('12345', 'number')
         self.assertEqual(result[0].value, 12345)
 
+    def test_parse_width(self):
+        for text, value, width in [
+                ('$10', 0x10, 8),
+                ('$0010', 0x10, 16),
+                ('%00000001', 1, 8),
+                ('%0000000000000001', 1, 16)]:
+            result = self.parse(text, 'number')
+            self.assertEqual((result[0].value, result[0].width), (value, width))
+
+    def test_print_width(self):
+        # literals print back with the digits they were written with
+        text = 'lda $0010\nlda $10\n.byte %00000001, %0000000000000001\n'
+        buf = io.StringIO()
+        printer = ModelPrinter(stream=buf, ansimode=False)
+        for x in self.parse(text):
+            printer.print(x)
+        self.assertEqual(buf.getvalue(), '; <<internal>>\n' + ''.join(
+                f'    {x}\n' for x in text.splitlines()))
+
 
 class MacroTest(ParserTest):
     def test_macro_params(self):
@@ -285,6 +339,28 @@ class CommentTest(ParserTest):
         self.assertEqual(pragma.comment.text, 'baz')
         self.assertEqual(pragma.comment.full_line, False)
 
+    def test_eol(self):
+        # eol only matches the line break; a comment before it is a node
+        eol = self.parser.grammar['eol']
+        self.assertEqual(eol.parse('\n  ').text, '\n  ')
+        with self.assertRaises(GrammarError):
+            eol.parse('; foo\n')
+
+    def test_comment_after_statement(self):
+        result = self.parse("""lsr a; shift\nlda #1\n; full\nrts""")
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result[0].comment.text, ' shift')
+        self.assertEqual(result[1].comment, None)
+        self.assertEqual(result[2].text, ' full')
+        self.assertEqual(result[2].full_line, True)
+
+    def test_comment_not_kept_between_parses(self):
+        self.parse("""rts""")
+        result = self.parse("""; foo""")
+        self.assertEqual(result, [
+            Comment(pos=Pos(start=0, end=5), full_line=True, text=' foo'),
+        ])
+
 
 class VarTest(ParserTest):
     def test_var_simple(self):
@@ -0,0 +1,83 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import time
+from inspect import cleandoc
+from unittest import mock
+from filetest import FileTestCase
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.prefetch import scan
+from xcomp.prefetch import run_prefetch
+
+
+class PrefetchTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx_manager = FileContextManager([self.path])
+        self.write('root.asm', cleandoc("""
+        .include "a.asm"
+        .include "b.asm"
+        .include "missing.asm"  ; reported by the compiler, not prefetch
+        """))
+        self.write('a.asm', cleandoc("""
+            .include "c.asm"
+            .bin "data.bin", 0, 2
+        """))
+        self.write('b.asm', cleandoc("""
+        .include "c.asm"
+        """))
+        self.write('c.asm', cleandoc("""
+        nop
+        """))
+        self.write('data.bin', b'\x01\x02\x03')
+
+    def test_scan(self):
+        self.assertEqual(list(scan(cleandoc("""
+        .include "a.asm"
+          .bin "b.dat", 1, 2
+        ; .include "c.asm"
+        lda #1 ; .include "d.asm"
+        """))), [('include', 'a.asm'), ('bin', 'b.dat')])
+
+    def test_prefetch(self):
+        loaded = run_prefetch(self.ctx_manager, 'root.asm')
+        self.assertEqual(loaded, ['a.asm', 'b.asm', 'c.asm', 'data.bin', 'root.asm'])
+        self.assertEqual(set(self.ctx_manager.files),
+                {'root.asm', 'a.asm', 'b.asm', 'c.asm'})
+        self.assertEqual(self.ctx_manager.resolved['data.bin'],
+                os.path.join(self.path, 'data.bin'))
+        self.assertEqual(self.ctx_manager.binaries, {})
+        self.assertEqual(self.ctx_manager.dependencies, {})
+
+    def test_concurrent(self):
+        names = [f'inc{ii}.asm' for ii in range(8)]
+        self.write('root.asm', '\n'.join(f'.include "{x}"' for x in names))
+        for name in names:
+            self.write(name, 'nop')
+
+        real_open = open
+
+        def slow_open(*args, **kwargs):
+            time.sleep(0.1)
+            return real_open(*args, **kwargs)
+
+        start = time.perf_counter()
+        with mock.patch('builtins.open', slow_open):
+            run_prefetch(self.ctx_manager, 'root.asm')
+        # the root is read first, then the includes together
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(len(self.ctx_manager.files), 9)
+
+    def test_compile(self):
+        self.write('root.asm', cleandoc("""
+        .include "a.asm"
+        .include "b.asm"
+        """))
+        compiler = Compiler(self.ctx_manager)
+        compiler.compile_file('root.asm', prefetch=True)
+        self.assertEqual(compiler.data[0x0800:0x0803], b'\xEA\x01\x02')
+        self.assertEqual(set(self.ctx_manager.dependencies),
+                {'root.asm', 'a.asm', 'b.asm', 'c.asm', 'data.bin'})
@@ -0,0 +1,92 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import io
+import unittest
+from inspect import cleandoc
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.preprocessor import PreProcessor
+from xcomp.model import *
+from xcomp.prefile import *
+from xcomp.cli import Application
+
+
+class PreFileTest(unittest.TestCase):
+    def setUp(self):
+        self.ctx_manager = FileContextManager()
+        self.ctx_manager.files['root.asm'] = cleandoc("""
+            .include "lib.asm"
+            .text $0800
+            start:
+                lda #<-2 ; negative
+                inc16 $fb
+                inc16 $fd
+                jmp (vector)
+            vector:
+                .word start, $0010
+            msg:
+                .byte "hi", 0
+            """)
+        self.ctx_manager.files['lib.asm'] = cleandoc("""
+            .macro inc16, addr
+                inc addr
+                bne done
+                inc addr + 1
+            done:
+            .end
+            """)
+
+    def pre(self):
+        return list(PreProcessor(self.ctx_manager).parse('root.asm'))
+
+    def test_round_trip(self):
+        ast = self.pre()
+        data = dumps(ast)
+        self.assertTrue(data.startswith(PRE_MAGIC))
+        result = loads(data)
+        self.assertEqual(result, ast)
+        self.assertEqual(result[2].comment.text, ' negative')
+
+    def test_shared_nodes(self):
+        result = loads(dumps(self.pre()))
+        # both expansions of the macro refer to the same body nodes
+        ops = [x for x in result if isinstance(x, Op) and x.name == 'bne']
+        self.assertEqual(len(ops), 2)
+        self.assertIs(ops[0], ops[1])
+
+    def test_compile(self):
+        compiler = Compiler(self.ctx_manager)
+        compiler.compile_file('root.asm')
+        expected = bytes(compiler.data)
+
+        self.ctx_manager.files['root.pre'] = dumps(self.pre())
+        compiler = Compiler(FileContextManager())
+        compiler.compile(loads(self.ctx_manager.files['root.pre']))
+        self.assertEqual(bytes(compiler.data), expected)
+
+    def test_invalid(self):
+        with self.assertRaisesRegex(PreFileException, 'Not a pre-processed'):
+            loads(b'\x00' * 16)
+        with self.assertRaisesRegex(PreFileException, 'version'):
+            loads(PRE_MAGIC + b'\x63')
+        with self.assertRaisesRegex(PreFileException, 'Corrupt'):
+            loads(dumps(self.pre())[:-8])
+        with self.assertRaisesRegex(PreFileException, 'Cannot serialize'):
+            dumps([Label(Pos(0, 0), 'a'), object()])
+
+    def run_pre(self, stream):
+        app = Application(stream=stream, ansimode=False,
+                ctx_factory=lambda include_paths: self.ctx_manager)
+        return app.run(['pre', '--format=bin', 'root.asm'])
+
+    def test_pre_stdout(self):
+        stream = io.TextIOWrapper(io.BytesIO())
+        self.assertTrue(self.run_pre(stream))
+        self.assertEqual(loads(stream.buffer.getvalue()), self.pre())
+
+    def test_pre_text_stream(self):
+        stream = io.StringIO()
+        self.assertFalse(self.run_pre(stream))
+        self.assertRegex(stream.getvalue(), 'needs an output file')
@@ -0,0 +1,59 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import io
+import unittest
+from colors import color
+from xcomp.printer import StylePrinter
+
+stylesheet = {
+    'title': {'display': 'block', 'color': 'white', 'bold': True, 'underline': True},
+    'key': {'color': 'white', 'bold': True, 'after': ': '},
+    'number': {'color': '#AA44BB'},
+    'hidden': {'display': 'hidden'},
+}
+
+
+class StylePrinterTest(unittest.TestCase):
+    def setUp(self):
+        self.buf = io.StringIO()
+        self.printer = StylePrinter(self.buf, stylesheet)
+
+    def test_styles(self):
+        self.printer.text('a').title('b').key('c').hidden('d').nl()
+        self.assertEqual(self.buf.getvalue(), ''.join([
+            'a\n',
+            color('b', fg='white', style='bold+underline'),
+            '\n',
+            color('c: ', fg='white', style='bold'),
+            '\n',
+        ]))
+        self.assertEqual(set(self.printer._styles), {'text', 'title', 'key', 'hidden'})
+
+    def test_restyle(self):
+        self.printer.key('a')
+        self.printer.ansimode = False
+        self.printer.key('b')
+        self.printer.stylesheet = {}
+        self.printer.key('c')
+        self.assertEqual(self.buf.getvalue(),
+                color('a: ', fg='white', style='bold') + 'b: c')
+
+    def test_buffered(self):
+        printer = self.printer
+        with printer.buffered(size=64):
+            printer.text('0123456789')
+            with printer.number as p:
+                p.text('42')
+            printer.text('abcd')
+            self.assertEqual(self.buf.getvalue(), '')
+
+            # the stream is brought up to date before it is used directly
+            printer.stream.write('|')
+            self.assertEqual(self.buf.getvalue(),
+                    '0123456789' + color('42', fg='#AA44BB') + 'abcd|')
+            printer.text('x' * 64)
+            self.assertEqual(self.buf.getvalue()[-1], 'x')
+            printer.text('y')
+        self.assertEqual(self.buf.getvalue()[-2:], 'xy')
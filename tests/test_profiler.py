@@ -0,0 +1,106 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import unittest
+from inspect import cleandoc
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.profiler import Profiler
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_nested_phases(self):
+        clock = FakeClock()
+        profiler = Profiler(clock)
+        with profiler.phase('outer'):
+            clock.now += 1
+            with profiler.phase('inner'):
+                clock.now += 2
+        phases = profiler.report()['phases']
+        self.assertEqual(phases['outer'], {'calls': 1, 'total': 3.0, 'self': 1.0})
+        self.assertEqual(phases['inner'], {'calls': 1, 'total': 2.0, 'self': 2.0})
+
+    def test_recursion_counted_once(self):
+        profiler = Profiler()
+
+        def fact(n):
+            return 1 if n <= 1 else n * fact(n - 1)
+        fact = profiler.wrap(fact, 'fact', 'fact_calls')
+        self.assertEqual(fact(5), 120)
+        report = profiler.report()
+        self.assertEqual(report['phases']['fact']['calls'], 1)
+        self.assertEqual(report['counters'], {'fact_calls': 5})
+
+    def test_compile(self):
+        ctx_manager = FileContextManager()
+        ctx_manager.files['main.asm'] = cleandoc("""
+        .macro twice, value
+            .byte value, value
+        .end
+        .text $1000
+            jmp later
+            twice 1
+            twice 2
+        later:
+            rts
+        """)
+        compiler = Compiler(ctx_manager)
+        profiler = Profiler()
+        profiler.instrument_compiler(compiler)
+        compiler.compile_file('main.asm')
+        report = profiler.report()
+
+        self.assertEqual(set(report['phases']), {'grammar', 'parse',
+                'reduce', 'preprocess', 'compile', 'eval', 'fixup'})
+        counters = report['counters']
+        self.assertEqual(counters['files_parsed'], 1)
+        self.assertEqual(counters['macro_expansions'], 2)
+        self.assertEqual(counters['fixups'], 1)
+        self.assertEqual(counters['bytes_emitted'], 8)
+        self.assertGreater(counters['nodes_visited'], counters['ast_nodes'])
+
+    def test_uninstrumented(self):
+        compiler = Compiler(FileContextManager())
+        self.assertNotIn('compile', vars(compiler))
+        self.assertNotIn('eval', vars(compiler.eval))
+
+    def test_trace(self):
+        ctx_manager = FileContextManager()
+        ctx_manager.files['main.asm'] = cleandoc("""
+        .include "lib.asm"
+        .text $1000
+            twice 1
+        """)
+        ctx_manager.files['lib.asm'] = cleandoc("""
+        .macro twice, value
+            .byte value, value
+        .end
+        """)
+        compiler = Compiler(ctx_manager)
+        profiler = Profiler(trace=True)
+        profiler.instrument_compiler(compiler)
+        compiler.compile_file('main.asm')
+
+        events = {x['name']: x for x in profiler.events}
+        self.assertEqual(set(events), {'grammar', 'parse main.asm',
+                'reduce main.asm', 'compile', 'include lib.asm',
+                'parse lib.asm', 'reduce lib.asm', 'macro twice',
+                'fixup 0 pending'})
+        for event in events.values():
+            self.assertEqual(event['ph'], 'X')
+
+        # the included file is parsed within its include span
+        include = events['include lib.asm']
+        parse = events['parse lib.asm']
+        self.assertLessEqual(include['ts'], parse['ts'])
+        self.assertGreaterEqual(include['ts'] + include['dur'],
+                parse['ts'] + parse['dur'])
@@ -0,0 +1,57 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import json
+from filetest import FileTestCase
+from xcomp.project import Project
+from xcomp.project import ProjectException
+
+
+class ProjectTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write('src/common.inc', '.def color 5\n')
+        for name in ['a', 'b']:
+            self.write(f'src/{name}.asm',
+                    '.include "common.inc"\n.text $0800\nlda #color\n')
+        self.write('xcomp.json', json.dumps({
+            'include': ['src'],
+            'targets': {
+                'a': {'source': 'src/a.asm', 'output': 'build/a.bin',
+                      'mapfile': 'build/a.map', 'segments': ['text']},
+                'b': {'source': 'src/b.asm', 'output': 'build/b.prg',
+                      'out_format': 'prg', 'segments': ['text']},
+            },
+        }))
+        self.project = Project(os.path.join(self.path, 'xcomp.json'))
+
+    def build(self, *args, **kwargs):
+        return {x.name: x for x in self.project.build(*args, **kwargs)}
+
+    def test_build(self):
+        results = self.build(jobs=2)
+        self.assertEqual([x.status for x in results.values()], ['built', 'built'])
+        self.assertEqual(self.read('build/a.bin'), bytes([0xA9, 0x05]))
+        self.assertEqual(self.read('build/b.prg'), bytes([0x01, 0x08, 0xA9, 0x05]))
+
+    def test_rebuild(self):
+        self.build(jobs=1)
+        results = self.build(jobs=1)
+        self.assertEqual(results['a'].status, 'up to date')
+        self.write('src/b.asm', '.text $0800\nnop\n')
+        results = self.build(jobs=1)
+        self.assertEqual(results['a'].status, 'up to date')
+        self.assertEqual(results['b'].status, 'built')
+        self.assertEqual(self.read('build/b.prg'), bytes([0x01, 0x08, 0xEA]))
+
+    def test_failed(self):
+        self.write('src/a.asm', 'lda #undefined\n')
+        results = self.build(['a'])
+        self.assertEqual(results['a'].status, 'failed')
+        self.assertRegex(results['a'].error, 'Identifier undefined is undefined')
+
+    def test_unknown_target(self):
+        with self.assertRaisesRegex(ProjectException, 'Unknown target "c"'):
+            self.build(['c'])
@@ -84,3 +84,10 @@ class TestReduceParser(unittest.TestCase):
         self.assertEqual(self.parse(full_text, 'expr'), [[
             'group expression: 3 * 2',
         ]])
+
+    def test_ignored_expr(self):
+        self.assertTrue(self.parser.is_ignored_expr('lparen'))
+        self.assertFalse(self.parser.is_ignored_expr('value'))
+        self.assertEqual(self.parser._ignored, {'lparen': True, 'value': False})
+        self.assertTrue(self.parser.is_ignored_expr('lparen'))
+        self.assertFalse(self.parser.is_ignored_expr('value'))
@@ -0,0 +1,111 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import os
+import stat
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from filetest import FileTestCase
+from xcomp.server import CompileServer
+from xcomp.server import FileStore
+from xcomp.client import forward
+
+
+class ServerTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.socket = os.path.join(self.path, 'xcomp.sock')
+        self.server = CompileServer(self.socket)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def forward(self, *argv):
+        return forward(self.socket, ['compile'] + list(argv) +
+                ['-i', self.path, '-s', 'text'], False)
+
+    def test_compile(self):
+        self.write('root.asm', '.text $0800\nnop\n')
+        output, result = self.forward('root.asm', '-o', f'{self.path}/out.bin')
+        self.assertTrue(result)
+        self.assertEqual(self.read('out.bin'), bytes([0xEA]))
+
+    def test_changed_file(self):
+        self.write('root.asm', '.text $0800\nnop\n')
+        self.forward('root.asm', '-o', f'{self.path}/out.bin')
+        self.write('root.asm', '.text $0800\nnop\nrts\n')
+        self.forward('root.asm', '-o', f'{self.path}/out.bin')
+        self.assertEqual(self.read('out.bin'), bytes([0xEA, 0x60]))
+
+    def test_client_defaults(self):
+        self.write('root.asm', '.text $0800\nnop\n')
+        output, result = forward(self.socket,
+                ['compile', 'root.asm', '-i', self.path],
+                False, {'output': f'{self.path}/env.bin', 'segment': ['text']})
+        self.assertTrue(result)
+        self.assertEqual(self.read('env.bin'), bytes([0xEA]))
+
+    def test_changed_during_request(self):
+        self.write('root.asm', '.text $0800\nnop\n')
+        os.utime(os.path.join(self.path, 'root.asm'), ns=(0, 0))
+        store = FileStore([self.path])
+        ctx_manager = store.checkout()
+        ctx_manager.get_text('root.asm')
+        # saved after it was read, but before the request finished
+        self.write('root.asm', '.text $0800\nrts\n')
+        store.checkin(ctx_manager)
+        self.assertEqual(store.watcher.changed(), ['root.asm'])
+
+    def test_error(self):
+        output, result = self.forward('missing.asm')
+        self.assertFalse(result)
+        self.assertRegex(output, 'Cannot find "missing.asm"')
+
+    def test_concurrent(self):
+        for ii in range(8):
+            self.write(f'root{ii}.asm', f'.text $0800\nlda #{ii}\n')
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda ii: self.forward(
+                    f'root{ii}.asm', '-o', f'{self.path}/out{ii}.bin'), range(8)))
+        self.assertTrue(all(x[1] for x in results))
+        for ii in range(8):
+            self.assertEqual(self.read(f'out{ii}.bin'), bytes([0xA9, ii]))
+
+    def test_changed_file_ast_evicted(self):
+        for ii in range(4):
+            self.write('root.asm', f'.text $0800\nlda #{ii}\n')
+            self.forward('root.asm', '-o', f'{self.path}/out.bin')
+        self.assertEqual(self.read('out.bin'), bytes([0xA9, 3]))
+        asts = [x for x in self.server.ast_cache.asts if x[0] == 'root.asm']
+        self.assertEqual(len(asts), 1)
+
+    def test_request_log_levels(self):
+        self.write('root.asm', '.text $0800\nlda #1\n')
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda ii: self.forward('root.asm',
+                    '-o', f'{self.path}/out{ii}.bin',
+                    *(['--trace', 'compiler'] if ii % 2 else [])), range(8)))
+        for ii, (output, result) in enumerate(results):
+            self.assertTrue(result)
+            if ii % 2:
+                self.assertIn('DEBUG: optimizing to single-byte arg', output)
+            else:
+                self.assertNotIn('DEBUG:', output)
+        self.assertEqual(logging.getLogger('xcomp.compiler').level, logging.WARN)
+
+    def test_untrusted_socket(self):
+        self.write('root.asm', '.text $0800\nnop\n')
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket).st_mode), 0o600)
+        os.chmod(self.socket, 0o666)
+        with self.assertLogs('xcomp.client', logging.WARNING):
+            self.assertIsNone(self.forward('root.asm', '-o', f'{self.path}/out.bin'))
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'out.bin')))
+
+    def test_no_server(self):
+        self.assertIsNone(forward(os.path.join(self.path, 'none.sock'), [], False))
@@ -0,0 +1,37 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import unittest
+from xcomp.utils import format_hex
+from xcomp.utils import hex_table
+
+
+class HexDumpTest(unittest.TestCase):
+    def test_format(self):
+        data = bytearray(0x10000)
+        data[0x1000:0x1013] = b'Hello, World!\x00\x7f\xff\x01\x02\x03'
+        self.assertEqual(format_hex(data, 0x1000, 0x1013), [
+            '1000  48 65 6C 6C 6F 2C 20 57 6F 72 6C 64 21 00 7F FF  Hello, World!...',
+            '1010  01 02 03                                         ...',
+        ])
+
+    def test_collapse(self):
+        data = bytes(16) * 4 + b'\x01' * 16 + bytes(16) * 2
+        lines = [
+            '0000  00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00  ................',
+            '*',
+            '0040  01 01 01 01 01 01 01 01 01 01 01 01 01 01 01 01  ................',
+            '0050  00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00  ................',
+            '0060  00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00  ................',
+        ]
+        self.assertEqual(format_hex(data, 0, len(data)), lines)
+        self.assertEqual(len(format_hex(data, 0, len(data), collapse=False)), 7)
+
+    def test_table(self):
+        self.assertEqual(len(hex_table('ascii')), 256)
+        table = hex_table('petscii-c64en-lc')
+        self.assertEqual(len(table), 256)
+        self.assertEqual(table[0x41], 'a')
+        self.assertEqual(table[0xc1], 'A')
+        self.assertEqual(table[0x0d], '.')
@@ -0,0 +1,35 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+from filetest import FileTestCase
+from xcomp.compiler_base import FileContextManager
+from xcomp.watch import Watcher
+
+
+class WatcherTest(FileTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx_manager = FileContextManager([self.path])
+        self.watcher = Watcher(self.ctx_manager)
+        self.write('root.asm', mtime=0)
+        self.write('lib.asm', mtime=0)
+
+    def test_changed(self):
+        self.ctx_manager.get_text('root.asm')
+        self.ctx_manager.get_text('lib.asm')
+        self.watcher.update()
+        self.assertEqual(self.watcher.changed(), [])
+        self.write('lib.asm', mtime=10 ** 9)
+        self.assertEqual(self.watcher.changed(), ['lib.asm'])
+        self.assertEqual(self.watcher.wait(), ['lib.asm'])
+
+    def test_changed_during_compile(self):
+        self.ctx_manager.get_text('root.asm')
+        before = self.watcher.snapshot()
+        # lib.asm is read for the first time, and root.asm is saved, while
+        # the compile runs
+        self.ctx_manager.get_text('lib.asm')
+        self.write('root.asm', mtime=10 ** 9)
+        self.watcher.update(before)
+        self.assertEqual(self.watcher.changed(), ['root.asm'])
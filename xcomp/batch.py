@@ -0,0 +1,152 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Batch compilation of many small sources.
+
+BatchCompiler compiles a stream of sources against one grammar, one AstCache
+and one set of cached include files, reusing a small pool of memory images
+instead of allocating a new image per source.  Sources may be given as file
+names found on the include paths, as (name, text) tuples, or as BatchSource
+instances.  A BatchResult is yielded for each source, in order, as soon as
+it has been compiled; compilation errors are reported in the result rather
+than raised.
+
+    batch = BatchCompiler(include_paths=['lib'])
+    for result in batch.compile([('a.asm', 'lda #1'), 'b.asm'], workers=4):
+        print(result.name, result.error or result.data.hex())
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from attr import attrs
+from attr import Factory
+from typing import *
+from .compiler_base import FileContextManager
+from .compiler import Compiler
+from .preprocessor import AstCache
+
+log = logging.getLogger(__name__)
+
+IMAGE_SIZE = 0xFFFF
+
+
+@attrs(auto_attribs=True)
+class BatchSource(object):
+    name: str
+    text: str = None
+
+
+@attrs(auto_attribs=True)
+class BatchResult(object):
+    name: str
+    data: bytes = b''
+    start: int = 0
+    end: int = 0
+    segments: Dict[str, Tuple[int, int]] = Factory(dict)
+    map: Dict[str, int] = Factory(dict)
+    error: str = None
+
+
+class ImagePool(object):
+    '''Pool of reusable memory images.
+
+       Released images are cleared between the lowest and highest address
+       written by the compile that used them, which is much cheaper than
+       clearing or allocating a full image.
+    '''
+
+    def __init__(self):
+        self.images = []
+
+    def acquire(self):
+        if self.images:
+            return self.images.pop()
+        return bytearray(IMAGE_SIZE)
+
+    def release(self, image, start=0, end=IMAGE_SIZE):
+        image[start:end] = bytes(end - start)
+        self.images.append(image)
+
+
+def _as_source(source):
+    if isinstance(source, BatchSource):
+        return source
+    if isinstance(source, tuple):
+        return BatchSource(*source)
+    return BatchSource(source)
+
+
+class BatchCompiler(object):
+    def __init__(self, include_paths=None, segments=None):
+        self.include_paths = list(include_paths or [])
+        self.segments = segments
+        self.ast_cache = AstCache()
+        self.pool = ImagePool()
+        self.files = {}
+
+    def compile_one(self, source):
+        """Compiles a single source and returns its BatchResult."""
+        source = _as_source(source)
+        ctx_manager = FileContextManager(self.include_paths, dict(self.files))
+        if source.text is not None:
+            ctx_manager.files[source.name] = source.text
+
+        image = self.pool.acquire()
+        compiler = Compiler(ctx_manager, self.ast_cache, image)
+        result = BatchResult(source.name)
+        try:
+            compiler.compile_file(source.name)
+            result.start, result.end = compiler.get_extents(self.segments)
+            result.data = bytes(image[result.start:result.end])
+            result.map = dict(compiler.map)
+            for name, seg in compiler.segments.items():
+                result.segments[name] = (seg.start, seg.end)
+            self.pool.release(image, *(compiler.get_written_extents() or (0, 0)))
+        except Exception as e:
+            log.debug('compile of %s failed', source.name, exc_info=True)
+            result.error = str(e)
+            self.pool.release(image)
+
+        # keep include files for later sources, but not in-memory sources
+        for name, value in ctx_manager.files.items():
+            if name != source.name or source.text is None:
+                self.files.setdefault(name, value)
+        if source.text is not None:
+            self.ast_cache.invalidate(source.name)
+        return result
+
+    def compile(self, sources, workers=None, chunksize=16):
+        """Compiles sources, yielding a BatchResult for each in order.
+
+        With workers set, sources are spread across that many processes,
+        each with its own BatchCompiler."""
+
+        if not workers or workers <= 1:
+            for source in sources:
+                yield self.compile_one(source)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                initargs=(self.include_paths, self.segments)) as executor:
+            sources = [_as_source(x) for x in sources]
+            yield from executor.map(_compile_worker, sources, chunksize=chunksize)
+
+
+# per-process state for batch workers
+_worker_batch = None
+
+
+def _init_worker(include_paths, segments):
+    global _worker_batch
+    _worker_batch = BatchCompiler(include_paths, segments)
+
+
+def _compile_worker(source):
+    return _worker_batch.compile_one(source)
+
+
+def compile_batch(sources, include_paths=None, segments=None, workers=None):
+    """Compiles many sources with a new BatchCompiler; see BatchCompiler.compile."""
+    return BatchCompiler(include_paths, segments).compile(sources, workers)
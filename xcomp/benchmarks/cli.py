@@ -0,0 +1,111 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+xcomp-bench: runs the benchmark suite and compares results.
+
+    xcomp-bench run -o baseline.json
+    xcomp-bench compare baseline.json
+
+compare reruns the suite with the sizes and phases of the baseline, or loads
+a second result file with --current, and reports each phase of each
+benchmark.  It exits with status 1 if any phase has regressed.
+"""
+
+import sys
+import json
+import argparse
+from .suite import add_arguments
+from .suite import run_suite
+from .suite import write_results
+from .compare import compare
+from .compare import REGRESSED
+
+
+def progress(message):
+    print(message, file=sys.stderr)
+
+
+def do_run(args):
+    results = run_suite(args.sizes, args.samples, args.phases,
+            not args.no_memory, progress)
+    write_results(results, args.output)
+    return 0
+
+
+def format_value(metric, value):
+    if metric == 'memory':
+        return f'{value / 1024:10.1f} KiB'
+    return f'{value * 1000:10.2f} ms '
+
+
+def do_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        benchmarks = baseline['benchmarks'].values()
+        sizes = [x['size'] for x in benchmarks]
+        phases = list(dict.fromkeys(x for bench in benchmarks for x in bench['phases']))
+        current = run_suite(sizes, args.samples, phases, not args.no_memory,
+                progress)
+        if args.output:
+            write_results(current, args.output)
+
+    comparisons = compare(baseline, current, args.alpha, args.threshold,
+            args.memory_threshold)
+    for item in comparisons:
+        p_value = f'p={item.p_value:.3f}' if item.p_value is not None else ''
+        print(f'{item.benchmark:20} {item.phase:12} {item.metric:7}'
+                f' {format_value(item.metric, item.baseline)}'
+                f' -> {format_value(item.metric, item.current)}'
+                f' {item.change * 100:+7.1f}% {p_value:8} {item.status}')
+
+    regressions = [x for x in comparisons if x.status == REGRESSED]
+    if regressions:
+        print(f'{len(regressions)} regression(s) found', file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='xcomp-bench',
+            description='XComp benchmark suite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='Run the benchmark suite')
+    add_arguments(run)
+    run.add_argument('-o', '--output',
+            help='File to write results to, instead of stdout')
+    run.set_defaults(fn=do_run)
+
+    comp = subparsers.add_parser('compare',
+            help='Compare against a stored baseline')
+    comp.add_argument('baseline',
+            help='Baseline results file')
+    comp.add_argument('--current',
+            help='Results file to compare, instead of running the suite')
+    comp.add_argument('-n', '--samples', type=int, default=10,
+            help='Timed runs per phase')
+    comp.add_argument('--no-memory', action='store_true',
+            help='Skip the peak memory measurements')
+    comp.add_argument('--alpha', type=float, default=0.05,
+            help='Significance level for timing differences')
+    comp.add_argument('-t', '--threshold', type=float, default=0.05,
+            help='Slowdown of the median, as a fraction, that is a regression')
+    comp.add_argument('--memory-threshold', type=float, default=0.10,
+            help='Growth in peak memory, as a fraction, that is a regression')
+    comp.add_argument('-o', '--output',
+            help='File to write the new results to')
+    comp.set_defaults(fn=do_compare)
+
+    args = parser.parse_args(argv)
+    sys.exit(args.fn(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Comparison of benchmark results against a stored baseline.
+
+Timings are compared per benchmark and phase with a two-sided Mann-Whitney
+U test over the raw samples, which makes no assumption about how the
+timings are distributed.  A phase has regressed when the difference is
+significant and its median is slower than the baseline by more than a
+threshold.  Peak memory is deterministic enough to be compared against a
+threshold directly.
+"""
+
+import math
+from functools import lru_cache
+from attr import attrs
+from typing import *
+
+REGRESSED = 'regressed'
+IMPROVED = 'improved'
+UNCHANGED = 'unchanged'
+
+
+@attrs(auto_attribs=True)
+class Comparison(object):
+    benchmark: str
+    phase: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+    p_value: float = None
+    status: str = UNCHANGED
+
+
+def _ranks(values):
+    """Returns the ranks of values, with ties given their average rank."""
+    order = sorted(range(len(values)), key=lambda x: values[x])
+    ranks = [0.0] * len(values)
+    ii = 0
+    while ii < len(order):
+        jj = ii
+        while jj + 1 < len(order) and values[order[jj + 1]] == values[order[ii]]:
+            jj += 1
+        for kk in range(ii, jj + 1):
+            ranks[order[kk]] = (ii + jj) / 2 + 1
+        ii = jj + 1
+    return ranks
+
+
+@lru_cache(maxsize=None)
+def _u_count(n1, n2, u):
+    """Returns the number of orderings of n1 and n2 samples with statistic u."""
+    if u < 0:
+        return 0
+    if n1 == 0 or n2 == 0:
+        return 1 if u == 0 else 0
+    return _u_count(n1 - 1, n2, u - n2) + _u_count(n1, n2 - 1, u)
+
+
+def mann_whitney(a, b):
+    """Returns the two-sided p-value of a Mann-Whitney U test of a and b.
+
+    The exact distribution is used for small samples without ties, and the
+    normal approximation, with tie and continuity corrections, otherwise."""
+
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+    values = list(a) + list(b)
+    ranks = _ranks(values)
+    u1 = sum(ranks[:n1]) - n1 * (n1 + 1) / 2
+    u = min(u1, n1 * n2 - u1)
+    tied = len(set(values)) != len(values)
+
+    if not tied and n1 * n2 <= 400:
+        total = math.comb(n1 + n2, n1)
+        tail = sum(_u_count(n1, n2, x) for x in range(int(u) + 1))
+        return min(1.0, 2 * tail / total)
+
+    n = n1 + n2
+    ties = 0
+    for value in set(values):
+        t = values.count(value)
+        ties += t ** 3 - t
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (n1 * n2 / 2 - u - 0.5) / sigma
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def compare(baseline, current, alpha=0.05, threshold=0.05, memory_threshold=0.10):
+    """Compares two suite results and returns a list of Comparisons.
+
+    Benchmarks and phases missing from either result are skipped."""
+
+    comparisons = []
+    for name, base_bench in baseline['benchmarks'].items():
+        cur_bench = current['benchmarks'].get(name, None)
+        if not cur_bench:
+            continue
+        for phase, base in base_bench['phases'].items():
+            cur = cur_bench['phases'].get(phase, None)
+            if not cur:
+                continue
+
+            base_time = _median(base['samples'])
+            cur_time = _median(cur['samples'])
+            change = cur_time / base_time - 1 if base_time else 0.0
+            p_value = mann_whitney(base['samples'], cur['samples'])
+            status = UNCHANGED
+            if p_value < alpha and abs(change) > threshold:
+                status = REGRESSED if change > 0 else IMPROVED
+            comparisons.append(Comparison(name, phase, 'time', base_time,
+                    cur_time, change, p_value, status))
+
+            base_mem = base.get('peak_memory', None)
+            cur_mem = cur.get('peak_memory', None)
+            if base_mem and cur_mem:
+                change = cur_mem / base_mem - 1
+                status = UNCHANGED
+                if abs(change) > memory_threshold:
+                    status = REGRESSED if change > 0 else IMPROVED
+                comparisons.append(Comparison(name, phase, 'memory', base_mem,
+                        cur_mem, change, None, status))
+    return comparisons
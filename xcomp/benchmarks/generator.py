@@ -0,0 +1,116 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Synthetic 6502 program generator.
+
+Generates a program of roughly a requested number of lines that exercises
+the whole pipeline: a chain of included libraries, each guarded with .once
+and defining constants and a macro; many labelled routines with backward
+branches and forward calls; .scope blocks that expand macros, so scopes
+nest; and .byte tables in the data segment.
+
+The memory image is only 64K, so the text and data segments are rewound
+every few hundred routines, the way overlays would be.
+
+    python -m xcomp.benchmarks.generator -l 10000 -o /tmp/synthetic
+"""
+
+import os
+import argparse
+
+ROOT = 'main.asm'
+TEXT_START = 0x0800
+DATA_START = 0xC000
+# bytes of table data emitted by each routine
+TABLE_SIZE = 64
+# routines emitted before the segments are rewound, so that the data segment
+# stays within the 64K image
+BANK_SIZE = (0xFFFF - DATA_START) // TABLE_SIZE
+
+
+def generate_library(depth, index):
+    lines = ['.once']
+    if index + 1 < depth:
+        lines.append(f'.include "lib{index + 1}.asm"')
+    lines.extend([
+        f'.def const{index} ${index + 1:02x}',
+        f'.def port{index} ${0xD000 + index * 0x10:04x}',
+        f'.macro add{index}, addr',
+        '    lda addr',
+        '    clc',
+        f'    adc #const{index}',
+        '    sta addr',
+        '.end',
+    ])
+    return '\n'.join(lines)
+
+
+def generate_routine(index, depth):
+    macro = f'add{index % depth}'
+    table = [f'${(index * 7 + x) & 0xFF:02x}' for x in range(16)]
+    return [
+        '.data',
+        f'table{index}:',
+        *[f'    .byte {", ".join(table)}' for _ in range(TABLE_SIZE // 16)],
+        '.text',
+        f'fn{index}:',
+        '    ldx #$3f',
+        f'loop{index}:',
+        f'    lda table{index}, x',
+        f'    sta port{index % depth}, x',
+        '    dex',
+        f'    bne loop{index}',
+        '    .scope',
+        f'    jsr fn{index + 1}',
+        f'    {macro} $20',
+        f'    {macro} $22',
+        '    .end',
+        '    rts',
+    ]
+
+
+def generate(lines, depth=4, bank_size=BANK_SIZE):
+    """Returns a dict of filename to source text for a program of about
+    lines lines in total.  The root file is ROOT.  The segments are rewound
+    every bank_size routines."""
+
+    files = {f'lib{x}.asm': generate_library(depth, x) for x in range(depth)}
+    total = sum(x.count('\n') + 1 for x in files.values())
+
+    # include the chain from both ends so that .once has work to do
+    source = ['.include "lib0.asm"', f'.include "lib{depth - 1}.asm"']
+    index = 0
+    while total + len(source) < lines or index == 0:
+        if index % bank_size == 0:
+            source.extend([f'.data ${DATA_START:04x}', f'.text ${TEXT_START:04x}'])
+        source.extend(generate_routine(index, depth))
+        index += 1
+    source.extend([f'fn{index}:', '    rts'])
+    files[ROOT] = '\n'.join(source)
+    return files
+
+
+def line_count(files):
+    return sum(x.count('\n') + 1 for x in files.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic program generator')
+    parser.add_argument('-l', '--lines', type=int, default=10000,
+            help='Approximate number of lines to generate')
+    parser.add_argument('-d', '--depth', type=int, default=4,
+            help='Depth of the include chain')
+    parser.add_argument('-o', '--output', default='.',
+            help='Directory to write the generated files to')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for name, text in generate(args.lines, args.depth).items():
+        with open(os.path.join(args.output, name), 'w') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Console output benchmark.
+
+Times the output side of `xcomp pre` and `xcomp dump`: ModelPrinter over
+the pre-processed stream of a generated program, and print_hex over a full
+64K image.  Each is run with ANSI styling on and off, into a stream that
+discards the text but counts the writes made to it.  Reports the median
+time, output lines and writes per mode as JSON.
+
+    python -m xcomp.benchmarks.pre_output [-n SAMPLES] [-l LINES]
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from xcomp.compiler_base import FileContextManager
+from xcomp.preprocessor import PreProcessor
+from xcomp.decompiler import ModelPrinter
+from xcomp.printer import StylePrinter
+from xcomp.settings import default_stylesheet
+from xcomp.utils import print_hex
+from .generator import ROOT
+from .generator import generate
+
+
+class NullStream(object):
+    def __init__(self):
+        self.writes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.writes += 1
+        self.lines += text.count('\n')
+
+    def flush(self):
+        pass
+
+
+def print_pre(ast, ansimode):
+    stream = NullStream()
+    ModelPrinter(stream, ansimode=ansimode).print_ast(ast)
+    return stream
+
+
+def print_dump(data, ansimode):
+    stream = NullStream()
+    printer = StylePrinter(stream, stylesheet=default_stylesheet, ansimode=ansimode)
+    print_hex(printer, data, 0, len(data))
+    printer.flush()
+    return stream
+
+
+def measure(fn, samples, *args):
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        stream = fn(*args)
+        times.append(time.perf_counter() - start)
+    return {
+        'median': statistics.median(times),
+        'lines': stream.lines,
+        'writes': stream.writes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Console output benchmark')
+    parser.add_argument('-n', '--samples', type=int, default=3,
+            help='Runs per mode')
+    parser.add_argument('-l', '--lines', type=int, default=100000,
+            help='Generated program size in lines')
+    args = parser.parse_args()
+
+    ctx_manager = FileContextManager()
+    ctx_manager.files.update(generate(args.lines))
+    ast = list(PreProcessor(ctx_manager).parse(ROOT))
+    data = bytes(x & 0xFF for x in range(0x10000))
+
+    results = {}
+    for mode, ansimode in [('plain', False), ('ansi', True)]:
+        results[f'pre-{mode}'] = measure(print_pre, args.samples, ast, ansimode)
+        results[f'dump-{mode}'] = measure(print_dump, args.samples, data, ansimode)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+CLI startup benchmark.
+
+Runs each subcommand in a fresh interpreter and reports the time to the
+first byte of output, the total run time, and the import time reported by
+`python -X importtime`.  Results are printed as JSON.
+
+    python -m xcomp.benchmarks.startup [-n SAMPLES]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+SOURCE = """
+.text $0801
+start:
+    lda #$00
+    sta $d020
+    jmp start
+"""
+
+COMMANDS = {
+    'help': ['help'],
+    'find': ['find', '*.asm'],
+    'pre': ['pre', 'main.asm'],
+    'dump': ['dump', 'main.asm'],
+    'compile': ['compile', 'main.asm', '-o', 'main.bin'],
+}
+
+
+def xcomp_cmd(*args):
+    return [sys.executable, *args, '-c',
+            'import sys; from xcomp.cli import main; main()']
+
+
+def time_to_first_output(argv, cwd):
+    """Returns (first output, total) wall times in seconds for one run."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(xcomp_cmd() + argv, cwd=cwd,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    proc.stdout.read(1)
+    first = time.perf_counter() - start
+    proc.stdout.read()
+    proc.wait()
+    return first, time.perf_counter() - start
+
+
+def import_time(argv, cwd):
+    """Returns the cumulative import time in seconds of all top-level imports."""
+    proc = subprocess.run(xcomp_cmd('-X', 'importtime') + argv, cwd=cwd,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented beyond the single separator space
+        if cumulative.strip().isdigit() and not name.startswith('  '):
+            total += int(cumulative)
+    return total / 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup benchmark')
+    parser.add_argument('-n', '--samples', type=int, default=5,
+            help='Runs per subcommand')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        with open(os.path.join(cwd, 'main.asm'), 'w') as f:
+            f.write(SOURCE)
+        env_server = os.environ.pop('XCOMP_SERVER', None)
+        os.environ['XCOMP_SERVER'] = ''
+        try:
+            for name, argv in COMMANDS.items():
+                runs = [time_to_first_output(argv, cwd) for _ in range(args.samples)]
+                results[name] = {
+                    'first_output': statistics.median([x[0] for x in runs]),
+                    'total': statistics.median([x[1] for x in runs]),
+                    'imports': import_time(argv, cwd),
+                }
+        finally:
+            if env_server is not None:
+                os.environ['XCOMP_SERVER'] = env_server
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
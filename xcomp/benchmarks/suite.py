@@ -0,0 +1,181 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Pipeline benchmark suite.
+
+Generates synthetic programs of each requested size and measures the main
+phases of the pipeline separately:
+
+- parse: Parser.parse of every file
+- preprocess: PreProcessor.parse of the root file, with every file already
+  parsed, so only include and macro expansion is measured
+- compile: Compiler.compile of the pre-processed stream
+- print: ModelPrinter.print_ast of the pre-processed stream
+
+Each phase is run once to warm up, timed over several samples, then run under
+tracemalloc for its peak memory.  Results are emitted as JSON, including the
+raw samples, so that runs from different commits can be compared.
+
+    python -m xcomp.benchmarks.suite -s 1000 10000 -n 5 -o results.json
+"""
+
+import gc
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.preprocessor import PreProcessor
+from xcomp.preprocessor import AstCache
+from xcomp.parser import Parser
+from xcomp.decompiler import ModelPrinter
+from xcomp.version import __VERSION__
+from .generator import ROOT
+from .generator import generate
+from .generator import line_count
+
+PHASES = ['parse', 'preprocess', 'compile', 'print']
+DEFAULT_SIZES = [1000, 10000]
+
+
+class Workload(object):
+    """Inputs for each phase, prepared from a generated program."""
+
+    def __init__(self, size):
+        self.files = generate(size)
+        self.lines = line_count(self.files)
+        self.parser = Parser()
+        self.ctx_manager = FileContextManager()
+        self.ctx_manager.files.update(self.files)
+        self.ast_cache = AstCache()
+        self.ast_cache.parser = self.parser
+        self.stream = self.run_preprocess()
+
+    def run_parse(self):
+        for name, text in self.files.items():
+            self.parser.parse(text, context=name)
+
+    def run_preprocess(self):
+        preprocessor = PreProcessor(self.ctx_manager, self.ast_cache)
+        return list(preprocessor.parse(ROOT))
+
+    def run_compile(self):
+        Compiler(self.ctx_manager).compile(self.stream)
+
+    def run_print(self):
+        ModelPrinter(io.StringIO(), ansimode=False).print_ast(self.stream)
+
+
+def time_phase(fn, samples):
+    """Returns wall times in seconds for samples runs of fn, after a warm-up
+    run that is not timed."""
+    fn()
+    times = []
+    for _ in range(samples):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def peak_memory(fn):
+    """Returns the peak memory in bytes allocated while running fn."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_name(size):
+    return f'synthetic-{size}'
+
+
+def run_benchmark(size, samples=5, phases=PHASES, memory=True):
+    """Runs the phases for one program size and returns its results."""
+    workload = Workload(size)
+    results = {'size': size, 'lines': workload.lines, 'phases': {}}
+    for phase in phases:
+        fn = getattr(workload, f'run_{phase}')
+        times = time_phase(fn, samples)
+        median = statistics.median(times)
+        results['phases'][phase] = {
+            'samples': times,
+            'median': median,
+            'lines_per_sec': workload.lines / median if median else None,
+            'peak_memory': peak_memory(fn) if memory else None,
+        }
+    return results
+
+
+def get_meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'version': __VERSION__,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_suite(sizes=DEFAULT_SIZES, samples=5, phases=PHASES, memory=True,
+        progress=None):
+    """Runs every benchmark and returns the results as a JSON-ready dict."""
+    results = {'meta': get_meta(), 'benchmarks': {}}
+    for size in sizes:
+        if progress:
+            progress(f'running {benchmark_name(size)}')
+        results['benchmarks'][benchmark_name(size)] = run_benchmark(size,
+                samples, phases, memory)
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+            help='Program sizes in lines, from 1000 to 1000000')
+    parser.add_argument('-n', '--samples', type=int, default=5,
+            help='Timed runs per phase')
+    parser.add_argument('-p', '--phases', nargs='+', choices=PHASES, default=PHASES,
+            help='Phases to measure')
+    parser.add_argument('--no-memory', action='store_true',
+            help='Skip the peak memory measurements')
+
+
+def write_results(results, filename=None):
+    if filename:
+        with open(filename, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline benchmark suite')
+    add_arguments(parser)
+    parser.add_argument('-o', '--output',
+            help='File to write results to, instead of stdout')
+    args = parser.parse_args()
+    results = run_suite(args.sizes, args.samples, args.phases, not args.no_memory,
+            progress=lambda x: print(x, file=sys.stderr))
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
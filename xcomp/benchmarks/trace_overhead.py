@@ -0,0 +1,95 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Trace logging overhead benchmark.
+
+Compiles a generated source with the `--trace` loggers disabled, and again
+with them enabled and writing to a discarded stream.  Reports the median
+compile time for each as JSON.  With tracing off, the hot paths only test a
+flag, so 'off' should match an uninstrumented compile.
+
+    python -m xcomp.benchmarks.trace_overhead [-n SAMPLES] [-l LINES]
+"""
+
+import io
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+from xcomp.compiler_base import FileContextManager
+from xcomp.compiler import Compiler
+from xcomp.preprocessor import AstCache
+
+TRACE_MODULES = [
+    'xcomp.compiler',
+    'xcomp.eval',
+    'xcomp.preprocessor',
+    'xcomp.parser',
+    'xcomp.reduce_parser',
+]
+
+
+def generate(lines):
+    source = ['.text $1000', 'start:']
+    for ii in range(lines):
+        source.append(f'    lda #{ii & 0xFF}')
+        source.append(f'    sta ${0x2000 + ii:04x}')
+        source.append(f'    .byte {ii & 0xFF}, {(ii * 7) & 0xFF}')
+    source.append('    jmp start')
+    return '\n'.join(source)
+
+
+def set_trace(enabled):
+    for name in TRACE_MODULES:
+        logging.getLogger(name).setLevel(logging.DEBUG if enabled else logging.WARN)
+
+
+def time_compile(parser, text):
+    ctx_manager = FileContextManager()
+    ctx_manager.files['main.asm'] = text
+    ast_cache = AstCache()
+    ast_cache.parser = parser
+    start = time.perf_counter()
+    Compiler(ctx_manager, ast_cache).compile_file('main.asm')
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trace logging overhead benchmark')
+    parser.add_argument('-n', '--samples', type=int, default=5,
+            help='Compiles per mode')
+    parser.add_argument('-l', '--lines', type=int, default=500,
+            help='Generated source size, in groups of lines')
+    args = parser.parse_args()
+
+    from xcomp.parser import Parser
+    text = generate(args.lines)
+    xcomp_parser = Parser()
+    handler = logging.StreamHandler(io.StringIO())
+    root = logging.getLogger()
+    root.addHandler(handler)
+
+    results = {}
+    try:
+        for mode, enabled in [('off', False), ('on', True)]:
+            set_trace(enabled)
+            runs = []
+            for _ in range(args.samples):
+                handler.stream.seek(0)
+                handler.stream.truncate()
+                runs.append(time_compile(xcomp_parser, text))
+            results[mode] = statistics.median(runs)
+    finally:
+        set_trace(False)
+        root.removeHandler(handler)
+    results['overhead'] = results['on'] / results['off']
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
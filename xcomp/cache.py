@@ -0,0 +1,165 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Content-addressed cache of compilation results.
+
+Entries are keyed on the root source file, include paths and compiler
+options.  Each entry records the content hash of every file fetched through
+the FileContextManager while compiling, and is only used if all of those
+files still hash the same.  A hit restores the memory image, segment
+extents, map and pragmas without parsing or compiling anything.
+
+The cache is a directory of entry files.  Entries are touched on use, and the
+least recently used entries are evicted once the directory grows past its
+size cap.
+"""
+
+import os
+import zlib
+import pickle
+import hashlib
+import logging
+from attr import attrs
+from attr import Factory
+from typing import *
+from .version import __VERSION__
+
+log = logging.getLogger(__name__)
+
+CACHE_EXT = '.xcache'
+
+
+def content_hash(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
+
+
+@attrs(auto_attribs=True)
+class CacheEntry(object):
+    dependencies: Dict[str, Tuple[str, str]] = Factory(dict)
+    data: bytes = b''
+    segments: Dict[str, Tuple] = Factory(dict)
+    map: Dict[str, int] = Factory(dict)
+    pragma: Dict[str, Any] = Factory(dict)
+
+    @classmethod
+    def fromCompiler(self, compiler):
+        ctx_manager = compiler.ctx_manager
+        entry = CacheEntry(data=zlib.compress(bytes(compiler.data)),
+                map=dict(compiler.map), pragma=dict(compiler.pragma))
+        for name, mode in ctx_manager.dependencies.items():
+            value = ctx_manager.get_text(name, mode)
+            entry.dependencies[name] = (mode, content_hash(value))
+        for name, seg in compiler.segments.items():
+            entry.segments[name] = (seg._start, seg._end, seg._offset)
+        return entry
+
+    def is_valid(self, ctx_manager):
+        for name, (mode, digest) in self.dependencies.items():
+            try:
+                value = ctx_manager.get_text(name, mode)
+            except Exception:
+                return False
+            if content_hash(value) != digest:
+                log.debug('cache: %s has changed', name)
+                return False
+        return True
+
+    def restore(self, compiler):
+        compiler.data[:] = zlib.decompress(self.data)
+        compiler.map = dict(self.map)
+        compiler.pragma = dict(self.pragma)
+        for name, (start, end, offset) in self.segments.items():
+            seg = compiler.segments[name]
+            seg._start, seg._end, seg._offset = start, end, offset
+
+
+class BuildCache(object):
+    def __init__(self, path, max_size=64 * 1024 * 1024):
+        self.path = os.path.expanduser(path)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def get_key(self, filename, ctx_manager, options=None):
+        """Returns the cache key for compiling filename with ctx_manager."""
+        full_filename = ctx_manager.search_file(filename)
+        parts = [
+            __VERSION__,
+            os.path.abspath(full_filename) if full_filename else filename,
+            [os.path.abspath(os.path.expanduser(x))
+                for x in ctx_manager.include_paths],
+            sorted((options or {}).items()),
+        ]
+        return content_hash(repr(parts))
+
+    def _entry_filename(self, key):
+        return os.path.join(self.path, key + CACHE_EXT)
+
+    def _load(self, filename, ctx_manager):
+        """Returns the entry in filename if it is valid for ctx_manager.
+
+        Entries that cannot be loaded or checked, such as corrupt entries
+        or those written with an older model layout, are deleted."""
+
+        try:
+            f = open(filename, 'rb')
+        except OSError:
+            return None
+        try:
+            with f:
+                entry = pickle.load(f)
+            if not isinstance(entry, CacheEntry):
+                raise TypeError(f'unexpected {type(entry).__name__}')
+            if entry.is_valid(ctx_manager):
+                return entry
+        except Exception as e:
+            log.debug('cache: removing unreadable entry %s: %s', filename, e)
+            self._remove(filename)
+        return None
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def lookup(self, key, ctx_manager):
+        """Returns the valid entry for key, or None on a miss."""
+        filename = self._entry_filename(key)
+        entry = self._load(filename, ctx_manager)
+        if entry is None:
+            self.misses += 1
+            return None
+        os.utime(filename)
+        self.hits += 1
+        return entry
+
+    def store(self, key, entry):
+        filename = self._entry_filename(key)
+        tmp_filename = f'{filename}.{os.getpid()}.tmp'
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_filename, filename)
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits its cap."""
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for item in it:
+                if item.name.endswith(CACHE_EXT):
+                    st = item.stat()
+                    entries.append((st.st_mtime, st.st_size, item.path))
+                    total += st.st_size
+        entries.sort()
+        while total > self.max_size and entries:
+            _, size, filename = entries.pop(0)
+            log.debug('cache: evicting %s', filename)
+            self._remove(filename)
+            total -= size
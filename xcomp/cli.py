@@ -6,29 +6,56 @@
 Xcomp 6502 compiler suite.
 '''
 
+# Only light modules are imported here.  The compiler, grammar, printer and
+# their dependencies are imported by the subcommands that need them, so that
+# startup stays fast for simple commands and for forwarding to a server.
 import os
 import sys
 import argparse
 import io
-import difflib
 import logging
-from .printer import StylePrinter
-from .printer import StyleFormatter
+import time
+import signal
 from .utils import *
 from .settings import *
-from .preprocessor import PreProcessor
-from .compiler_base import FileContextManager
-from .compiler import Compiler
-from .decompiler import ModelPrinter
+from .client import server_commands
+from .client import forward
+from .logconfig import RequestLogHandler
+from .logconfig import RequestLogging
+from .logconfig import StyledStreamHandler
+from .logconfig import request_levels
 
 log = logging.getLogger(__name__)
 
 class Application(object):
-    def __init__(self):
+    # logging handler shared by all instances
+    _log_handler = None
+
+    def __init__(self, cwd=None, stream=None, ansimode=None, ast_cache=None,
+            ctx_factory=None, defaults=None):
+        """Creates the application.
+
+        By default the application works relative to the process working
+        directory and writes to stdout.  The optional arguments allow a
+        server to run many applications in one process: cwd resolves
+        relative paths, stream receives all output, ast_cache and
+        ctx_factory provide shared parse and file caches, and defaults
+        replaces the command-line defaults taken from this process's
+        environment.
+        """
+
+        self.cwd = cwd
+        self.stream = stream
+        self.ansimode = ansimode if ansimode is not None else not is_piped()
+        self.ast_cache = ast_cache
+        self.ctx_factory = ctx_factory
+        self._printer = None
+        defaults = dict(cli_defaults, **(defaults or {}))
+
         # configure CLI parser
         parser = argparse.ArgumentParser(description=__doc__)
         subparsers = parser.add_subparsers(help='Sub-command help')
-        parser.set_defaults(**cli_defaults)
+        parser.set_defaults(**defaults)
 
         helper = subparsers.add_parser('help', help='Show help')
         helper.add_argument('topic', nargs='?', default=None,
@@ -49,135 +76,441 @@ class Application(object):
         compiler_flags.add_argument('-s', '--segment', nargs='*', action='extend',
                 choices=['zero', 'bss', 'data', 'text'],
                 help='Segments to emit')
+        compiler_flags.add_argument('-D', '--define', action='append',
+                metavar='NAME[=VALUE]',
+                help='Defines a symbol for .if and .ifdef (VALUE defaults to 1)')
         compiler_flags.add_argument('source_file',
                 help='Source file to process')
 
-        compiler = subparsers.add_parser('compile', parents=[flags, compiler_flags],
-                help='Compile program')
-        compiler.add_argument('-o', '--output',
+        output_flags = argparse.ArgumentParser(add_help=False)
+        output_flags.add_argument('-o', '--output',
                 help='Output file')
-        compiler.add_argument('--out-format', choices=['raw', 'prg'],
+        output_flags.add_argument('--out-format', choices=['raw', 'prg'],
                 help='Output format')
-        compiler.add_argument('-m', '--mapfile', nargs='?',
+        output_flags.add_argument('-m', '--mapfile', nargs='?',
                 help='Path to optional mapfile')
-        compiler.set_defaults(fn=self.do_compile, **cli_defaults)
+
+        compiler = subparsers.add_parser('compile',
+                parents=[flags, compiler_flags, output_flags],
+                help='Compile program')
+        compiler.add_argument('--cache-dir',
+                help='Directory for cached compilation results')
+        compiler.add_argument('--cache-size', type=int,
+                help='Maximum size of the cache directory in bytes')
+        compiler.add_argument('--from-pre', action='store_true',
+                help='Compile a file written by pre --format=bin instead of source')
+        compiler.add_argument('--prefetch', action='store_true',
+                help='Load included files in the background while compiling')
+        compiler.add_argument('-w', '--watch', action='store_true',
+                help='Recompile whenever a source file changes')
+        compiler.add_argument('--watch-interval', type=float, default=0.1,
+                help='Seconds between checks for changed files')
+        compiler.add_argument('--profile', action='store_true',
+                help='Print time spent and work done in each compile phase')
+        compiler.add_argument('--profile-out',
+                help='Write the profile as JSON to this file')
+        compiler.add_argument('--trace-out',
+                help='Write a Chrome trace of compile phases to this file')
+        compiler.add_argument('--memprofile', action='store_true',
+                help='Print memory use and allocation sites for each compile phase')
+        compiler.set_defaults(fn=self.do_compile, **defaults)
+
+        asm = subparsers.add_parser('asm', parents=[flags, compiler_flags],
+                help='Assemble a source file to a fixed-origin object file')
+        asm.add_argument('-o', '--output',
+                help='Output object file (defaults to source name with .o)')
+        asm.add_argument('-f', '--force', action='store_true',
+                help='Reassemble even if the object file is up to date')
+        asm.set_defaults(fn=self.do_asm, **dict(defaults, output=None))
+
+        link = subparsers.add_parser('link', parents=[flags, output_flags],
+                help='Link object files into a program')
+        link.add_argument('-s', '--segment', nargs='*', action='extend',
+                choices=['zero', 'bss', 'data', 'text'],
+                help='Segments to emit')
+        link.add_argument('object_files', nargs='+',
+                help='Object files to link')
+        link.set_defaults(fn=self.do_link, **defaults)
 
         dump = subparsers.add_parser('dump', parents=[flags, compiler_flags],
                 help='Dump compilation results to console')
-        dump.set_defaults(fn=self.do_dump, **cli_defaults)
+        dump.add_argument('--charset', choices=hex_charsets, default='ascii',
+                help='Character set for the text column of the hex dump')
+        dump.add_argument('--no-collapse', action='store_true',
+                help='Show every line of the hex dump, including repeated lines')
+        dump.set_defaults(fn=self.do_dump, **defaults)
 
         pre = subparsers.add_parser('pre', parents=[flags, compiler_flags],
                 help='Generate preprocessor output')
-        pre.set_defaults(fn=self.do_preprocess, **cli_defaults)
+        pre.add_argument('--format', choices=['text', 'bin'], default='text',
+                help='Output printed source, or the binary format read by compile --from-pre')
+        pre.add_argument('-o', '--output',
+                help='Output file (defaults to stdout)')
+        pre.set_defaults(fn=self.do_preprocess, **dict(defaults, output=None))
 
         fmt = subparsers.add_parser('fmt', parents=[flags],
-                help='Re-formats a source file and displays a diff')
+                help='Re-formats source files and displays a diff')
         fmt.add_argument('-t', '--test', action='store_true',
-                help='Runs the formatter in test mode and does not rewrite file (lint)')
-        fmt.add_argument('source_file',
-                help='Source file to process')
-        fmt.set_defaults(fn=self.do_fmt, **cli_defaults)
+                help='Runs the formatter in test mode and does not rewrite files (lint)')
+        fmt.add_argument('-j', '--jobs', type=int,
+                help='Number of worker processes (defaults to CPU count)')
+        fmt.add_argument('sources', nargs='+',
+                help='Source files, or directories of .asm and .inc files, to process')
+        fmt.set_defaults(fn=self.do_fmt, **defaults)
+
+        build = subparsers.add_parser('build', parents=[flags],
+                help='Builds the targets of a project manifest')
+        build.add_argument('-p', '--project',
+                help='Project manifest file')
+        build.add_argument('-j', '--jobs', type=int,
+                help='Number of worker processes (defaults to CPU count)')
+        build.add_argument('--no-cache', action='store_true',
+                help='Rebuild all targets, ignoring cached results')
+        build.add_argument('targets', nargs='*',
+                help='Targets to build (defaults to all targets)')
+        build.set_defaults(fn=self.do_build, **defaults)
+
+        serve = subparsers.add_parser('serve', parents=[flags],
+                help='Runs a compile server on a local socket')
+        serve.add_argument('--socket',
+                help='Path of the Unix domain socket to listen on')
+        serve.set_defaults(fn=self.do_serve, **defaults)
+
+        disasm = subparsers.add_parser('disasm', parents=[flags],
+                help='Disassembles a binary image to source')
+        disasm.add_argument('-f', '--in-format', choices=['raw', 'prg'],
+                help='Input format (defaults to prg for .prg files, else raw)')
+        disasm.add_argument('--origin', type=parse_address, default=0,
+                help='Load address of a raw image')
+        disasm.add_argument('-e', '--entry', type=parse_address, nargs='+',
+                action='extend',
+                help='Code entry points (defaults to the load address and '
+                     'any interrupt vectors in the image)')
+        disasm.add_argument('-o', '--output',
+                help='Output source file (defaults to the console)')
+        disasm.add_argument('binary_file',
+                help='Binary file to disassemble')
+        disasm.set_defaults(fn=self.do_disasm, **dict(defaults, output=None))
 
         find = subparsers.add_parser('find', parents=[flags],
                 help='Locates files on the configured include path(s)')
         find.add_argument('-i', '--include', nargs='+', action='extend',
                 help='Paths to search for included files')
+        find.add_argument('--index-dir',
+                help='Directory for persisted file indexes of the include paths')
         find.add_argument('search',
                 help='Glob file pattern to search for.')
-        find.set_defaults(fn=self.do_find, **cli_defaults)
+        find.set_defaults(fn=self.do_find, **defaults)
 
         parser.set_defaults(fn=self.do_help, topic=None, help_topics={
-            'compile': compiler.format_help(),
-            'dump': dump.format_help(),
-            'pre': pre.format_help(),
-            'fmt': fmt.format_help(),
-            'find': find.format_help(),
-            'help': helper.format_help(),
+            'compile': compiler,
+            'asm': asm,
+            'link': link,
+            'dump': dump,
+            'pre': pre,
+            'fmt': fmt,
+            'build': build,
+            'serve': serve,
+            'disasm': disasm,
+            'find': find,
+            'help': helper,
         })
         self.parser = parser
 
+    @property
+    def printer(self):
+        """The printer for command output.  It is created on first use, so
+        that commands that print nothing do not import it."""
+        if self._printer is None:
+            from .printer import StylePrinter
+            self._printer = StylePrinter(self.stream,
+                    stylesheet=default_stylesheet, ansimode=self.ansimode)
+        return self._printer
+
     @property
     def ctx_manager(self):
         if not getattr(self, '_ctx_manager', None):
-            self._ctx_manager = FileContextManager(self.include)
+            ctx_factory = self.ctx_factory
+            if not ctx_factory:
+                from .compiler_base import FileContextManager as ctx_factory
+            self._ctx_manager = ctx_factory(self.include)
         return self._ctx_manager
 
     def do_help(self):
-        self.printer.text(self.help_topics.get(self.topic, self.parser.format_help()))
+        # help is rendered on demand, as formatting every subparser is slow
+        parser = self.help_topics.get(self.topic, self.parser)
+        self.printer.text(parser.format_help())
 
     def do_dump(self):
-        compiler = Compiler(self.ctx_manager)
+        from .compiler import Compiler
+        compiler = Compiler(self.ctx_manager, self.ast_cache, defines=self.defines)
         compiler.compile_file(self.source_file)
         start, end = compiler.get_extents(self.segment)
 
         printer = self.printer
-        printer.title('Segment Data').nl()
-        for name, seg in compiler.segments.items():
-            seg = compiler.segments[name]
-            printer.bold(f'  {name:5}: ')
-            printer.text(f'${seg.start:04X}-${seg.end:04X}')
+        with printer.buffered():
+            printer.title('Segment Data').nl()
+            for name, seg in compiler.segments.items():
+                seg = compiler.segments[name]
+                printer.bold(f'  {name:5}: ')
+                printer.text(f'${seg.start:04X}-${seg.end:04X}')
+                printer.nl()
             printer.nl()
-        printer.nl()
 
-        printer.title('Hex Dump').nl()
-        printer.text(f'Range: ${start:04X}-${end:04X}')
-        printer.text(f' - Size: ${end-start:04X} ({end-start}) bytes').nl()
-        print_hex(printer, compiler.data, start, end)
+            printer.title('Hex Dump').nl()
+            printer.text(f'Range: ${start:04X}-${end:04X}')
+            printer.text(f' - Size: ${end-start:04X} ({end-start}) bytes').nl()
+            print_hex(printer, compiler.data, start, end, charset=self.charset,
+                    collapse=not self.no_collapse)
+
+            printer.title('Map').nl()
+            for k, v in compiler.map.items():
+                printer.key(k).value(f'{v:04x}').nl()
+
+    def write_output(self, image):
+        """Writes the selected segments of a compiled image, and its mapfile."""
+        from .output import get_binary
+        from .output import get_mapfile
+        from .output import write_file
+        write_file(self.output, get_binary(image, self.segment, self.out_format))
+        if self.mapfile:
+            write_file(self.mapfile, get_mapfile(image))
+
+    @property
+    def defines(self):
+        """Symbols given with -D, as a dict of names to expression text."""
+        defines = {}
+        for item in getattr(self, 'define', None) or []:
+            name, _, value = item.partition('=')
+            defines[name.strip()] = value.strip() or '1'
+        return defines
 
-        printer.title('Map').nl()
-        for k, v in compiler.map.items():
-            self.printer.key(k).value(f'{v:04x}').nl()
+    @property
+    def build_cache(self):
+        if not self.cache_dir:
+            return None
+        from .cache import BuildCache
+        return BuildCache(self.cache_dir, self.cache_size)
 
     def do_compile(self):
-        compiler = Compiler(self.ctx_manager)
+        from .compiler import Compiler
+        if self.watch:
+            return self.do_watch()
+        if self.memprofile:
+            return self.do_memprofile()
+        if self.profile or self.profile_out or self.trace_out:
+            return self.do_profile()
+        compiler = Compiler(self.ctx_manager, self.ast_cache, defines=self.defines)
+        if self.from_pre:
+            compiler.compile_pre(self.source_file)
+        else:
+            compiler.compile_file(self.source_file, cache=self.build_cache,
+                    prefetch=self.prefetch)
+        self.write_output(compiler)
+
+    def do_profile(self):
+        from .compiler import Compiler
+        from .profiler import Profiler
+        from .profiler import print_report
+        # profile a cold compile: the build cache and any shared ASTs
+        # would hide the work being measured
+        profiler = Profiler(trace=bool(self.trace_out))
+        compiler = Compiler(self.ctx_manager, defines=self.defines)
+        profiler.instrument_compiler(compiler)
         compiler.compile_file(self.source_file)
-        start, end = compiler.get_extents(self.segment)
-        header = None
-
-        if self.out_format == 'raw':
-            header = bytes([])
-        elif self.out_format.lower() == 'prg':
-            start_addr = compiler.pragma.get('c64_prg_start', 0x0801)
-            header = intbytes(start_addr)
-
-        with open(self.output, 'wb+') as f:
-            f.write(header)
-            f.write(compiler.data[start:end])
-
-        if self.mapfile:
-            with open(self.mapfile, 'wt+') as f:
-                for k, v in compiler.map.items():
-                    f.write(f'{k}: {v:04x}\n')
+        with profiler.phase('write'):
+            self.write_output(compiler)
+        if self.profile_out:
+            profiler.save(self.profile_out)
+        if self.trace_out:
+            profiler.save_trace(self.trace_out)
+        if self.profile:
+            print_report(self.printer, profiler.report())
+
+    def do_memprofile(self):
+        from .memprofile import profile_compile
+        from .memprofile import print_report
+        profiler = profile_compile(self.ctx_manager, self.source_file,
+                self.write_output, defines=self.defines)
+        print_report(self.printer, profiler.report())
+
+    def do_watch(self):
+        from .compiler import Compiler
+        from .preprocessor import AstCache
+        from .watch import Watcher
+        ast_cache = AstCache()
+        # files may be created while watching; keep path lookups current
+        self.ctx_manager.validate = True
+        watcher = Watcher(self.ctx_manager, self.watch_interval)
+        while True:
+            start = time.perf_counter()
+            before = watcher.snapshot()
+            try:
+                compiler = Compiler(self.ctx_manager, ast_cache, defines=self.defines)
+                compiler.compile_file(self.source_file)
+                self.write_output(compiler)
+                elapsed = (time.perf_counter() - start) * 1000
+                self.printer.info(f'Built {self.output} in {elapsed:.1f} ms').nl()
+            except Exception as e:
+                self.printer.error(f'Error: {str(e)}').nl()
+            self.printer.stream.flush()
+            watcher.update(before)
+            try:
+                changed = watcher.wait()
+            except KeyboardInterrupt:
+                return
+            for filename in changed:
+                self.ctx_manager.invalidate(filename)
+                ast_cache.invalidate(filename)
+            self.printer.text(f'Changed: {", ".join(changed)}').nl()
+
+    def do_asm(self):
+        from .compiler import Compiler
+        from .objfile import ObjectFile
+        output = self.output or os.path.splitext(self.source_file)[0] + '.o'
+        # object files do not record the defines they were assembled with
+        if not self.force and not self.defines and os.path.isfile(output):
+            try:
+                if ObjectFile.load(output).is_current(output, self.include):
+                    log.info('%s is up to date', output)
+                    return
+            except Exception as e:
+                log.debug('cannot reuse %s: %s', output, e)
+
+        compiler = Compiler(self.ctx_manager, defines=self.defines)
+        compiler.compile_file(self.source_file, relocatable=True)
+        ObjectFile.fromCompiler(compiler, self.source_file).save(output)
+
+    def do_link(self):
+        from .linker import Linker
+        from .objfile import ObjectFile
+        linker = Linker(self.ctx_manager)
+        linker.link([ObjectFile.load(x) for x in self.object_files])
+        self.write_output(linker)
 
 
     def do_preprocess(self):
-        ast = PreProcessor(self.ctx_manager).parse(self.source_file)
-        ModelPrinter(ansimode=not is_piped()).print_ast(ast)
+        from .preprocessor import PreProcessor
+        from .decompiler import ModelPrinter
+        ast = PreProcessor(self.ctx_manager, self.ast_cache,
+                self.defines).parse(self.source_file)
+        if self.format == 'bin':
+            from .prefile import dumps
+            data = dumps(ast)
+            if self.output:
+                with open(self.output, 'wb') as f:
+                    f.write(data)
+            else:
+                # text streams, such as a server's captured output, cannot
+                # carry binary data
+                buffer = getattr(self.printer.stream, 'buffer', None)
+                if buffer is None:
+                    raise Exception('Binary output needs an output file (-o)')
+                self.printer.stream.flush()
+                buffer.write(data)
+                buffer.flush()
+        elif self.output:
+            with open(self.output, 'w') as f:
+                ModelPrinter(f, ansimode=False).print_ast(ast)
+        else:
+            ModelPrinter(self.printer.stream, ansimode=self.ansimode).print_ast(ast)
 
     def do_fmt(self):
-        text = self.ctx_manager.get_text(self.source_file)
-        ast = PreProcessor(self.ctx_manager).parse(self.source_file)
-
-        # print AST withoug ANSI formatting
-        buf = io.StringIO()
-        ModelPrinter(buf, ansimode=False).print_ast(ast)
-        buf.seek(0)
-        result = buf.read()
-
-        # display the diff between the source and the formatted version
-        diff = difflib.ndiff(text.split('\n'), result.split('\n'))
-        if diff:
-            for line in diff:
-                style = diff_style[line[0]]
-                self.printer.write(style, line).nl()
-        if not test:
-            # rewrite the original file
-            real_filename = self.ctx_manager.search_file(self.source_file)
-            with open(real_filename) as f:
-                f.write(result)
-        return bool(diff)
+        from .formatter import Formatter
+        from .formatter import find_sources
+        # paths are relative to the working directory, or else the include paths
+        sources = []
+        for source in self.sources:
+            path = os.path.join(self.cwd or '', os.path.expanduser(source))
+            if not os.path.exists(path):
+                path = self.ctx_manager.search_file(source) or path
+            sources.append(path)
+
+        printer = self.printer
+        changed = failed = 0
+        with printer.buffered():
+            for result in Formatter().format(find_sources(sources), not self.test,
+                    self.jobs):
+                if result.error:
+                    printer.error(f'{result.filename}: {result.error}').nl()
+                    failed += 1
+                    continue
+                for line in result.diff:
+                    printer.write(diff_style[line[0]], line.rstrip('\n')).nl()
+                changed += result.changed
+        if failed:
+            raise Exception(f'{failed} file(s) could not be formatted')
+        if self.test and changed:
+            raise Exception(f'{changed} file(s) need formatting')
+
+    def do_build(self):
+        from .project import Project
+        project = Project(self.project)
+        start = time.perf_counter()
+        failed = 0
+        printer = self.printer
+        printer.title('Build').nl()
+        for result in project.build(self.targets, self.jobs, not self.no_cache):
+            printer.key(f'  {result.name}')
+            style = 'error' if result.status == 'failed' else 'value'
+            printer.write(style, f'{result.status:10} {result.elapsed:8.3f}s')
+            if result.error:
+                printer.error(f'  {result.error}')
+                failed += 1
+            printer.nl()
+        printer.nl().key('Total').value(f'{time.perf_counter() - start:.3f}s').nl()
+        if failed:
+            raise Exception(f'{failed} target(s) failed')
+
+    def do_serve(self):
+        from .server import CompileServer
+        server = CompileServer(self.socket)
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+        self.printer.info(f'Listening on {self.socket}').nl()
+        self.printer.stream.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def _resolve_paths(self):
+        """Makes path arguments relative to the application working directory."""
+        def resolve(path):
+            return os.path.join(self.cwd, os.path.expanduser(path))
+        for name in ['output', 'mapfile', 'binary_file', 'cache_dir', 'project', 'socket',
+                'profile_out', 'trace_out', 'index_dir']:
+            value = getattr(self, name, None)
+            if value:
+                setattr(self, name, resolve(value))
+        self.include = [resolve(x) for x in self.include]
+        if getattr(self, 'object_files', None):
+            self.object_files = [resolve(x) for x in self.object_files]
+
+    def do_disasm(self):
+        from .disasm import load_image
+        from .disasm import disassemble
+        from .decompiler import ModelPrinter
+        in_format = self.in_format
+        if not in_format:
+            in_format = 'prg' if self.binary_file.lower().endswith('.prg') else 'raw'
+        with open(self.binary_file, 'rb') as f:
+            image, start, end = load_image(f.read(), in_format, self.origin)
+        context = os.path.basename(self.binary_file)
+        disasm, ast = disassemble(image, start, end, self.entry, context)
+        if self.output:
+            with open(self.output, 'w') as f:
+                ModelPrinter(f, ansimode=False).print_ast(ast)
+        else:
+            ModelPrinter(self.printer.stream, ansimode=self.ansimode).print_ast(ast)
+        log.info('%d instructions, %d code bytes, %d data bytes',
+                disasm.stats['instructions'], disasm.stats['code_bytes'],
+                disasm.stats['data_bytes'])
 
     def do_find(self):
+        if self.index_dir:
+            self.ctx_manager.index_dir = self.index_dir
         for filename in self.ctx_manager.search_expr(self.search):
             self.printer.text(filename).nl()
 
@@ -188,40 +521,34 @@ class Application(object):
         Argument parsing, I/O configuration, and subcommmand dispatch are conducted here.
         """
 
-        # configure root logger
-        logger = logging.getLogger()
-        formatter = StyleFormatter(stylesheet=default_stylesheet,
-                ansimode=not is_piped())
-        handler = logging.StreamHandler()
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(logging.WARN)
+        # install the request log handler, once per process
+        if not Application._log_handler:
+            stderr_handler = StyledStreamHandler(ansimode=not is_piped())
+            Application._log_handler = RequestLogHandler(stderr_handler)
+            logging.getLogger().addHandler(Application._log_handler)
 
         # parse args and set arguments directly to object attributes
         args = self.parser.parse_args(argv)
         self.__dict__.update(vars(args))
-        self.printer = StylePrinter(stylesheet=default_stylesheet,
-                ansimode=not is_piped())
-
-        # turn on debug logging in debug or trace mode
-        # reveal argparse results
+        if self.cwd is not None:
+            self._resolve_paths()
+        self._printer = None
+
+        # log levels are set for this request only; a server's requests
+        # also log to their own output
+        handler = Application._log_handler.default.handler
+        if self.stream is not None:
+            handler = StyledStreamHandler(self.stream, self.ansimode)
+        with RequestLogging(request_levels(self.debug, self.trace), handler):
+            return self._run(args)
+
+    def _run(self, args):
+        # reveal argparse results in debug or trace mode
         if self.debug or self.trace:
-            logger.setLevel(logging.DEBUG)
             for k,v in vars(args).items():
                 if k not in ['parser', 'printer', 'fn', 'help_topics']:
                     self.printer.key(k).value(str(v)).nl()
 
-        # trace output - enable debug on specific modules
-        for name, mod in {
-                'compiler': 'xcomp.compiler',
-                'eval': 'xcomp.eval',
-                'pre': 'xcomp.preprocessor',
-                'parser': 'xcomp.parser',
-                'reducer': 'xcomp.reduce_parser',
-                }.items():
-            level = logging.DEBUG if name in self.trace else logging.WARN
-            logging.getLogger(mod).setLevel(level)
-
         # call handler
         try:
             args.fn()
@@ -235,7 +562,28 @@ class Application(object):
         return True
 
 
+def _can_forward(args):
+    """Returns true if a command's output can be sent back by the server,
+    which returns it as text."""
+    return getattr(args, 'format', None) != 'bin' or bool(args.output)
+
+
 def main():
+    argv = sys.argv[1:]
+
     app = Application()
-    result = app.run(sys.argv[1:])
+
+    # forward to a running compile server, if there is one; arguments are
+    # checked here so that usage errors are reported by this process
+    if argv and argv[0] in server_commands and \
+            not set(argv) & {'-w', '--watch', '-h', '--help'} and \
+            _can_forward(app.parser.parse_args(argv)):
+        response = forward(cli_defaults['socket'], argv, app.ansimode,
+                cli_defaults)
+        if response:
+            output, result = response
+            sys.stdout.write(output)
+            sys.exit(0 if result else 1)
+
+    result = app.run(argv)
     sys.exit(0 if result is None or result else 1)
@@ -0,0 +1,73 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Client side of the compile server protocol.
+
+This module is imported on every CLI start, so it must stay light: only the
+standard library modules needed to talk to the socket are imported.
+"""
+
+import os
+import json
+import stat
+import socket
+import logging
+
+log = logging.getLogger(__name__)
+
+# subcommands that may be forwarded to a running server
+server_commands = ['compile', 'dump', 'pre']
+
+
+def is_running(path):
+    """Returns true if a server is accepting connections on path."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+def is_trusted(path):
+    """Returns true if path is a socket owned by the current user, that no
+    other user may connect to.
+
+    The default socket path is in the shared temporary directory, where any
+    local user could create it, and a client sends its command line and
+    working directory to the server."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return (stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid() and
+            not stat.S_IMODE(st.st_mode) & 0o077)
+
+
+def forward(path, argv, ansimode, defaults=None):
+    """Sends a command line to the server at path, along with the
+    command-line defaults to run it with.
+
+    Returns the (output, result) reply, or None if no trusted server is
+    available."""
+
+    if not path or not os.path.exists(path):
+        return None
+    if not is_trusted(path):
+        log.warning('not using server at %s: it must be a socket owned by ' +
+                'the current user with mode 0600', path)
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            request = {'argv': argv, 'cwd': os.getcwd(), 'ansimode': ansimode,
+                    'defaults': defaults}
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as f:
+                response = json.loads(f.readline())
+    except (OSError, ValueError) as e:
+        log.debug('cannot use server at %s: %s', path, e)
+        return None
+    return response['output'], response['result']
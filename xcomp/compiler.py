@@ -5,13 +5,17 @@
 import logging
 import codecs
 import cbmcodecs
+from copy import copy
 from functools import singledispatchmethod
 from functools import partial
 from itertools import filterfalse
 from .model import *
 from .eval import Evaluator
+from .eval import Relocation
 from .compiler_base import CompilerBase
+from .compiler_base import FileContextException
 from .preprocessor import PreProcessor
+from .cache import CacheEntry
 
 log = logging.getLogger(__name__)
 
@@ -26,15 +30,11 @@ class SegmentData(object):
 
     @property
     def start(self):
-        if self._start == None:
-            self._start = self._default_start
-        return self._start
+        return self._offset if self._start is None else self._start
 
     @property
     def end(self):
-        if self._end == None:
-            self._end = self._offset
-        return self._end
+        return self._offset if self._end is None else self._end
 
     @property
     def offset(self):
@@ -42,21 +42,29 @@ class SegmentData(object):
 
     @offset.setter
     def offset(self, value):
-        self._offset = value
-        if self._start == None:
-            self._start = value
-        else:
-            self._start = min(self._start, value)
-        if self._end == None:
-            self._end = value
+        # a write covers the range from the current offset to value
+        low, high = min(self._offset, value), max(self._offset, value)
+        if self._start is None:
+            self._start, self._end = low, high
         else:
-            self._end = max(self._end, value)
+            self._start = min(self._start, low)
+            self._end = max(self._end, high)
+        self._offset = value
+
+    def origin(self, value):
+        """Moves the offset to value.  Only writes add to the segment
+        extents, so an origin that is never written to is not included."""
+        self._offset = value
 
 
 class Compiler(CompilerBase):
-    def __init__(self, ctx_manager):
+    def __init__(self, ctx_manager, ast_cache=None, data=None, defines=None):
         super().__init__(ctx_manager)
-        self.data = bytearray(0xFFFF)
+        self.ast_cache = ast_cache
+        self.defines = defines or {}
+        # trace logging is checked once; hot paths only test this flag
+        self._trace = log.isEnabledFor(logging.DEBUG)
+        self.data = data if data is not None else bytearray(0xFFFF)
         self.eval = Evaluator(ctx_manager)
         self.segments = {
             'zero': SegmentData(0x0000),
@@ -65,9 +73,16 @@ class Compiler(CompilerBase):
             'text': SegmentData(0x0800),
         }
         self.seg = self.segments['text']
+        # segments of structs with initialized fields, which also write data
+        self.struct_segments = []
         self.pragma = {}
         self.fixups = []
         self.map = {}
+        self.globals = {}
+        self.stats = {
+            'fixups': 0,
+            'fixup_retries': 0,
+        }
 
     def resolve_expr(self, addr, expr):
         value, expr_bytes = self.eval.get_expr_bytes(expr)
@@ -99,16 +114,24 @@ class Compiler(CompilerBase):
                 AddressMode.zeropage_y, AddressMode.immediate]:
             if lobyte(value) == value:
                 vlen = 1
-                log.debug('optimizing to single-byte arg %s %s %s', value,
-                        vlen, expr_bytes)
+                if self._trace:
+                    log.debug('optimizing to single-byte arg %s %s %s', value,
+                            vlen, expr_bytes)
+
+        # absolute and indirect modes always take a full address
+        elif vlen == 1 and addressmode_arg_width.get(opcode.mode) == 2:
+            expr_bytes = [lobyte(value), hibyte(value)]
+            vlen = 2
 
         # make sure we don't have too many bytes
         if vlen == 2:
-            log.debug('promoting: %s %s', opcode.value, opcode.mode)
+            if self._trace:
+                log.debug('promoting: %s %s', opcode.value, opcode.mode)
             if not opcode.promote16bits():
                 self._error(expr.pos,
                         f'operation {opcode.name} cannot take a 16 bit value')
-            log.debug('promoted to: %s %s', opcode.value, opcode.mode)
+            if self._trace:
+                log.debug('promoted to: %s %s', opcode.value, opcode.mode)
 
         # emit op byte
         self.data[addr] = opcode.value
@@ -119,17 +142,21 @@ class Compiler(CompilerBase):
             self.data[addr + ii] = expr_bytes[ii]
         return 1 + vlen
 
-    def resolve_fixups(self, must_pass=False):
-        def attempt(fixup):
-            try:
+    def _attempt_fixup(self, fixup, must_pass):
+        try:
+            if self._trace:
                 log.debug('fixing up: %s', fixup)
-                fixup()
-                return True
-            except:
-                if must_pass:
-                    raise
-                return False
-        self.fixups[:] = filterfalse(attempt, self.fixups)
+            fixup()
+            return True
+        except:
+            if must_pass:
+                raise
+            self.stats['fixup_retries'] += 1
+            return False
+
+    def resolve_fixups(self, must_pass=False):
+        self.fixups[:] = filterfalse(
+                lambda x: self._attempt_fixup(x, must_pass), self.fixups)
 
     def _repeat_init(self, length, init):
         """Dumps repetitions of init into memory at offset, up to length bytes."""
@@ -155,7 +182,18 @@ class Compiler(CompilerBase):
 
     @_compile.register
     def _compile_bin(self, binfile: BinaryInclude):
-        value = self.ctx_manager.get_text(binfile.filename, 'rb')
+        offset = 0
+        if binfile.offset is not None:
+            offset = self.eval.eval(binfile.offset)
+        length = None
+        if binfile.length is not None:
+            length = self.eval.eval(binfile.length)
+        try:
+            value = self.ctx_manager.get_binary(binfile.filename, offset, length)
+        except FileContextException as e:
+            self._error(binfile.pos, str(e))
+
+        # only the requested range is read from the file
         start = self.seg.offset
         end = start + len(value)
         self.data[start:end] = value
@@ -203,6 +241,7 @@ class Compiler(CompilerBase):
                 fixup = partial(self.resolve_expr,
                         self.seg.offset, self.eval.get_fixup(item))
                 self.fixups.append(fixup)
+                self.stats['fixups'] += 1
                 self.seg.offset += storage.width
                 # TODO: bug - can't properly handle strings on forward reference
 
@@ -226,7 +265,7 @@ class Compiler(CompilerBase):
         self.seg = SegmentData(0)
         if struct.offset is not None:
             offset = self.eval.eval(struct.offset)
-            self.seg.offset = offset
+            self.seg.origin(offset)
             self.map[struct.name] = offset
 
         # set up new map to track symbols
@@ -241,6 +280,7 @@ class Compiler(CompilerBase):
 
         # merge down scope and restore old segment
         self.eval.end_scope(merge=True)
+        self.struct_segments.append(self.seg)
         self.seg = old_seg
 
         # merge down map and restore old map
@@ -252,11 +292,14 @@ class Compiler(CompilerBase):
     def _compile_segment(self, segment: Segment):
         self.seg = self.segments[segment.name]
         if segment.start is not None:
-            self.seg.offset = self.eval.eval(segment.start)
+            self.seg.origin(self.eval.eval(segment.start))
 
     @_compile.register
     def _compile_op(self, op: Op):
         if op.arg:
+            # ops may be promoted to 16 bits below; leave the AST untouched
+            # as it may be shared by macro expansions or cached
+            op = copy(op)
             try:
                 self.seg.offset += self.resolve_op(op, self.seg.offset, op.arg)
             except:
@@ -268,6 +311,7 @@ class Compiler(CompilerBase):
                 fixup = partial(self.resolve_op,
                         op, self.seg.offset, self.eval.get_fixup(op.arg))
                 self.fixups.append(fixup)
+                self.stats['fixups'] += 1
                 self.seg.offset += op.width
         else:
             self.data[self.seg.offset] = op.value
@@ -286,22 +330,94 @@ class Compiler(CompilerBase):
             end = max(seg.end, end) if end else seg.end
         return (start, end)
 
-    def compile(self, ast):
-        # start scope with default implicit names
+    def get_written_extents(self):
+        """Returns the lowest and highest address written to, across all
+        segments including those of structs, or None if nothing was."""
+        written = [x for x in self.segments.values() if x._start is not None]
+        written += [x for x in self.struct_segments if x._start is not None]
+        if not written:
+            return None
+        return (min(x.start for x in written), max(x.end for x in written))
+
+    def get_relocations(self):
+        """Returns relocation records for all pending fixups."""
+        relocations = []
+        for fixup in self.fixups:
+            if fixup.func.__name__ == 'resolve_op':
+                op, addr, expr = fixup.args
+            else:
+                op = None
+                addr, expr = fixup.args
+            relocations.append(Relocation(addr, expr, op))
+        return relocations
+
+    def begin(self):
+        """Starts the top-level scope, with default implicit names."""
         self.eval.start_scope()
         self.eval.scope['byte'] = 1
         self.eval.scope['word'] = 2
         self.eval.scope['long'] = 4
 
-        # compile the AST
-        for item in ast:
-            self._compile(item)
-
-        # resolve fixups
+    def finish(self, relocatable=False):
+        """Resolves outstanding fixups and ends the top-level scope."""
         log.debug('fixups %s', self.fixups)
-        self.resolve_fixups(must_pass=True)
-        self.eval.end_scope()
+        self.resolve_fixups(must_pass=not relocatable)
+        self.globals = self.eval.end_scope()
+
+    def compile(self, ast, relocatable=False):
+        """Compiles an AST stream into the memory image.
+
+        If relocatable is set, fixups that cannot be resolved are left pending
+        in self.fixups instead of raising an error.  The top-level scope is
+        preserved in self.globals either way.
+        """
 
-    def compile_file(self, filename):
-        ast = PreProcessor(self.ctx_manager).parse(filename)
-        self.compile(ast)
+        self.begin()
+        for item in ast:
+            self._compile(item)
+        self.finish(relocatable)
+
+    def compile_file(self, filename, relocatable=False, cache=None, options=None,
+            prefetch=False):
+        """Compiles filename and everything it includes.
+
+        If a BuildCache is provided, a valid entry for the file, its include
+        closure and options is restored instead of compiling.  Otherwise the
+        result is stored in the cache.  Relocatable compiles are not cached.
+
+        If prefetch is set, the include closure is loaded in the background
+        while the file is compiled.
+        """
+
+        if relocatable:
+            cache = None
+        if cache:
+            if self.defines:
+                options = dict(options or {}, defines=sorted(self.defines.items()))
+            key = cache.get_key(filename, self.ctx_manager, options)
+            entry = cache.lookup(key, self.ctx_manager)
+            if entry:
+                log.debug('cache hit for %s', filename)
+                entry.restore(self)
+                return
+        self.ctx_manager.dependencies.clear()
+        loading = None
+        if prefetch:
+            from .prefetch import start_prefetch
+            loading = start_prefetch(self.ctx_manager, filename)
+        try:
+            self.preprocessor = PreProcessor(self.ctx_manager, self.ast_cache,
+                    self.defines)
+            self.compile(self.preprocessor.parse(filename), relocatable)
+        finally:
+            if loading:
+                loading.result()
+        if cache:
+            cache.store(key, CacheEntry.fromCompiler(self))
+
+    def compile_pre(self, filename, relocatable=False):
+        """Compiles the pre-processed output saved in filename by
+        `xcomp pre --format=bin`.  No source is read or parsed."""
+
+        from .prefile import loads
+        self.compile(loads(self.ctx_manager.get_text(filename, 'rb')), relocatable)
@@ -2,9 +2,37 @@
 # All rights reserved.
 # Published under the BSD license.  See LICENSE For details.
 
+"""
+File access and the base class for compiler passes.
+
+Concurrency model
+-----------------
+
+Any number of compiles may run at once, in threads or asyncio tasks, as long
+as each compile has its own Compiler, and with it its own Evaluator and
+PreProcessor.  These hold all of the mutable state of a compile (segments,
+fixups, scopes, macros, the memory image) and must not be shared.
+
+What may be shared is read-only data:
+
+- FileContextManager caches text file contents and resolved paths; binary
+  files are read on each use.  Cached values are never modified once
+  published, and files are loaded at most once even if several compiles ask
+  for them together.  Each compile should use its own session() of a shared
+  manager, so that the dependencies it records are its own.
+- AstCache caches parsed files.  Parsing is serialized by its lock, and the
+  ASTs it returns are never modified; the compiler copies any node it needs
+  to change.
+
+Invalidating a shared cache while compiles are running is safe, but those
+compiles may see a mix of old and new file contents.
+"""
+
 import os
 import glob
+import threading
 from attr import attrs
+from attr import attrib
 from attr import Factory
 from typing import *
 
@@ -12,33 +40,223 @@ class FileContextException(Exception):
     pass
 
 
+_missing = object()
+
+
 @attrs(auto_attribs=True, slots=True)
 class FileContextManager():
     include_paths: list = Factory(list)
     files: Dict = Factory(dict)
+    dependencies: Dict = Factory(dict)
+    binaries: Dict = Factory(dict)
+    resolved: Dict = Factory(dict)
+    listings: Dict = Factory(dict)
+    validate: bool = False
+    lock: Any = attrib(factory=threading.Lock, eq=False, repr=False)
+    loading: Dict = attrib(factory=dict, eq=False, repr=False)
+    index_dir: Optional[str] = None
+    indexes: Dict = attrib(factory=dict, eq=False, repr=False)
+    stats: Dict = attrib(factory=dict, eq=False, repr=False)
 
-    def search_file(self, filename):
+    def session(self):
+        """Returns a manager that shares this manager's caches, but records
+        its own dependencies."""
+        return FileContextManager(self.include_paths, self.files, {},
+                self.binaries, self.resolved, self.listings, self.validate,
+                self.lock, self.loading, self.index_dir, self.indexes,
+                self.stats)
+
+    def _open(self, filename, mode):
+        """Opens filename, and records the state it had when read in
+        self.stats, in the same form as Watcher.stat()."""
+        full_filename = self._find_file(filename)
+        f = open(full_filename, mode)
+        st = os.fstat(f.fileno())
+        self.stats[filename] = (full_filename, st.st_mtime_ns, st.st_size)
+        return f
+
+    def _load(self, cache, filename, loader):
+        """Returns cache[filename], calling loader to fill it if needed.
+
+        Concurrent requests for the same file wait for a single load, while
+        different files load in parallel."""
+
+        value = cache.get(filename, _missing)
+        if value is not _missing:
+            return value
+        key = (id(cache), filename)
+        with self.lock:
+            file_lock = self.loading.setdefault(key, threading.Lock())
+        with file_lock:
+            value = cache.get(filename, _missing)
+            if value is _missing:
+                value = loader()
+                cache[filename] = value
+        with self.lock:
+            self.loading.pop(key, None)
+        return value
+
+    def _listing(self, directory, refresh=False):
+        """Returns the names of the files in directory.
+
+        Each directory is listed once.  If validate or refresh is set, a
+        listing is refreshed whenever the directory's mtime changes."""
+
+        listing = self.listings.get(directory, None)
+        if listing is not None and not (self.validate or refresh):
+            return listing[1]
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        if listing is None or listing[0] != mtime:
+            names = frozenset()
+            if mtime is not None:
+                try:
+                    with os.scandir(directory) as it:
+                        names = frozenset(x.name for x in it if x.is_file())
+                except OSError:
+                    pass
+            listing = self.listings[directory] = (mtime, names)
+        return listing[1]
+
+    def _resolve(self, filename, refresh=False):
         for inc in self.include_paths:
             test = os.path.expanduser(os.path.join(inc, filename))
-            if os.path.isfile(test):
+            directory, name = os.path.split(test)
+            if name in self._listing(directory or os.curdir, refresh):
                 return test
         return None
 
+    def search_file(self, filename):
+        """Returns the path to filename on the include paths, or None.
+
+        Found paths are cached, so a repeated lookup is a single dict lookup
+        unless validate is set.  Failed lookups are not cached, and check
+        the directories again, so a file created after a miss is found.
+        Call invalidate() after changing the include paths."""
+
+        if not self.validate:
+            full_filename = self.resolved.get(filename, None)
+            if full_filename:
+                return full_filename
+        full_filename = self._resolve(filename)
+        if not full_filename and not self.validate:
+            full_filename = self._resolve(filename, refresh=True)
+        if full_filename or self.validate:
+            self.resolved[filename] = full_filename
+        return full_filename
+
+    def real_path(self, filename):
+        """Returns the canonical path of filename, so that different
+        spellings of the path to one file compare equal.  Files that are
+        not on the include paths, such as those only held in memory, are
+        normalized as spelled."""
+
+        full_filename = self.search_file(filename)
+        if full_filename:
+            return os.path.realpath(full_filename)
+        return os.path.normpath(filename)
+
+    def _index(self, inc):
+        from .file_index import FileIndex
+        from .file_index import index_filename
+        root = os.path.expanduser(inc)
+        with self.lock:
+            index = self.indexes.get(root, None)
+            if index is None:
+                index = self.indexes[root] = FileIndex(root,
+                        index_filename(self.index_dir, root))
+            index.refresh()
+            index.save()
+            return index
+
+    def _glob(self, inc, glob_expr):
+        parts = glob_expr.replace(os.sep, '/').split('/')
+        if not self.index_dir or os.path.isabs(glob_expr) or '..' in parts:
+            return sorted(glob.glob(os.path.join(inc, glob_expr), recursive=True))
+        return [os.path.join(inc, x) for x in self._index(inc).match(glob_expr)]
+
     def search_expr(self, glob_expr):
+        """Yields the paths matching glob_expr on the include paths.
+
+        Results are in include path order, and a file reachable through
+        more than one include path is only yielded for the first.  If
+        index_dir is set, queries are answered from a FileIndex of each
+        include path that is persisted there."""
+
+        seen = set()
         for inc in self.include_paths:
-            for result in glob.glob(os.path.join(inc, glob_expr), recursive=True):
-                yield result
+            for result in self._glob(inc, glob_expr):
+                real = os.path.realpath(result)
+                if real not in seen:
+                    seen.add(real)
+                    yield result
+
+    def invalidate(self, filename=None):
+        """Drops the cached content and location of filename, or of all
+        files."""
+
+        if filename is None:
+            self.files.clear()
+            self.binaries.clear()
+            self.resolved.clear()
+            self.listings.clear()
+            self.stats.clear()
+        else:
+            self.files.pop(filename, None)
+            self.stats.pop(filename, None)
+            self.binaries.pop(filename, None)
+            full_filename = self.resolved.pop(filename, None)
+            if full_filename:
+                self.listings.pop(os.path.dirname(full_filename) or os.curdir, None)
+
+    def _find_file(self, filename):
+        full_filename = self.search_file(filename)
+        if not full_filename:
+            raise FileContextException(
+                    f'Cannot find "{filename}" on any configured search path.')
+        return full_filename
+
+    def get_binary(self, filename, offset=0, length=None):
+        """Returns length bytes of a binary file from offset, or the rest of
+        the file if length is None.
+
+        Only the requested range is read.  Files on disk are not cached or
+        kept open, so a file that is rewritten or truncated later cannot
+        change data already returned.  Binaries may also be set in memory,
+        in self.binaries, apart from text files."""
+
+        def check_range(size):
+            count = size - offset if length is None else length
+            if offset < 0 or count < 0 or offset + count > size:
+                raise FileContextException(
+                        f'Range {offset}, {count} is outside of "{filename}" ({size} bytes)')
+            return count
+
+        self.dependencies[filename] = 'rb'
+        value = self.binaries.get(filename, None)
+        if value is not None:
+            count = check_range(len(value))
+            return bytes(value[offset:offset + count])
+        with self._open(filename, 'rb') as f:
+            count = check_range(os.fstat(f.fileno()).st_size)
+            f.seek(offset)
+            data = f.read(count)
+        if len(data) != count:
+            raise FileContextException(f'"{filename}" changed while it was read')
+        return data
 
     # TODO: rename to get_data()
     def get_text(self, filename, mode='rt'):
-        if filename not in self.files:
-            full_filename = self.search_file(filename)
-            if not full_filename:
-                raise FileContextException(
-                        f'Cannot find "{filename}" on any configured search path.')
-            with open(full_filename, mode) as f:
-                self.files[filename] = f.read()
-        return self.files[filename]
+        if 'b' in mode:
+            return self.get_binary(filename)
+        def load():
+            with self._open(filename, mode) as f:
+                return f.read()
+
+        self.dependencies[filename] = mode
+        return self._load(self.files, filename, load)
 
 
 class CompilationError(Exception):
@@ -55,7 +273,11 @@ class CompilerBase(object):
         raise CompilationError(line, column, pos.context, msg)
 
     def _linecol(self, pos):
-        text = self.ctx_manager.get_text(pos.context)
+        try:
+            text = self.ctx_manager.get_text(pos.context)
+        except FileContextException:
+            # nodes loaded from pre-processed output may outlive their source
+            return '?', '?'
         line = text.count('\n', 0, pos.start) + 1
         try:
             column = pos.start - text.rindex('\n', 0, pos.start)
@@ -21,13 +21,25 @@ model_stylesheet = {
     'opcode': { 'before': '    '},
 }
 
+# inverse of the escape sequences accepted by the parser
+string_escapes = str.maketrans({
+    '\r': r'\r',
+    '\n': r'\n',
+    '\t': r'\t',
+    '\v': r'\v',
+    '"': r'\"',
+    '\\': r'\\',
+})
+
 
 # TODO: add support for indentation
-# TODO: add support for macro, include, and bin
 
 class ModelPrinter(StylePrinter):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, show_context=True, **kwargs):
+        """Creates a printer for model nodes.  If show_context is set, a
+        comment naming the source file is written wherever it changes."""
         self.context = None
+        self.show_context = show_context
         kwargs.setdefault('stylesheet', model_stylesheet)
         super().__init__(*args, **kwargs)
 
@@ -70,27 +82,42 @@ class ModelPrinter(StylePrinter):
 
     @print.register
     def _print_pos(self, pos: Pos):
-        # TODO; add boolean to turn this on/off
-        if pos.context != self.context:
+        if self.show_context and pos.context != self.context:
           self.comment('; <').comment(pos.context).comment('>').nl()
           self.context = pos.context
         return self
 
     @print.register
     def _print_str(self, string: String):
-        return self.string(string.value).eol(string)
+        return self.string(string.value.translate(string_escapes))
+
+    @print.register
+    def _print_include(self, include: Include):
+        self.print(include.pos)
+        self.directive('.include ').string(include.filename.translate(string_escapes))
+        return self.eol(include)
+
+    @print.register
+    def _print_once(self, once: Once):
+        self.print(once.pos)
+        self.directive('.once')
+        return self.eol(once)
 
     @print.register
     def _print_bin(self, binfile: BinaryInclude):
         self.print(binfile.pos)
-        self.directive('.bin ').ident(binfile.name)
-        self.text(' ').string(binfile.filename).nl()
-        return self.end(binfile)
+        self.directive('.bin ').string(binfile.filename.translate(string_escapes))
+        for expr in [binfile.offset, binfile.length]:
+            if expr is not None:
+                self.text(', ').print(expr)
+        return self.eol(binfile)
 
     @print.register
     def _print_dim(self, dim: Dim):
         self.print(dim.pos)
-        self.directive('.dim ').print(dim.length).text(' ').print(dim.init)
+        self.directive('.dim ').print(dim.length)
+        if dim.init:
+            self.text(', ').print(dim.init)
         return self.eol(dim)
 
     @print.register
@@ -104,7 +131,10 @@ class ModelPrinter(StylePrinter):
     @print.register
     def _print_struct(self, struct: Struct):
         self.print(struct.pos)
-        self.directive('.struct ').ident(struct.name).nl()
+        self.directive('.struct ').ident(struct.name)
+        if struct.offset is not None:
+            self.text(' ').print(struct.offset)
+        self.nl()
         for field in struct.fields:
             self.text('    ').print(field)
         self.directive('.end')
@@ -132,7 +162,7 @@ class ModelPrinter(StylePrinter):
     @print.register
     def _print_encoding(self, encoding: Encoding):
         self.print(encoding.pos)
-        self.directive('.encoding ').string(encoding.name)
+        self.directive('.encoding ').string(encoding.name.translate(string_escapes))
         return self.eol(encoding)
 
     @print.register
@@ -148,6 +178,18 @@ class ModelPrinter(StylePrinter):
         self.label(f'{label.name}:')
         return self.eol(label)
 
+    @print.register
+    def _print_macro(self, macro: Macro):
+        self.print(macro.pos)
+        self.directive('.macro ').ident(macro.name)
+        for param in macro.params:
+            self.text(', ').ident(param)
+        self.eol(macro)
+        for item in macro.body:
+            self.print(item)
+        self.directive('.end')
+        return self.nl()
+
     @print.register
     def _print_macro_call(self, macro: MacroCall):
         self.print(macro.pos)
@@ -203,7 +245,7 @@ class ModelPrinter(StylePrinter):
         # end early if there's no arg, otherwise emit a separator
         self.opcode(op.name)
         if mode == AddressMode.implied:
-            return self.nl()
+            return self.eol(op)
         self.text(' ')
 
         # all other modes
@@ -247,5 +289,6 @@ class ModelPrinter(StylePrinter):
         return self.ident(expr.value).end(expr)
 
     def print_ast(self, ast):
-        for x in ast:
-            self.print(x)
+        with self.buffered():
+            for x in ast:
+                self.print(x)
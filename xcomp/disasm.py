@@ -0,0 +1,191 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Table-driven 6502 disassembler.
+
+Opcodes are decoded through a 256 entry table built from cpu6502.opcodes,
+which is itself the inverse of the opcode_xref table used by the assembler,
+so a disassembly assembles back to the same bytes.
+
+Code is separated from data by recursive traversal: starting from the entry
+points, instructions are decoded along every path that execution can take.
+Branches, jmp and jsr queue their targets, and a path ends at jmp, rts, rti,
+brk, an undefined opcode, or an instruction that would overlap one already
+decoded.  Everything that is not reached is emitted as .byte data.  Targets
+of branches, jmp and jsr inside the image get labels.
+
+The result is a list of model nodes, printed with ModelPrinter.
+"""
+
+import logging
+from .cpu6502 import AddressMode
+from .cpu6502 import addressmode_arg_width
+from .cpu6502 import opcodes
+from .reduce_parser import Pos
+from .model import *
+
+log = logging.getLogger(__name__)
+
+# opcode byte -> (mnemonic, mode, width) or None
+decode_table = [None] * 256
+for value, (name, mode) in opcodes.items():
+    decode_table[value] = (name, mode, 1 + addressmode_arg_width[mode])
+
+# instructions after which execution does not continue with the next one
+terminators = frozenset(['jmp', 'rts', 'rti', 'brk'])
+
+# instructions whose absolute operand is a code address
+jumps = frozenset(['jmp', 'jsr'])
+
+# 6502 interrupt vectors: nmi, reset and irq
+VECTORS = [0xFFFA, 0xFFFC, 0xFFFE]
+
+CODE = 1
+OPERAND = 2
+
+BYTES_PER_LINE = 8
+
+
+def load_image(data, in_format='raw', origin=0):
+    """Returns (image, start, end) for the contents of a program file."""
+    if in_format == 'prg':
+        if len(data) < 2:
+            raise Exception('PRG file is missing its load address')
+        origin = data[0] | (data[1] << 8)
+        data = data[2:]
+    end = origin + len(data)
+    if end > 0x10000:
+        raise Exception(f'Image of {len(data)} bytes at ${origin:04X} '
+                'does not fit in 64K')
+    image = bytearray(0x10000)
+    image[origin:end] = data
+    return image, origin, end
+
+
+class Disassembler(object):
+    def __init__(self, data, start=0, end=0x10000, context='<image>'):
+        self.data = data
+        self.start = start
+        self.end = end
+        self.pos = Pos(start, start, context)
+        self.code = bytearray(0x10000)
+        self.labels = {}
+        self.stats = {
+            'instructions': 0,
+            'code_bytes': 0,
+            'data_bytes': 0,
+        }
+
+    def default_entries(self):
+        """Returns the start of the image, and the targets of any interrupt
+        vectors it contains."""
+        entries = [self.start]
+        data = self.data
+        for vector in VECTORS:
+            if self.start <= vector and vector + 2 <= self.end:
+                entries.append(data[vector] | (data[vector + 1] << 8))
+        return entries
+
+    def trace(self, entries):
+        """Decodes every instruction reachable from entries."""
+        data = self.data
+        code = self.code
+        start, end = self.start, self.end
+        targets = set(entries)
+        pending = list(entries)
+        count = 0
+        while pending:
+            pc = pending.pop()
+            while start <= pc < end and not code[pc]:
+                entry = decode_table[data[pc]]
+                if entry is None:
+                    break
+                name, mode, width = entry
+                following = pc + width
+                if following > end or any(code[pc + 1:following]):
+                    break
+                code[pc] = CODE
+                code[pc + 1:following] = bytes([OPERAND]) * (width - 1)
+                count += 1
+
+                if mode is AddressMode.relative:
+                    offset = data[pc + 1]
+                    target = (following + offset - (offset & 0x80) * 2) & 0xFFFF
+                    targets.add(target)
+                    pending.append(target)
+                elif name in jumps and mode is AddressMode.absolute:
+                    target = data[pc + 1] | (data[pc + 2] << 8)
+                    targets.add(target)
+                    pending.append(target)
+                if name in terminators:
+                    break
+                pc = following
+
+        for target in targets:
+            if start <= target < end and code[target] != OPERAND:
+                self.labels[target] = f'L{target:04x}'
+        code_bytes = sum(1 for x in code[start:end] if x)
+        self.stats['instructions'] += count
+        self.stats['code_bytes'] = code_bytes
+        self.stats['data_bytes'] = end - start - code_bytes
+        return self
+
+    def _address(self, value, labelled):
+        if labelled and value in self.labels:
+            return ExprName(self.pos, self.labels[value])
+        return ExprValue(self.pos, value, 16, 16)
+
+    def _op(self, pc):
+        data = self.data
+        name, mode, width = decode_table[data[pc]]
+        arg = None
+        if mode is AddressMode.relative:
+            offset = data[pc + 1]
+            target = (pc + 2 + offset - (offset & 0x80) * 2) & 0xFFFF
+            arg = self._address(target, True)
+        elif width == 2:
+            arg = ExprValue(self.pos, data[pc + 1], 16)
+        elif width == 3:
+            value = data[pc + 1] | (data[pc + 2] << 8)
+            if name in jumps and mode is AddressMode.absolute:
+                arg = self._address(value, True)
+            else:
+                arg = self._address(value, False)
+            # keep the absolute encoding of zero page addresses
+            if isinstance(arg, ExprValue) and value < 0x100 and \
+                    mode is not AddressMode.indirect:
+                arg = Expr16(self.pos, ExprValue(self.pos, value, 16))
+        return Op(self.pos, name, mode, data[pc], arg), width
+
+    def disassemble(self):
+        """Returns the image as a list of model nodes."""
+        data, code, labels = self.data, self.code, self.labels
+        pos = self.pos
+        nodes = [Segment(pos, 'text', ExprValue(pos, self.start, 16, 16))]
+        pc, end = self.start, self.end
+        while pc < end:
+            if pc in labels:
+                nodes.append(Label(pos, labels[pc]))
+            if code[pc] == CODE:
+                op, width = self._op(pc)
+                nodes.append(op)
+                pc += width
+                continue
+            run = pc + 1
+            while run < end and run - pc < BYTES_PER_LINE and \
+                    not code[run] and run not in labels:
+                run += 1
+            nodes.append(Storage(pos, 1,
+                    [ExprValue(pos, x, 16) for x in data[pc:run]]))
+            pc = run
+        return nodes
+
+
+def disassemble(data, start=0, end=0x10000, entries=None, context='<image>'):
+    """Disassembles data[start:end] and returns the Disassembler, and the
+    list of model nodes."""
+    disasm = Disassembler(data, start, end, context)
+    disasm.trace(entries if entries else disasm.default_entries())
+    return disasm, disasm.disassemble()
@@ -10,6 +10,7 @@ from functools import singledispatchmethod
 from .model import *
 from .compiler_base import CompilerBase
 from .cpu6502 import AddressMode
+from .utils import HexBytes
 
 log = logging.getLogger(__name__)
 
@@ -23,9 +24,18 @@ class FixupExpr(object):
     expr: Expr
 
 
+@attrs(auto_attribs=True)
+class Relocation(object):
+    addr: int
+    expr: FixupExpr
+    op: Op = None
+
+
 class Evaluator(CompilerBase):
     def __init__(self, ctx_manager):
         super().__init__(ctx_manager)
+        # trace logging is checked once; hot paths only test this flag
+        self._trace = log.isEnabledFor(logging.DEBUG)
         self.encoding = 'utf-8'
         self.scope_stack = []
         self.namespace_stack = []
@@ -115,8 +125,8 @@ class Evaluator(CompilerBase):
                 self._error(expr.pos, str(e))
         else:
             self._error(expr.pos, f'value of type {type(value)} not supported.')
-        log.debug('expr bytes %s %s %s', expr, value,
-                ' '.join([f'{x:x}' for x in expr_bytes]))
+        if self._trace:
+            log.debug('expr bytes %s %s %s', expr, value, HexBytes(expr_bytes))
         return value, expr_bytes
 
     def eval(self, expr):
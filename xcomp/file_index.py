@@ -0,0 +1,192 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Persisted file index for glob queries over include roots.
+
+A FileIndex records the files and subdirectories of every directory below a
+root, along with each directory's mtime.  Before a query the tree is
+refreshed: every directory is stat'ed, and only those whose mtime changed
+are listed again.  Queries are then answered by matching a regex, translated
+from the glob pattern, against the relative paths held in memory.
+
+Indexes are saved as JSON in an index directory, one file per root, so that
+a new process starts from the last known tree instead of listing it all.
+The matching follows glob.glob(recursive=True): '*' and '?' stay within a
+path component, '**' matches any number of directories, and wildcards do
+not match names that start with a dot.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+
+log = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+
+def translate(pattern):
+    """Returns a regex source that matches relative paths against the glob
+    pattern."""
+
+    parts = []
+    components = pattern.replace(os.sep, '/').split('/')
+    for ii, component in enumerate(components):
+        last = ii == len(components) - 1
+        if component == '**':
+            # any number of directories, or anything at all when last
+            parts.append(r'(?:(?!\.)[^/]+(?:/(?!\.)[^/]+)*)?' if last
+                    else r'(?:(?!\.)[^/]+/)*')
+            continue
+        parts.append(_translate_component(component))
+        if not last:
+            parts.append('/')
+    return ''.join(parts) + r'\Z'
+
+
+def _translate_component(component):
+    result = [] if component.startswith('.') else [r'(?!\.)']
+    ii, end = 0, len(component)
+    while ii < end:
+        ch = component[ii]
+        ii += 1
+        if ch == '*':
+            result.append('[^/]*')
+        elif ch == '?':
+            result.append('[^/]')
+        elif ch == '[':
+            jj = ii
+            if jj < end and component[jj] == '!':
+                jj += 1
+            if jj < end and component[jj] == ']':
+                jj += 1
+            while jj < end and component[jj] != ']':
+                jj += 1
+            if jj >= end:
+                result.append(r'\[')
+                continue
+            stuff = component[ii:jj].replace('\\', r'\\')
+            stuff = re.sub(r'([&~|\[])', r'\\\1', stuff)
+            ii = jj + 1
+            if stuff.startswith('!'):
+                stuff = '^' + stuff[1:]
+            elif stuff.startswith('^'):
+                stuff = '\\' + stuff
+            result.append(f'(?!/)[{stuff}]')
+        else:
+            result.append(re.escape(ch))
+    return ''.join(result)
+
+
+def compile_glob(pattern):
+    return re.compile(translate(pattern))
+
+
+def index_filename(index_dir, root):
+    digest = hashlib.sha1(os.path.realpath(root).encode('utf-8')).hexdigest()
+    return os.path.join(index_dir, f'{digest[:16]}.json')
+
+
+class FileIndex(object):
+    def __init__(self, root, filename=None):
+        self.root = root
+        self.filename = filename
+        self.dirs = {}
+        self.dirty = False
+        if filename:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == INDEX_VERSION and \
+                data.get('root') == os.path.realpath(self.root):
+            self.dirs = data['dirs']
+
+    def save(self):
+        if not self.filename or not self.dirty:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'root': os.path.realpath(self.root),
+            'dirs': self.dirs,
+        }
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmp_filename = f'{self.filename}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_filename, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_filename, self.filename)
+        except OSError as e:
+            log.warning('cannot save file index %s: %s', self.filename, e)
+            return
+        self.dirty = False
+
+    def _list(self, path):
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    else:
+                        files.append(entry.name)
+                except OSError:
+                    continue
+        return sorted(files), sorted(subdirs)
+
+    def refresh(self):
+        """Brings the index up to date, listing only the directories whose
+        mtime has changed."""
+
+        dirs = {}
+        visited = set()
+        pending = ['']
+        while pending:
+            rel = pending.pop()
+            path = os.path.join(self.root, rel) if rel else self.root
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            # symlinks may form cycles
+            key = (st.st_dev, st.st_ino)
+            if key in visited:
+                continue
+            visited.add(key)
+            entry = self.dirs.get(rel)
+            if entry is None or entry[0] != st.st_mtime_ns:
+                try:
+                    files, subdirs = self._list(path)
+                except OSError:
+                    continue
+                entry = [st.st_mtime_ns, files, subdirs]
+                self.dirty = True
+            dirs[rel] = entry
+            pending.extend(f'{rel}/{x}' if rel else x for x in entry[2])
+        if dirs.keys() != self.dirs.keys():
+            self.dirty = True
+        self.dirs = dirs
+        return self
+
+    def paths(self):
+        """Yields the relative path of every indexed file and directory."""
+        for rel in sorted(self.dirs):
+            _, files, subdirs = self.dirs[rel]
+            prefix = f'{rel}/' if rel else ''
+            for name in files:
+                yield prefix + name
+            for name in subdirs:
+                yield prefix + name
+
+    def match(self, pattern):
+        """Returns the sorted relative paths that match the glob pattern."""
+        regex = compile_glob(pattern)
+        return sorted(x for x in self.paths() if regex.match(x))
@@ -0,0 +1,146 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Source formatter for many files.
+
+Each file is parsed on its own, without expanding includes, macros or
+conditional sections, and printed back with ModelPrinter.  The result is
+compared to the original with difflib.unified_diff, and files are only
+rewritten when the formatted text differs.  A file is left untouched, and
+reported as an error, if formatting it again would change it further or if
+any of its comments would be lost.
+
+Files are formatted in a process pool, and a FormatResult is yielded for each
+file, in order, as soon as it is done.
+
+    for result in Formatter().format(find_sources(['src']), workers=4):
+        print(result.filename, result.changed)
+"""
+
+import io
+import os
+import re
+import difflib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from attr import attrs
+from attr import Factory
+from typing import *
+from .parser import Parser
+from .decompiler import ModelPrinter
+from .preprocessor import scan_conditionals
+
+log = logging.getLogger(__name__)
+
+# file extensions picked up when a directory is formatted
+SOURCE_EXTENSIONS = ('.asm', '.inc')
+
+# strings are matched too, so that a ';' inside one is not taken as a comment
+comment_regex = re.compile(r'"(?:\\.|[^"\\\n])*"|(;[^\n]*)')
+
+
+def find_sources(paths, extensions=SOURCE_EXTENSIONS):
+    """Yields the files in paths, and the source files found below any
+    directories in paths, skipping hidden directories."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(x for x in dirs if not x.startswith('.'))
+            for name in sorted(files):
+                if name.endswith(extensions):
+                    yield os.path.join(root, name)
+
+
+def _comments(text):
+    return [x.rstrip() for x in comment_regex.findall(text) if x]
+
+
+@attrs(auto_attribs=True)
+class FormatResult(object):
+    filename: str
+    diff: List[str] = Factory(list)
+    written: bool = False
+    error: str = None
+
+    @property
+    def changed(self):
+        return bool(self.diff)
+
+
+class Formatter(object):
+    def __init__(self):
+        self.parser = Parser()
+
+    def format_text(self, text, context=None):
+        """Returns text formatted with ModelPrinter.  Conditional directives
+        are kept as they are, and the sections between them are formatted
+        on their own."""
+        buf = io.StringIO()
+        printer = ModelPrinter(buf, ansimode=False, show_context=False)
+        start = 0
+        for match in scan_conditionals(text):
+            printer.print_ast(self.parser.parse(text[:match.start()], start,
+                    context=context))
+            printer.text(match.group(0).strip()).nl()
+            start = match.end()
+        printer.print_ast(self.parser.parse(text, start, context=context))
+        return buf.getvalue()
+
+    def format_file(self, filename, write=False):
+        """Formats a single file and returns its FormatResult.  With write
+        set, the file is rewritten if the formatted text differs."""
+        result = FormatResult(filename)
+        try:
+            with open(filename) as f:
+                text = f.read()
+            formatted = self.format_text(text, filename)
+            if formatted == text:
+                return result
+            if _comments(formatted) != _comments(text):
+                raise Exception('formatting would drop comments')
+            if self.format_text(formatted, filename) != formatted:
+                raise Exception('formatted output is not stable')
+        except Exception as e:
+            result.error = str(e)
+            return result
+
+        result.diff = list(difflib.unified_diff(
+                text.splitlines(True), formatted.splitlines(True),
+                filename, filename))
+        if write:
+            with open(filename, 'w') as f:
+                f.write(formatted)
+            result.written = True
+        return result
+
+    def format(self, filenames, write=False, workers=None, chunksize=4):
+        """Formats files, yielding a FormatResult for each in order.
+
+        With workers set to 1 the files are formatted in this process.
+        Otherwise they are spread over a pool of worker processes.
+        """
+        if workers == 1:
+            for filename in filenames:
+                yield self.format_file(filename, write)
+            return
+        with ProcessPoolExecutor(max_workers=workers,
+                initializer=_init_worker) as executor:
+            filenames = list(filenames)
+            yield from executor.map(_format_worker, filenames,
+                    [write] * len(filenames), chunksize=chunksize)
+
+
+_worker_formatter = None
+
+
+def _init_worker():
+    global _worker_formatter
+    _worker_formatter = Formatter()
+
+
+def _format_worker(filename, write):
+    return _worker_formatter.format_file(filename, write)
@@ -0,0 +1,82 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+import logging
+from .compiler import Compiler
+
+log = logging.getLogger(__name__)
+
+
+class LinkError(Exception):
+    pass
+
+
+class Linker(Compiler):
+    '''Combines fixed-origin object files into a single memory image.
+
+       Segment contents are placed at the addresses they were assembled
+       for, and are never rebased, so units that share a segment must each
+       give it a distinct origin.  Overlapping placements, including two
+       units that both use a segment's default origin, and duplicate
+       exported symbols are rejected.  Each relocation is then resolved
+       against the scope it was assembled in, backed by the combined exports
+       of all objects, and patched into the image.
+
+       The resulting image exposes the same data, segments, map and pragma
+       attributes as a Compiler, and can be written out the same way.
+    '''
+
+    def __init__(self, ctx_manager):
+        super().__init__(ctx_manager)
+        self.exports = {}
+        self.placements = []
+
+    def _place(self, obj, objseg):
+        start = objseg.start
+        end = start + len(objseg.data)
+        if end > len(self.data):
+            raise LinkError(f'{obj.source}: segment {objseg.name} ' +
+                    f'${start:04X}-${end:04X} is out of range')
+        for other_start, other_end, other in self.placements:
+            if start < other_end and other_start < end:
+                raise LinkError(f'{obj.source}: segment {objseg.name} ' +
+                        f'${start:04X}-${end:04X} overlaps {other}; ' +
+                        'segments are not rebased, so each unit must ' +
+                        'set its own segment addresses')
+        self.placements.append((start, end, f'{obj.source} ({objseg.name})'))
+
+        seg = self.segments[objseg.name]
+        seg.origin(start)
+        self.data[start:end] = objseg.data
+        seg.offset = end
+
+    def _export(self, obj):
+        for name, value in obj.exports.items():
+            if name in self.exports:
+                raise LinkError(f'{obj.source}: symbol "{name}" is already ' +
+                        f'exported by {self.exports[name][1]}')
+            self.exports[name] = (value, obj.source)
+
+    def link(self, objects):
+        for obj in objects:
+            log.debug('placing %s', obj.source)
+            for objseg in obj.segments:
+                self._place(obj, objseg)
+            self._export(obj)
+            self.map.update(obj.map)
+            self.pragma.update(obj.pragma)
+
+        exports = {k: v for k, (v, _) in self.exports.items()}
+        for obj in objects:
+            missing = [x for x in obj.imports if x not in exports]
+            if missing:
+                raise LinkError(f'{obj.source}: unresolved symbols: ' +
+                        ', '.join(missing))
+            for reloc in obj.relocations:
+                log.debug('relocating %s', reloc)
+                reloc.expr.scope_stack = [exports] + reloc.expr.scope_stack
+                if reloc.op:
+                    self.resolve_op(reloc.op, reloc.addr, reloc.expr)
+                else:
+                    self.resolve_expr(reloc.addr, reloc.expr)
@@ -0,0 +1,119 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Per-request logging levels and output.
+
+A compile server runs many requests at once in one process, each with its
+own --debug and --trace switches and its own output stream, but logger
+levels are global.  So rather than setting levels for each request, each
+run of the application enters a RequestLogging, which:
+
+- lowers the logger levels to the most verbose level that any running
+  request asks for, and restores them when it exits, and
+- is recorded in a context variable, so that the process-wide handler passes
+  each record to the handler of the request it was logged in, but only if
+  that request's own levels allow it.
+
+Records logged outside of any request, such as on worker threads, are
+filtered by the default levels and written to stderr.
+
+This module is imported on every CLI start, so it must stay light.
+"""
+
+import logging
+import threading
+import contextvars
+
+# loggers enabled by each --trace choice
+trace_loggers = {
+    'compiler': 'xcomp.compiler',
+    'eval': 'xcomp.eval',
+    'pre': 'xcomp.preprocessor',
+    'parser': 'xcomp.parser',
+    'reducer': 'xcomp.reduce_parser',
+}
+
+_current = contextvars.ContextVar('request_logging', default=None)
+
+
+def request_levels(debug=False, trace=None):
+    """Returns the logger levels for the --debug and --trace switches, as a
+    dict of logger name to level; the root logger is named ''."""
+    trace = trace or []
+    levels = {'': logging.DEBUG if debug or trace else logging.WARN}
+    for name, logger_name in trace_loggers.items():
+        levels[logger_name] = logging.DEBUG if name in trace else logging.WARN
+    return levels
+
+
+class RequestLogging(object):
+    '''Logging levels and output handler of one request.  Use as a context
+       manager around the request.'''
+
+    active = []
+    lock = threading.Lock()
+
+    def __init__(self, levels, handler):
+        self.levels = levels
+        self.handler = handler
+        self.token = None
+
+    def level(self, name):
+        """Returns the level set for the logger name, or its closest parent."""
+        while name not in self.levels:
+            name = name.rpartition('.')[0]
+        return self.levels[name]
+
+    def enabled(self, record):
+        return record.levelno >= self.level(record.name)
+
+    def __enter__(self):
+        self.token = _current.set(self)
+        with self.lock:
+            self.active.append(self)
+            self._apply()
+        return self
+
+    def __exit__(self, *args):
+        with self.lock:
+            self.active.remove(self)
+            self._apply()
+        _current.reset(self.token)
+
+    @classmethod
+    def _apply(cls):
+        for name in request_levels():
+            level = min((x.level(name) for x in cls.active), default=logging.WARN)
+            logging.getLogger(name).setLevel(level)
+
+
+class StyledStreamHandler(logging.StreamHandler):
+    '''StreamHandler that formats records with a StyleFormatter.  The
+       printer, and with it ansicolors, is imported for the first record.'''
+
+    def __init__(self, stream=None, ansimode=False):
+        super().__init__(stream)
+        self.ansimode = ansimode
+
+    def format(self, record):
+        if self.formatter is None:
+            from .printer import StyleFormatter
+            from .settings import default_stylesheet
+            self.formatter = StyleFormatter(stylesheet=default_stylesheet,
+                    ansimode=self.ansimode)
+        return super().format(record)
+
+
+class RequestLogHandler(logging.Handler):
+    '''Passes records to the handler of the request they were logged in.'''
+
+    def __init__(self, default_handler):
+        super().__init__()
+        self.default = RequestLogging(request_levels(), default_handler)
+
+    def emit(self, record):
+        request = _current.get() or self.default
+        if request.enabled(record):
+            request.handler.handle(record)
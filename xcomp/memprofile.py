@@ -0,0 +1,166 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Memory profiling of a compile, phase by phase.
+
+profile_compile() runs the compile pipeline one phase at a time under
+tracemalloc, and takes a snapshot at the end of each phase:
+
+- setup: the compiler and its memory image are created
+- parse: the root file is parsed
+- preprocess: includes and macros are expanded into a list of AST nodes;
+  included files are parsed here
+- compile: every node is compiled into the memory image
+- fixup: outstanding fixups are resolved
+- write: output files are written
+
+A root file with .if, .ifdef or .ifndef directives is parsed a section at a
+time as it is pre-processed, as a condition may depend on a define made
+before it.  For such a file the parse phase parses nothing, and all of its
+parsing is reported under preprocess.
+
+Normally the pre-processor output is streamed into the compiler, so holding
+the whole stream in a list makes the reported figures an upper bound.  For
+each phase the report gives the traced memory at its end, the peak during
+it, the allocation sites that grew the most, and the number of live model
+nodes by type.
+"""
+
+import os
+import gc
+import logging
+import tracemalloc
+from collections import Counter
+from .preprocessor import PreProcessor
+from .compiler import Compiler
+
+log = logging.getLogger(__name__)
+
+
+def count_nodes():
+    """Returns a Counter of live model node instances by type name."""
+    return Counter(type(x).__name__ for x in gc.get_objects()
+            if type(x).__module__ == 'xcomp.model')
+
+
+def _site(stat):
+    frame = stat.traceback[0]
+    filename = os.path.join(*frame.filename.split(os.sep)[-2:])
+    return {
+        'site': f'{filename}:{frame.lineno}',
+        'size': stat.size_diff if hasattr(stat, 'size_diff') else stat.size,
+        'count': stat.count_diff if hasattr(stat, 'count_diff') else stat.count,
+    }
+
+
+class MemoryProfiler(object):
+    def __init__(self, top=10):
+        self.top = top
+        self.phases = []
+        self.peak = 0
+        self._snapshot = None
+
+    def start(self):
+        tracemalloc.start()
+        self._snapshot = self._take_snapshot()
+
+    def stop(self):
+        tracemalloc.stop()
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+
+    def phase(self, name):
+        """Records the end of phase name."""
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.peak = max(self.peak, peak)
+        snapshot = self._take_snapshot()
+        stats = snapshot.compare_to(self._snapshot, 'lineno')
+        stats = [x for x in stats if x.size_diff > 0]
+        self.phases.append({
+            'name': name,
+            'current': current,
+            'peak': peak,
+            'sites': [_site(x) for x in stats[:self.top]],
+            'nodes': dict(count_nodes().most_common()),
+        })
+        self._snapshot = snapshot
+
+    def report(self):
+        return {
+            'peak': self.peak,
+            'phases': self.phases,
+        }
+
+
+def profile_compile(ctx_manager, filename, write=None, top=10, defines=None):
+    """Compiles filename phase by phase and returns the MemoryProfiler.
+
+    write is called with the compiler to write its output.  defines are the
+    symbols given on the command line, as for Compiler."""
+
+    profiler = MemoryProfiler(top)
+    profiler.start()
+    try:
+        compiler = Compiler(ctx_manager, defines=defines)
+        compiler.preprocessor = PreProcessor(ctx_manager, defines=defines)
+        profiler.phase('setup')
+
+        # lazy if the root file has conditionals; see the module docstring
+        stream = compiler.preprocessor.parse(filename)
+        profiler.phase('parse')
+
+        stream = list(stream)
+        profiler.phase('preprocess')
+
+        compiler.begin()
+        for item in stream:
+            compiler._compile(item)
+        profiler.phase('compile')
+
+        compiler.finish()
+        profiler.phase('fixup')
+
+        if write:
+            write(compiler)
+        profiler.phase('write')
+    finally:
+        profiler.stop()
+    return profiler
+
+
+def _kb(value):
+    return f'{value / 1024:10.1f}'
+
+
+def print_report(printer, report):
+    printer.title('Memory Profile').nl()
+    printer.bold(f'  {"phase":12} {"current KiB":>12} {"peak KiB":>12} {"nodes":>10}').nl()
+    for phase in report['phases']:
+        printer.text(f'  {phase["name"]:12} {_kb(phase["current"]):>12}'
+                f' {_kb(phase["peak"]):>12} {sum(phase["nodes"].values()):10}').nl()
+    printer.bold(f'  {"peak":12} {"":12} {_kb(report["peak"]):>12}').nl()
+
+    for phase in report['phases']:
+        if not phase['sites']:
+            continue
+        printer.nl()
+        printer.title(f'Top allocations: {phase["name"]}').nl()
+        for site in phase['sites']:
+            printer.text(f'  {_kb(site["size"])} KiB {site["count"]:8} blocks'
+                    f'  {site["site"]}').nl()
+
+    phase = max(report['phases'], key=lambda x: sum(x['nodes'].values()),
+            default=None)
+    if phase and phase['nodes']:
+        printer.nl()
+        printer.title(f'Model nodes: {phase["name"]}').nl()
+        for name, count in phase['nodes'].items():
+            printer.text(f'  {name:20} {count:10}').nl()
@@ -55,9 +55,16 @@ class Include(ModelBase):
     filename: String
 
 
+@attrs(auto_attribs=True)
+class Once(ModelBase):
+    pass
+
+
 @attrs(auto_attribs=True)
 class BinaryInclude(ModelBase):
     filename: str
+    offset: Expr = None
+    length: Expr = None
 
 
 @attrs(auto_attribs=True)
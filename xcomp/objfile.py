@@ -0,0 +1,179 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Fixed-origin object files for separately assembled translation units.
+
+An object file holds the assembled segment contents of one translation unit,
+the symbols it exports, the names it imports, and a relocation record for
+every fixup that could not be resolved within the unit.  Object files are
+stored with pickle, and should only be loaded from trusted sources.
+
+Segment contents are assembled for fixed addresses, and are linked at those
+addresses.  Relocation records only patch in the values of imported
+symbols; references to a unit's own labels are already resolved and are
+not recorded, so segments cannot be moved at link time.  Units that are
+linked together must give the segments they share distinct origins.
+"""
+
+import os
+import pickle
+from attr import attrs
+from attr import Factory
+from typing import *
+from .model import *
+from .eval import FixupExpr
+from .eval import Relocation
+
+OBJECT_MAGIC = b'XCOMPOBJ'
+OBJECT_VERSION = 3
+
+
+class ObjectFileException(Exception):
+    pass
+
+
+def _expr_names(expr):
+    """Yields all names referenced by an expression."""
+    if isinstance(expr, FixupExpr):
+        expr = expr.expr
+    if isinstance(expr, ExprName):
+        yield expr.value
+    elif isinstance(expr, ExprBinaryOp):
+        yield from _expr_names(expr.left)
+        yield from _expr_names(expr.right)
+    elif isinstance(expr, ExprUnaryOp):
+        yield from _expr_names(expr.arg)
+
+
+def unresolved_names(scope_stack, expr, visited=None):
+    """Returns the set of names in expr that cannot be found in scope_stack.
+
+    Names that resolve to other expressions are followed, so that a define
+    referring to an external symbol reports that symbol."""
+
+    visited = visited if visited is not None else set()
+    result = set()
+    for name in _expr_names(expr):
+        if name in visited:
+            continue
+        visited.add(name)
+        for scope in reversed(scope_stack):
+            if name in scope:
+                result |= unresolved_names(scope_stack, scope[name], visited)
+                break
+        else:
+            result.add(name)
+    return result
+
+
+def relocation_scope(scope_stack, expr, scope=None):
+    """Returns a single scope holding only the names that expr needs from
+    scope_stack, following names that resolve to other expressions."""
+
+    scope = scope if scope is not None else {}
+    for name in _expr_names(expr):
+        if name in scope:
+            continue
+        for outer in reversed(scope_stack):
+            if name in outer:
+                scope[name] = outer[name]
+                relocation_scope(scope_stack, outer[name], scope)
+                break
+    return scope
+
+
+@attrs(auto_attribs=True)
+class ObjectSegment(object):
+    name: str
+    start: int
+    data: bytes
+
+
+@attrs(auto_attribs=True)
+class ObjectFile(object):
+    source: str
+    segments: List[ObjectSegment] = Factory(list)
+    exports: Dict[str, int] = Factory(dict)
+    imports: List[str] = Factory(list)
+    relocations: List[Relocation] = Factory(list)
+    map: Dict[str, int] = Factory(dict)
+    pragma: Dict[str, Any] = Factory(dict)
+    include_paths: List[str] = Factory(list)
+    dependencies: List[str] = Factory(list)
+
+    @classmethod
+    def fromCompiler(self, compiler, source):
+        """Builds an object file from a compiler run with relocatable set,
+        which leaves fixups of imported symbols pending."""
+        obj = ObjectFile(source, map=dict(compiler.map),
+                pragma=dict(compiler.pragma),
+                include_paths=list(compiler.ctx_manager.include_paths))
+
+        for name, seg in compiler.segments.items():
+            if seg.end > seg.start:
+                obj.segments.append(ObjectSegment(name, seg.start,
+                        bytes(compiler.data[seg.start:seg.end])))
+
+        # export the labels and the names defined by the unit's own source
+        # that evaluate to a value on their own.  Defines from an included
+        # header are left out, as every unit that includes it has them.
+        compiler.eval.scope_stack = [compiler.globals]
+        try:
+            for name, value in compiler.globals.items():
+                if name in ('byte', 'word', 'long'):
+                    continue
+                pos = getattr(value, 'pos', None)
+                if pos is not None and pos.context != source:
+                    continue
+                try:
+                    obj.exports[name] = compiler.eval.eval(value)
+                except Exception:
+                    pass
+        finally:
+            compiler.eval.scope_stack = []
+
+        imports = set()
+        for reloc in compiler.get_relocations():
+            expr = reloc.expr
+            imports |= unresolved_names(expr.scope_stack, expr)
+            # only the names the relocation refers to are kept, rather than
+            # every scope that was open when it was assembled
+            reloc.expr = FixupExpr(expr.pos,
+                    [relocation_scope(expr.scope_stack, expr)], expr.expr)
+            obj.relocations.append(reloc)
+        obj.imports = sorted(imports)
+
+        # text and binary files the unit read
+        for filename in compiler.ctx_manager.dependencies:
+            full_filename = compiler.ctx_manager.search_file(filename)
+            if full_filename:
+                obj.dependencies.append(os.path.abspath(full_filename))
+        return obj
+
+    def is_current(self, filename, include_paths):
+        """Returns true if the object at filename is newer than its dependencies."""
+        if list(include_paths) != self.include_paths:
+            return False
+        mtime = os.path.getmtime(filename)
+        for dep in self.dependencies:
+            if not os.path.isfile(dep) or os.path.getmtime(dep) > mtime:
+                return False
+        return True
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(OBJECT_MAGIC)
+            pickle.dump((OBJECT_VERSION, self), f)
+
+    @classmethod
+    def load(self, filename):
+        with open(filename, 'rb') as f:
+            if f.read(len(OBJECT_MAGIC)) != OBJECT_MAGIC:
+                raise ObjectFileException(f'"{filename}" is not an object file')
+            version, obj = pickle.load(f)
+        if version != OBJECT_VERSION:
+            raise ObjectFileException(
+                    f'"{filename}" has unsupported object version {version}')
+        return obj
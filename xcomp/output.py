@@ -0,0 +1,41 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""Output file generation for compiled and linked images."""
+
+from .utils import intbytes
+
+
+def get_binary(image, segments=None, out_format='raw'):
+    """Returns the selected segments of an image in the requested format."""
+    start, end = image.get_extents(segments)
+    if out_format.lower() == 'prg':
+        header = intbytes(image.pragma.get('c64_prg_start', 0x0801))
+    elif out_format.lower() == 'raw':
+        header = bytes([])
+    else:
+        raise Exception(f'Unknown output format "{out_format}"')
+    return header + bytes(image.data[start:end])
+
+
+def get_mapfile(image):
+    """Returns the text of the mapfile for an image."""
+    return ''.join([f'{k}: {v:04x}\n' for k, v in image.map.items()])
+
+
+def write_file(filename, data):
+    """Writes data to filename, unless the file already holds that data.
+
+    Returns True if the file was written."""
+
+    mode = 'b' if isinstance(data, bytes) else 't'
+    try:
+        with open(filename, 'r' + mode) as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    with open(filename, 'w' + mode) as f:
+        f.write(data)
+    return True
@@ -19,7 +19,7 @@ log = logging.getLogger(__name__)
 # TODO: move sp to nbsp and refactor other items
 
 grammar = r"""
-goal            = (include / macro / scope / struct / core_syntax)*
+goal            = (include / once / macro / scope / struct / core_syntax)*
 
 core_syntax     = comment / byte_storage / word_storage / segment /
                   def / encoding / dim / bin / var /
@@ -31,6 +31,7 @@ struct          = struct_tok sp ident (sp expr)? _ struct_body _ end_tok
 struct_body    = (comment / label / var / def / _)*
 
 include         = include_tok sp string
+once            = once_tok !ident
 
 def             = def_tok sp name sp expr
 
@@ -47,7 +48,7 @@ scope           = scope_tok _ core_syntax* _ endscope
 endscope        = _ end_tok
 
 dim             = dim_tok sp expr _ (comma_tok _ expr)*
-bin             = bin_tok sp string
+bin             = bin_tok sp string (_ comma_tok _ expr (_ comma_tok _ expr)?)?
 
 var             = var_tok sp name sp expr _ (comma_tok _ expr)*
 
@@ -106,6 +107,7 @@ encoding_tok    = ".encoding"
 end_tok         = ".end"
 include_tok     = ".include"
 macro_tok       = ".macro"
+once_tok        = ".once"
 pragma_tok      = ".pragma"
 scope_tok       = ".scope"
 struct_tok      = ".struct"
@@ -136,7 +138,7 @@ asterisk_tok    = "*"
 period_tok      = "."
 
 # space handling
-eol             = comment? ~r"\n[ \t]*"
+eol             = ~r"\n[ \t]*"
 _               = (~r"[ \t]+" / eol)?
 sp              = ~r"[ \t]+"
 
@@ -160,10 +162,10 @@ arg_abs_y       = sp expr16 _ comma_tok _ y_tok
 arg_rel         = sp expr _
 
 # 6502 instructions
-op_adc = "adc" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x /
-                arg_abs_y / arg_abs)
-op_and = "and" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x /
-                arg_abs_y / arg_abs)
+op_adc = "adc" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp /
+                arg_abs_x / arg_abs)
+op_and = "and" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp /
+                arg_abs_x / arg_abs)
 op_asl = "asl" (arg_acc / arg_zp_x / arg_zp / arg_abs_x / arg_abs)
 op_bcc = "bcc" arg_rel
 op_bcs = "bcs" arg_rel
@@ -174,32 +176,33 @@ op_bne = "bne" arg_rel
 op_bpl = "bpl" arg_rel
 op_brk = "brk"
 op_bvc = "bvc" arg_rel
+op_bvs = "bvs" arg_rel
 op_clc = "clc"
 op_cld = "cld"
 op_cli = "cli"
 op_clv = "clv"
-op_cmp = "cmp" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x /
-               arg_abs_y / arg_abs)
+op_cmp = "cmp" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp /
+               arg_abs_x / arg_abs)
 op_cpx = "cpx" (arg_imm / arg_zp / arg_abs)
 op_cpy = "cpy" (arg_imm / arg_zp / arg_abs)
 op_dec = "dec" (arg_zp_x / arg_zp / arg_abs_x / arg_abs)?
 op_dex = "dex"
 op_dey = "dey"
-op_eor = "eor" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x /
-                arg_abs_y / arg_abs)
+op_eor = "eor" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp /
+                arg_abs_x / arg_abs)
 op_inc = "inc" (arg_zp_x / arg_zp / arg_abs_x / arg_abs)
 op_inx = "inx"
 op_iny = "iny"
 op_jmp = "jmp" (arg_ind / arg_abs)
 op_jsr = "jsr" arg_abs
-op_lda = "lda" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x /
-                arg_abs_y / arg_abs)
+op_lda = "lda" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp /
+                arg_abs_x / arg_abs)
 op_ldx = "ldx" (arg_imm / arg_zp_y / arg_zp / arg_abs_y / arg_abs)
 op_ldy = "ldy" (arg_imm / arg_zp_x / arg_zp / arg_abs_x / arg_abs)
 op_lsr = "lsr" (arg_acc / arg_zp_x / arg_zp / arg_abs_x / arg_abs)
 op_nop = "nop"
-op_ora = "ora" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x /
-                arg_abs_y / arg_abs)
+op_ora = "ora" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp /
+                arg_abs_x / arg_abs)
 op_pha = "pha"
 op_php = "php"
 op_pla = "pla"
@@ -208,12 +211,12 @@ op_rol = "rol" (arg_acc / arg_zp_x / arg_zp / arg_abs_x / arg_abs)
 op_ror = "ror" (arg_acc / arg_zp_x / arg_zp / arg_abs_x / arg_abs)
 op_rti = "rti"
 op_rts = "rts"
-op_sbc = "sbc" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x /
-                arg_abs_y / arg_abs)
+op_sbc = "sbc" (arg_imm / arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp /
+                arg_abs_x / arg_abs)
 op_sec = "sec"
 op_sed = "sed"
 op_sei = "sei"
-op_sta = "sta" (arg_ind_x / arg_ind_y / arg_zp_x / arg_zp / arg_abs_x / arg_abs_y /
+op_sta = "sta" (arg_ind_x / arg_ind_y / arg_zp_x / arg_abs_y / arg_zp / arg_abs_x /
                 arg_abs)
 op_stx = "stx" (arg_zp_y / arg_zp / arg_abs)
 op_sty = "sty" (arg_zp_x / arg_zp / arg_abs)
@@ -225,8 +228,8 @@ op_txs = "txs"
 op_tya = "tya"
 
 oper = op_adc / op_and / op_asl / op_bcc / op_bcs / op_beq / op_bit / op_bmi /
-       op_bne / op_bpl / op_brk / op_bvc / op_clc / op_cld / op_cli / op_clv /
-       op_cmp / op_cpx / op_cpy / op_dec / op_dex / op_dey /
+       op_bne / op_bpl / op_brk / op_bvc / op_bvs / op_clc / op_cld / op_cli /
+       op_clv / op_cmp / op_cpx / op_cpy / op_dec / op_dex / op_dey /
        op_eor / op_inc / op_inx / op_iny /
        op_jmp / op_jsr / op_lda / op_ldx / op_ldy / op_lsr / op_nop / op_ora /
        op_pha / op_php / op_pla / op_plp / op_rol / op_ror / op_rti / op_rts /
@@ -241,6 +244,7 @@ class Parser(ReduceParser):
 
     def __init__(self):
         super().__init__(grammar=grammar)
+        self.text = ''
         self.last_token = None
 
     def error_generic(self, e):
@@ -249,6 +253,11 @@ class Parser(ReduceParser):
             return 'Invalid syntax. Expected directive, macro, label, or operation'
         return super().error_generic(e)
 
+    def parse(self, text, *args, **kwargs):
+        self.text = text
+        self.last_token = None
+        return super().parse(text, *args, **kwargs)
+
     def visit(self, node):
         result = super().visit(node)
         if not isinstance(result, TokenList) and not isinstance(result, Comment):
@@ -259,7 +268,10 @@ class Parser(ReduceParser):
         self.last_token = None
 
     def visit_comment(self, pos, value):
-        full_line = self.last_token is None
+        # a comment is only attached to a token on the same line
+        line_start = self.text.rfind('\n', 0, pos.start) + 1
+        full_line = self.last_token is None or \
+                not self.text[line_start:pos.start].strip()
         result = Comment(pos, full_line, value.text)
         log.debug('visit_comment: %s last_token: %s', result, self.last_token)
         if not full_line:
@@ -280,8 +292,11 @@ class Parser(ReduceParser):
     def visit_include(self, pos, filename):
         return Include(pos, filename.value)
 
-    def visit_bin(self, pos, filename):
-        return BinaryInclude(pos, filename.value)
+    def visit_once(self, pos):
+        return Once(pos)
+
+    def visit_bin(self, pos, filename, offset=None, length=None):
+        return BinaryInclude(pos, filename.value, offset, length)
 
     def visit_scope(self, pos, *tokens):
         return TokenList([Scope(pos)] + list(tokens))
@@ -376,11 +391,15 @@ class Parser(ReduceParser):
 
     ### NUMBER ###
 
+    # literals written with leading zeros keep their width, as in $0010
+
     def visit_base2(self, pos, lit):
-        return ExprValue(pos, int(lit.text, base=2), 2)
+        width = 16 if len(lit.text) > 8 else 8
+        return ExprValue(pos, int(lit.text, base=2), 2, width)
 
     def visit_base16(self, pos, lit):
-        return ExprValue(pos, int(lit.text, base=16), 16)
+        width = 16 if len(lit.text) > 2 else 8
+        return ExprValue(pos, int(lit.text, base=16), 16, width)
 
     def visit_base10(self, pos, lit):
         return ExprValue(pos, int(lit.text, base=10), 10)
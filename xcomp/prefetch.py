@@ -0,0 +1,83 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Asynchronous prefetch of the include closure of a source file.
+
+Each file is scanned for .include and .bin directives as soon as it has been
+read, and the files they name are loaded concurrently on a thread pool.  The
+files land in the FileContextManager caches, so the pre-processor and
+compiler find them already loaded.  A file the compiler asks for while it is
+still being fetched is waited on, not read twice.  Binary files are read by
+the compiler on each use, so for .bin only the path is resolved.
+
+The scan is a simple line match, so it may fetch files that the compile does
+not use, such as includes in unused macros; these are loaded through a
+separate session and are not recorded as dependencies of the compile.
+Files that cannot be found are skipped, and reported by the compile itself.
+"""
+
+import re
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .compiler_base import FileContextException
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+directive_re = re.compile(r'^[ \t]*\.(include|bin)[ \t]+"([^"\\\n]*)"', re.MULTILINE)
+
+
+def scan(text):
+    """Yields (directive, filename) for each .include and .bin in text."""
+    for match in directive_re.finditer(text):
+        yield match.group(1), match.group(2)
+
+
+async def prefetch(ctx_manager, filename, executor=None):
+    """Loads filename and everything it includes into the caches of
+    ctx_manager, and returns the names of the files that were loaded."""
+
+    loop = asyncio.get_running_loop()
+    session = ctx_manager.session()
+    seen = set()
+    loaded = []
+
+    async def fetch(name, binary):
+        if name in seen:
+            return
+        seen.add(name)
+        loader = session.search_file if binary else session.get_text
+        try:
+            value = await loop.run_in_executor(executor, loader, name)
+        except (FileContextException, OSError, UnicodeError) as e:
+            log.debug('cannot prefetch %s: %s', name, e)
+            return
+        if value is None:
+            log.debug('cannot prefetch %s: not found', name)
+            return
+        loaded.append(name)
+        if not binary:
+            await asyncio.gather(*[fetch(x, kind == 'bin')
+                    for kind, x in scan(value)])
+
+    await fetch(filename, False)
+    return sorted(loaded)
+
+
+def run_prefetch(ctx_manager, filename, workers=DEFAULT_WORKERS):
+    """Runs prefetch() to completion on its own event loop and thread pool."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return asyncio.run(prefetch(ctx_manager, filename, executor))
+
+
+def start_prefetch(ctx_manager, filename, workers=DEFAULT_WORKERS):
+    """Starts run_prefetch() on a background thread and returns a Future for
+    its result, so that compilation can proceed while files load."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(run_prefetch, ctx_manager, filename, workers)
+    executor.shutdown(wait=False)
+    return future
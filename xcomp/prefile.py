@@ -0,0 +1,259 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Binary serialization of pre-processed node streams.
+
+`xcomp pre --format=bin` saves the output of the PreProcessor in this
+format, and `xcomp compile --from-pre` compiles it without reading or
+parsing any source, so that one pre-processing run can feed many compiles.
+
+A file holds a magic number and version, followed by a zlib compressed
+payload of three parts: a table of the model class names used, a table of
+every distinct string, and the nodes.  Each value is written as a one byte
+tag followed by its contents, with integers as varints and strings as
+indexes into the string table.  Nodes and positions that occur more than
+once in the stream, such as the body of a macro expanded many times, are
+written once and referenced after that, so the loaded stream shares nodes
+just as the pre-processor output does.
+
+Only model classes and positions are ever constructed when loading, so
+unlike pickle the format is safe to read from untrusted sources.
+"""
+
+import zlib
+import attr
+from . import model
+from .cpu6502 import AddressMode
+from .reduce_parser import Pos
+
+PRE_MAGIC = b'XCOMPPRE'
+PRE_VERSION = 1
+
+# value tags
+NONE, FALSE, TRUE, INT, NEG, STR, LIST, TUPLE, NODE, POS, REF, MODE = range(12)
+
+
+class PreFileException(Exception):
+    pass
+
+
+def _model_classes():
+    """Returns the attrs classes of the model module, by name."""
+    return {name: value for name, value in vars(model).items()
+            if isinstance(value, type) and attr.has(value) and
+            value.__module__ == model.__name__}
+
+
+model_classes = _model_classes()
+
+_fields = {}
+
+
+def _field_names(cls):
+    names = _fields.get(cls, None)
+    if names is None:
+        names = _fields[cls] = tuple(x.name for x in attr.fields(cls))
+    return names
+
+
+class PreWriter(object):
+    def __init__(self):
+        self.strings = {}
+        self.classes = {}
+        self.memo = {}
+        # memoized objects are kept alive so that their ids stay unique
+        self.objects = []
+        self.out = bytearray()
+
+    def _varint(self, value, out=None):
+        out = self.out if out is None else out
+        while value > 0x7F:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def _string(self, value):
+        index = self.strings.get(value, None)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        self._varint(index)
+
+    def _memoize(self, value):
+        """Writes a reference and returns True if value was written before."""
+        index = self.memo.get(id(value), None)
+        if index is not None:
+            self.out.append(REF)
+            self._varint(index)
+            return True
+        self.memo[id(value)] = len(self.objects)
+        self.objects.append(value)
+        return False
+
+    def write(self, value):
+        out = self.out
+        if value is None:
+            out.append(NONE)
+        elif value is True:
+            out.append(TRUE)
+        elif value is False:
+            out.append(FALSE)
+        elif isinstance(value, AddressMode):
+            out.append(MODE)
+            self._varint(value.value)
+        elif isinstance(value, int):
+            if value < 0:
+                out.append(NEG)
+                self._varint(-value)
+            else:
+                out.append(INT)
+                self._varint(value)
+        elif isinstance(value, str):
+            out.append(STR)
+            self._string(value)
+        elif isinstance(value, (list, tuple)):
+            out.append(LIST if isinstance(value, list) else TUPLE)
+            self._varint(len(value))
+            for item in value:
+                self.write(item)
+        elif isinstance(value, Pos):
+            if not self._memoize(value):
+                out.append(POS)
+                self._varint(value.start)
+                self._varint(value.end - value.start)
+                self._string(value.context)
+        else:
+            cls = type(value)
+            name = cls.__name__
+            if model_classes.get(name, None) is not cls:
+                raise PreFileException(f'Cannot serialize {name} value')
+            if self._memoize(value):
+                return
+            index = self.classes.get(name, None)
+            if index is None:
+                index = self.classes[name] = len(self.classes)
+            out.append(NODE)
+            self._varint(index)
+            for field in _field_names(cls):
+                self.write(getattr(value, field))
+
+    def _table(self, names):
+        out = bytearray()
+        self._varint(len(names), out)
+        for name in names:
+            data = name.encode('utf-8')
+            self._varint(len(data), out)
+            out += data
+        return out
+
+    def getvalue(self, count):
+        """Returns the file contents for the count values written."""
+        payload = self._table(list(self.classes)) + self._table(list(self.strings))
+        self._varint(count, payload)
+        payload += self.out
+        header = bytearray(PRE_MAGIC)
+        self._varint(PRE_VERSION, header)
+        return bytes(header) + zlib.compress(payload)
+
+
+class PreReader(object):
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+        self.objects = []
+        self.classes = []
+        self.strings = []
+
+    def _varint(self):
+        data = self.data
+        result = shift = 0
+        while True:
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def _table(self):
+        result = []
+        for _ in range(self._varint()):
+            length = self._varint()
+            result.append(str(self.data[self.pos:self.pos + length], 'utf-8'))
+            self.pos += length
+        return result
+
+    def _class(self, name):
+        cls = model_classes.get(name, None)
+        if cls is None:
+            raise PreFileException(f'Unknown node type {name}')
+        return cls, _field_names(cls)
+
+    def read(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == NODE:
+            cls, fields = self.classes[self._varint()]
+            # comment is not an init argument, so fields are set directly
+            node = cls.__new__(cls)
+            self.objects.append(node)
+            node.__dict__.update((x, self.read()) for x in fields)
+            return node
+        elif tag == STR:
+            return self.strings[self._varint()]
+        elif tag == INT:
+            return self._varint()
+        elif tag == POS:
+            start = self._varint()
+            pos = Pos(start, start + self._varint(), self.strings[self._varint()])
+            self.objects.append(pos)
+            return pos
+        elif tag == REF:
+            return self.objects[self._varint()]
+        elif tag == NONE:
+            return None
+        elif tag == MODE:
+            return AddressMode(self._varint())
+        elif tag == LIST or tag == TUPLE:
+            items = [self.read() for _ in range(self._varint())]
+            return items if tag == LIST else tuple(items)
+        elif tag == NEG:
+            return -self._varint()
+        elif tag == TRUE:
+            return True
+        elif tag == FALSE:
+            return False
+        raise PreFileException(f'Invalid value tag {tag}')
+
+    def read_all(self):
+        """Reads the tables, and returns the list of nodes that follows."""
+        self.classes = [self._class(x) for x in self._table()]
+        self.strings = self._table()
+        return [self.read() for _ in range(self._varint())]
+
+
+def dumps(ast):
+    """Returns the serialized form of a node stream."""
+    writer = PreWriter()
+    count = 0
+    for node in ast:
+        writer.write(node)
+        count += 1
+    return writer.getvalue(count)
+
+
+def loads(data):
+    """Returns the list of nodes held in serialized data."""
+    data = memoryview(data)
+    if bytes(data[:len(PRE_MAGIC)]) != PRE_MAGIC:
+        raise PreFileException('Not a pre-processed file')
+    header = PreReader(data, len(PRE_MAGIC))
+    version = header._varint()
+    if version != PRE_VERSION:
+        raise PreFileException(f'Unsupported pre-processed file version {version}')
+    try:
+        payload = zlib.decompress(data[header.pos:])
+        return PreReader(payload).read_all()
+    except (zlib.error, IndexError, ValueError) as e:
+        raise PreFileException(f'Corrupt pre-processed file: {e}')
@@ -2,16 +2,85 @@
 # All rights reserved.
 # Published under the BSD license.  See LICENSE For details.
 
+import re
 import logging
+import threading
+from itertools import chain
 from functools import singledispatchmethod
 from .model import *
 from .parser import Parser
 from .parser import ParseError
 from .compiler_base import CompilerBase
 from .compiler_base import FileContextException
+from .eval import Evaluator
 
 log = logging.getLogger(__name__)
 
+# conditional assembly directives; each must be on a line of its own
+conditional_regex = re.compile(
+        r'^[ \t]*\.(ifdef|ifndef|if|else|endif)\b[ \t]*([^;\n]*)[^\n]*\n?', re.M)
+
+# directives that open and close blocks, which conditionals may not be in
+block_regex = re.compile(r'^[^;\n]*?\.(macro|struct|scope|end)\b', re.M)
+
+# context of the symbols defined on the command line
+DEFINE_CONTEXT = '<command line>'
+
+
+def scan_conditionals(text):
+    """Returns a match for every conditional directive in text."""
+    if '.if' not in text and '.else' not in text and '.endif' not in text:
+        return []
+    return list(conditional_regex.finditer(text))
+
+
+class AstCache(object):
+    '''Cache of parsed source files that may be shared between compiles.
+
+       Entries are keyed on the context name and the full text of the file,
+       so a file that has changed is parsed again.  A single Parser, and
+       therefore a single grammar, is used for all files parsed through the
+       cache.
+
+       Cached ASTs are shared; consumers must not modify the nodes.  The
+       cache may be used from several threads at once.
+    '''
+
+    def __init__(self):
+        self.parser = None
+        self.asts = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def parse(self, ctx_name, text, start=0, end=None, rule=None):
+        '''Returns the AST for text[start:end].  Positions are relative to
+           the start of text.'''
+        key = (ctx_name, text, start, end, rule)
+        with self.lock:
+            ast = self.asts.get(key, None)
+            if ast is None:
+                self.misses += 1
+                if not self.parser:
+                    self.parser = Parser()
+                if end is not None:
+                    text = text[:end]
+                ast = self.parser.parse(text, start, context=ctx_name, rule=rule)
+                self.asts[key] = ast
+            else:
+                self.hits += 1
+        return ast
+
+    def invalidate(self, ctx_name=None):
+        '''Drops cached ASTs for ctx_name, or all ASTs if no name is given.'''
+        with self.lock:
+            if ctx_name is None:
+                self.asts.clear()
+            else:
+                for key in [x for x in self.asts if x[0] == ctx_name]:
+                    del self.asts[key]
+
+
 class PreProcessor(CompilerBase):
     '''Parses an input file and returns an AST stream representative of the parsed
        file data.
@@ -21,25 +90,118 @@ class PreProcessor(CompilerBase):
 
        - Root file is parsed and evaluted for tokens that can be processed
        - .include directives are expanded to additional pre-processed output
+       - .include of a file marked with .once is skipped after the first
        - .macro definitions are consumed
        - macro calls are substituted from their corresponding macros
+       - .if, .ifdef and .ifndef sections are kept or dropped
+
+       Conditional sections are resolved before parsing: the text of a
+       section that is dropped is never parsed.  Conditions are evaluated
+       against the .def directives seen so far, and the defines passed in,
+       which map names to expression source text.  The passed defines are
+       also emitted as .def directives at the start of the stream.
+       Conditional directives are only allowed at statement level, outside
+       of .macro, .struct and .scope blocks.
 
        A single stream of tokens representative of the entire graph of files,
        included from the root file, is returned.
+
+       Parsed files are kept in an AstCache, so including a file repeatedly
+       costs a single parse.  The cache is private to the pre-processor
+       unless one is provided.
     '''
 
-    def __init__(self, ctx_manager):
+    def __init__(self, ctx_manager, ast_cache=None, defines=None):
         super().__init__(ctx_manager)
+        self.ast_cache = ast_cache if ast_cache is not None else AstCache()
+        self.defines = dict(defines or {})
         self.reset()
 
     def reset(self):
         self.macros = {}
+        self.once = set()
+        self.symbols = {}
+        self.eval = Evaluator(self.ctx_manager)
+        self.eval.scope_stack = [self.symbols]
+        self.stats = {
+            'includes': 0,
+            'includes_deduplicated': 0,
+            'macro_expansions': 0,
+            'sections_skipped': 0,
+        }
 
     def _parse(self, ctx_name):
-        parser = Parser()
-        # TODO: handle duplicate include
         text = self.ctx_manager.get_text(ctx_name)
-        return parser.parse(text, context=ctx_name)
+        directives = scan_conditionals(text)
+        if not directives:
+            return self.ast_cache.parse(ctx_name, text)
+        return self._parse_conditional(ctx_name, text, directives)
+
+    def _condition(self, ctx_name, text, match):
+        kind, arg = match.group(1), match.group(2).strip()
+        pos = Pos(match.start(1) - 1, match.end(2), ctx_name)
+        if not arg:
+            self._error(pos, f'.{kind} requires an argument')
+        if kind == 'if':
+            start = match.start(2)
+            expr = self.ast_cache.parse(ctx_name, text, start, start + len(arg), 'expr')[0]
+            return bool(self.eval.eval(expr))
+        return (arg in self.symbols) == (kind == 'ifdef')
+
+    def _parse_conditional(self, ctx_name, text, directives):
+        '''Yields the nodes of the sections of text that are enabled.  Nodes
+           are yielded as each section is parsed, so conditions see the
+           defines of the sections before them.'''
+        # each entry is [directive pos, enclosing section enabled, taken, in else]
+        stack = []
+        # .macro, .struct and .scope blocks open before the next directive
+        blocks = []
+        enabled = True
+        start = 0
+        for match in directives:
+            for block in block_regex.finditer(text, start, match.start()):
+                if block.group(1) != 'end':
+                    blocks.append(block.group(1))
+                elif blocks:
+                    blocks.pop()
+            if blocks:
+                # sections are parsed separately, so a block cannot span one
+                self._error(Pos(match.start(1) - 1, match.end(1), ctx_name),
+                        f'.{match.group(1)} is not allowed inside a ' +
+                        f'.{blocks[-1]} block')
+            if start < match.start():
+                if enabled:
+                    yield from self.ast_cache.parse(ctx_name, text, start, match.start())
+                else:
+                    self.stats['sections_skipped'] += 1
+            start = match.end()
+
+            kind = match.group(1)
+            pos = Pos(match.start(1) - 1, match.end(1), ctx_name)
+            if kind in ('if', 'ifdef', 'ifndef'):
+                taken = enabled and self._condition(ctx_name, text, match)
+                stack.append([pos, enabled, taken, False])
+                enabled = taken
+            elif not stack:
+                self._error(pos, f'.{kind} without .if')
+            elif kind == 'else':
+                entry = stack[-1]
+                if entry[3]:
+                    self._error(pos, '.else after .else')
+                entry[3] = True
+                enabled = entry[1] and not entry[2]
+            else:
+                enabled = stack.pop()[1]
+        if stack:
+            self._error(stack[-1][0], '.if without .endif')
+        if start < len(text):
+            yield from self.ast_cache.parse(ctx_name, text, start)
+
+    def _command_line(self):
+        '''Yields a Define for each of the defines passed in.'''
+        for name, value in self.defines.items():
+            expr = self.ast_cache.parse(DEFINE_CONTEXT, value, rule='expr')[0]
+            yield Define(Pos(0, 0, DEFINE_CONTEXT), name, expr)
 
     @singledispatchmethod
     def _process(self, item):
@@ -47,6 +209,11 @@ class PreProcessor(CompilerBase):
 
     @_process.register
     def _process_include(self, include: Include):
+        if self.ctx_manager.real_path(include.filename) in self.once:
+            log.debug('skipping include of %s', include.filename)
+            self.stats['includes_deduplicated'] += 1
+            return
+        self.stats['includes'] += 1
         try:
             included_ast = self._parse(include.filename)
         except FileContextException as e:
@@ -54,6 +221,16 @@ class PreProcessor(CompilerBase):
         for x in self._pre_process(included_ast):
             yield x
 
+    @_process.register
+    def _process_define(self, define: Define):
+        self.symbols[define.name] = define.expr
+        yield define
+
+    @_process.register
+    def _process_once(self, once: Once):
+        ''' Mark the current file as included. '''
+        self.once.add(self.ctx_manager.real_path(once.pos.context))
+
     @_process.register
     def _process_macro(self, macro: Macro):
         ''' Register macro definition. '''
@@ -76,6 +253,7 @@ class PreProcessor(CompilerBase):
             log.debug('macro: %s', macro)
             self._error(call.pos,
                     f'Invalid number of arguments; expected {len(macro.params)}')
+        self.stats['macro_expansions'] += 1
         yield Scope()
         for ii in range(len(call.args)):
             name = macro.params[ii]
@@ -93,5 +271,6 @@ class PreProcessor(CompilerBase):
                     yield y
 
     def parse(self, ctx_name):
-        return self._pre_process(self._parse(ctx_name))
+        ast = self._parse(ctx_name)
+        return chain(self._pre_process(self._command_line()), self._pre_process(ast))
 
@@ -6,6 +6,7 @@
 
 import io
 import sys
+from contextlib import contextmanager
 from colors import color
 from colors import STYLES
 
@@ -29,6 +30,31 @@ default_style = {
     'none': False,
 }
 
+# characters of output held by a buffered printer before it writes them out
+BUFFER_SIZE = 64 * 1024
+
+
+class BufferedWriter(object):
+    """Accumulates text, and writes it to a stream in large chunks."""
+
+    def __init__(self, stream, size=BUFFER_SIZE):
+        self.stream = stream
+        self.size = size
+        self.parts = []
+        self.length = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.length += len(text)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.stream.write(''.join(self.parts))
+            self.parts.clear()
+            self.length = 0
+
 
 class StylePrinterFn(object):
     """Function wrapper that also behaves like a context manager."""
@@ -48,10 +74,7 @@ class StylePrinterFn(object):
         The new printer uses the same settings as the wrapped printer, but the default style
         is set to the style that corresponds to the wrapped style name."""
 
-        p = StylePrinter(self.ctx.stream, self.ctx.stylesheet, self.ctx._get_style(self.style_name))
-        p._start_newline = self.ctx._start_newline
-        p.ansimode = self.ctx.ansimode
-        return p
+        return self.ctx._child(self.style_name)
 
     def __exit__(self, type, value, traceback):
         """Placeholder for context management; does nothing."""
@@ -74,6 +97,10 @@ class StylePrinter(object):
         The optional style_defaults argument specifies the baseline for all
         styles in use by the printer.
 
+        Each style is resolved once, on first use, into the text and escape
+        codes written before and after the styled text.  Assign a new
+        stylesheet, rather than changing it in place, to restyle a printer.
+
         All public methods return self, such that chained calls are possible.
 
         This class provides a __getattr__ override that behaves like a proxy for
@@ -82,16 +109,78 @@ class StylePrinter(object):
         with no style applied.
         """
 
+        self._styles = {}
+        self._children = {}
         self._start_newline = True
         self._style_defaults = style_defaults if style_defaults is not None else default_style
+        self._stream = stream if stream is not None else sys.stdout
+        self._writer = self._stream
         self.ansimode = ansimode
-        self.stream = stream if stream is not None else sys.stdout
         self.stylesheet = stylesheet if stylesheet is not None else {}
 
+    @property
+    def stream(self):
+        """The output stream.  Any buffered output is written to it first."""
+        self.flush()
+        return self._stream
+
+    @stream.setter
+    def stream(self, stream):
+        self.flush()
+        self._stream = self._writer = stream
+        self._children.clear()
+
+    @property
+    def ansimode(self):
+        return self._ansimode
+
+    @ansimode.setter
+    def ansimode(self, ansimode):
+        self._ansimode = ansimode
+        self._styles.clear()
+        self._children.clear()
+
+    @property
+    def stylesheet(self):
+        return self._stylesheet
+
+    @stylesheet.setter
+    def stylesheet(self, stylesheet):
+        self._stylesheet = stylesheet
+        self._styles.clear()
+        self._children.clear()
+
     def _get_style(self, style_name):
         """Gets the style for name, populated with defaults."""
         return dict(self._style_defaults, **self.stylesheet.get(style_name, {}))
 
+    def _compile_style(self, style_name):
+        """Resolves a style into (display, before, after, start, end), where
+        start and end are the ANSI escape codes around the text."""
+        style = self._get_style(style_name)
+        before = ('\n' * style['padding-top']) + style['before']
+        after = style['after'] + ('\n' * style['padding-bottom'])
+        start = end = ''
+        if self.ansimode:
+            # color() only wraps the text it is given
+            start, end = color('\0', fg=style['color'], bg=style['background'],
+                    style='+'.join([k for k in STYLES if style[k]])).split('\0')
+        compiled = self._styles[style_name] = (style['display'], before, after,
+                start, end)
+        return compiled
+
+    def _child(self, style_name):
+        """Returns a printer whose default style is style_name, and which
+        writes through this printer."""
+        child = self._children.get(style_name, None)
+        if child is None:
+            child = StylePrinter(self._stream, self.stylesheet,
+                    self._get_style(style_name), self.ansimode)
+            self._children[style_name] = child
+        child._writer = self._writer
+        child._start_newline = self._start_newline
+        return child
+
     def write(self, style_name, text, *args, **kwargs):
         """Writes formatted text to the configured stream, in a specified style.
 
@@ -100,30 +189,25 @@ class StylePrinter(object):
 
         If the indicated style is not in the stylesheet, default style formatting is applied.
         """
-        style = self._get_style(style_name)
+        style = self._styles.get(style_name, None)
+        if style is None:
+            style = self._compile_style(style_name)
+        display, before, after, start, end = style
 
         # handle display conditions for hidden, block, and start
-        display = style['display']
         if display == 'hidden':
-            return  # do nothing
-        elif display in ['block', 'start'] and not self._start_newline:
-            self.stream.write('\n')
+            return self  # do nothing
+        elif (display == 'block' or display == 'start') and not self._start_newline:
+            self._writer.write('\n')
 
         # emit the formatted text with padding and before/after style
         formatted_text = text.format(*args, **kwargs) if args or kwargs else text
-        text = ('\n' * style['padding-top']) + style['before'] + formatted_text + \
-            style['after'] + ('\n' * style['padding-bottom'])
-
-        # emit to stream with or without ansi formatting
-        if self.ansimode:
-            self.stream.write(color(text, fg=style['color'], bg=style['background'],
-                                    style='+'.join([k for k in STYLES if style[k]])))
-        else:
-            self.stream.write(text)
+        text = before + formatted_text + after
+        self._writer.write(start + text + end if start else text)
 
         # handle block condition and newline boolean
-        if display in ['block', 'end']:
-            self.stream.write('\n')
+        if display == 'block' or display == 'end':
+            self._writer.write('\n')
             self._start_newline = True
         else:
             self._start_newline = text.endswith('\n')
@@ -137,7 +221,7 @@ class StylePrinter(object):
 
     def newline(self):
         """Writes a newline to the configured stream."""
-        self.stream.write('\n')
+        self._writer.write('\n')
         self._start_newline = True
         return self
 
@@ -145,9 +229,34 @@ class StylePrinter(object):
         """Writes a newline to the configured stream."""
         return self.newline()
 
+    def flush(self):
+        """Writes any buffered output to the stream."""
+        if self._writer is not self._stream:
+            self._writer.flush()
+        return self
+
+    @contextmanager
+    def buffered(self, size=BUFFER_SIZE):
+        """Buffers output within the block, and writes it to the stream in
+        chunks of about size characters.  Nested blocks share the outer
+        buffer."""
+        if self._writer is not self._stream:
+            yield self
+            return
+        self._writer = BufferedWriter(self._stream, size)
+        try:
+            yield self
+        finally:
+            self._writer.flush()
+            self._writer = self._stream
+
     def __getattr__(self, style_name):
         """Returns write wrapper for the style indicated by the attribute name."""
-        return StylePrinterFn(self, style_name)
+        if style_name.startswith('_'):
+            raise AttributeError(style_name)
+        fn = StylePrinterFn(self, style_name)
+        self.__dict__[style_name] = fn
+        return fn
 
 
 class StringPrinter(object):
@@ -177,5 +286,3 @@ class StyleFormatter(object):
             kwargs.update(msg=record.msg % record.args)
         self.printer.writeln(record.levelname.lower(), self.format_str, **kwargs)
         return self.printer.str()
-
-
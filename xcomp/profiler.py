@@ -0,0 +1,260 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Per-phase timing and counters for the compile pipeline.
+
+A Profiler instruments a single Compiler by replacing methods on the
+compiler, its evaluator, pre-processor and parser instances with timing
+wrappers.  Classes are never modified, so compiles that are not profiled run
+exactly the same code as before and pay nothing for the facility.
+
+Phases nest: time spent in an inner phase is subtracted from the "self" time
+of the phase around it, so the self times add up to the profiled wall time.
+A phase that calls itself recursively, like the parse tree visitor or the
+evaluator, is timed once at the outermost call and counted on every call.
+
+With tracing enabled, the profiler also records spans in the Chrome Trace
+Event format, which chrome://tracing, Perfetto and speedscope can load.
+Spans are recorded for building the grammar, parsing and reducing each file,
+each included file and macro expansion, compilation, each fixup pass and
+writing output.  Included files and macro expansions are streamed, so their
+spans cover the compilation of their contents too.
+"""
+
+import os
+import time
+import json
+import threading
+import logging
+from functools import wraps
+from attr import attrs
+from typing import *
+
+log = logging.getLogger(__name__)
+
+
+@attrs(auto_attribs=True)
+class PhaseStats(object):
+    calls: int = 0
+    total: float = 0.0
+    own: float = 0.0
+
+
+class Profiler(object):
+    def __init__(self, clock=time.perf_counter, trace=False):
+        self.clock = clock
+        self.phases = {}
+        self.counters = {}
+        self.events = [] if trace else None
+        self.compiler = None
+        self._stack = []
+        self._instrumented = set()
+        self._created = clock()
+
+    def start(self, name, label=None):
+        self._stack.append([name, self.clock(), 0.0, label])
+
+    def stop(self, span=True):
+        name, start, child, label = self._stack.pop()
+        end = self.clock()
+        elapsed = end - start
+        if span and self.events is not None:
+            self.add_span(name, start, end, label)
+        stats = self.phases.get(name, None)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats()
+        stats.calls += 1
+        stats.total += elapsed
+        stats.own += elapsed - child
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def add_span(self, name, start, end, label=None):
+        """Records a trace event for a span from start to end."""
+        event = {
+            'name': f'{name} {label}' if label else name,
+            'cat': name,
+            'ph': 'X',
+            'ts': (start - self._created) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        if label:
+            event['args'] = {'label': label}
+        self.events.append(event)
+
+    def phase(self, name, label=None):
+        """Returns a context manager that times a block as phase name."""
+        profiler = self
+
+        class PhaseContext(object):
+            def __enter__(self):
+                profiler.start(name, label)
+
+            def __exit__(self, type, value, traceback):
+                profiler.stop()
+
+        return PhaseContext()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def wrap(self, fn, name, counter=None, span=False, label=None):
+        """Returns fn wrapped to be timed as phase name, and counted.
+
+        If span is set, each outermost call is also traced, labelled with
+        the result of calling label with the call's arguments."""
+
+        stack = self._stack
+
+        @wraps(fn)
+        def impl(*args, **kwargs):
+            if counter:
+                self.count(counter)
+            if stack and stack[-1][0] == name:
+                return fn(*args, **kwargs)
+            self.start(name, label(*args, **kwargs) if span and label else None)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.stop(span)
+        return impl
+
+    def wrap_iter(self, iterable, name, counter=None):
+        """Times each step of iterable as phase name, counting the items."""
+        it = iter(iterable)
+        while True:
+            self.start(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.stop(False)
+            if counter:
+                self.count(counter)
+            yield item
+
+    def span_iter(self, iterable, name, label=None):
+        """Traces a span from the first step of iterable to its last.
+
+        The span is not timed as a phase, as the steps of the iterable are
+        interleaved with the work of whatever consumes it."""
+
+        start = self.clock()
+        try:
+            yield from iterable
+        finally:
+            self.add_span(name, start, self.clock(), label)
+
+    def instrument(self, obj, method, name, counter=None, span=False, label=None):
+        if (id(obj), method) in self._instrumented:
+            return
+        self._instrumented.add((id(obj), method))
+        setattr(obj, method, self.wrap(getattr(obj, method), name, counter,
+                span, label))
+
+    def instrument_compiler(self, compiler):
+        """Instruments compiler, and the pipeline it builds, for profiling.
+
+        The compiler's AstCache is instrumented too, so it should not be
+        shared with compiles that are not being profiled."""
+
+        from .parser import Parser
+        from .preprocessor import AstCache
+        self.compiler = compiler
+        if compiler.ast_cache is None:
+            compiler.ast_cache = AstCache()
+        if not compiler.ast_cache.parser:
+            with self.phase('grammar'):
+                compiler.ast_cache.parser = Parser()
+        parser = compiler.ast_cache.parser
+        self.instrument(parser, 'parse', 'parse', 'files_parsed', True,
+                lambda text, pos=0, context=None, rule=None: context)
+        self.instrument(parser, 'visit', 'reduce', 'nodes_visited', True,
+                lambda node: parser.context)
+
+        compile_fn = compiler.compile
+
+        @wraps(compile_fn)
+        def compile(ast, *args, **kwargs):
+            if self.events is not None:
+                self.instrument_preprocessor(compiler.preprocessor)
+            self.start('compile')
+            try:
+                return compile_fn(self.wrap_iter(ast, 'preprocess', 'ast_nodes'),
+                        *args, **kwargs)
+            finally:
+                self.stop()
+
+        compiler.compile = compile
+        self.instrument(compiler, 'resolve_fixups', 'fixup', span=True,
+                label=lambda *args, **kwargs: f'{len(compiler.fixups)} pending')
+        self.instrument(compiler.eval, 'eval', 'eval', 'evals')
+
+    def instrument_preprocessor(self, preprocessor):
+        """Traces included files and macro expansions as spans."""
+        from .model import Include
+        from .model import MacroCall
+        process_fn = preprocessor._process
+
+        def process(item):
+            values = process_fn(item)
+            if values is not None:
+                if isinstance(item, Include):
+                    return self.span_iter(values, 'include', item.filename)
+                if isinstance(item, MacroCall):
+                    return self.span_iter(values, 'macro', item.name)
+            return values
+
+        preprocessor._process = process
+
+    def report(self):
+        """Returns a dict of phase timings and counters."""
+        counters = dict(self.counters)
+        compiler = self.compiler
+        if compiler:
+            counters.update(compiler.stats)
+            preprocessor = getattr(compiler, 'preprocessor', None)
+            if preprocessor:
+                counters.update(preprocessor.stats)
+            counters['bytes_emitted'] = sum(seg._end - seg._start
+                    for seg in compiler.segments.values()
+                    if seg._start is not None and seg._end is not None)
+        return {
+            'elapsed': self.clock() - self._created,
+            'phases': {name: {
+                'calls': stats.calls,
+                'total': stats.total,
+                'self': stats.own,
+            } for name, stats in self.phases.items()},
+            'counters': counters,
+        }
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def save_trace(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({
+                'traceEvents': self.events or [],
+                'displayTimeUnit': 'ms',
+            }, f)
+
+
+def print_report(printer, report):
+    printer.title('Profile').nl()
+    printer.bold(f'  {"phase":12} {"calls":>10} {"total ms":>10} {"self ms":>10}').nl()
+    phases = sorted(report['phases'].items(), key=lambda x: -x[1]['self'])
+    for name, stats in phases:
+        printer.text(f'  {name:12} {stats["calls"]:10}'
+                f' {stats["total"] * 1000:10.1f} {stats["self"] * 1000:10.1f}').nl()
+    printer.bold(f'  {"elapsed":12} {"":10} {report["elapsed"] * 1000:10.1f}').nl()
+    printer.nl()
+    printer.title('Counters').nl()
+    for name, value in report['counters'].items():
+        printer.text(f'  {name:22} {value:10}').nl()
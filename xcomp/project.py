@@ -0,0 +1,169 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Project builds: many targets compiled from one manifest.
+
+A manifest is a JSON file with the following layout.  Paths are relative to
+the directory holding the manifest.
+
+    {
+        "include": ["src", "lib"],
+        "cache_dir": ".xcomp-cache",
+        "targets": {
+            "game": {
+                "source": "game.asm",
+                "output": "build/game.prg",
+                "out_format": "prg",
+                "segments": ["data", "text"],
+                "mapfile": "build/game.map",
+                "include": ["game"]
+            }
+        }
+    }
+
+Targets are compiled in a pool of worker processes.  Each worker builds the
+grammar once and keeps an AstCache, so include files shared between the
+targets it compiles are only parsed once.  Targets whose inputs hash the same
+as a previous build are restored from the build cache, and output files are
+only rewritten when their contents change.
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from attr import attrs
+from attr import Factory
+from typing import *
+from .compiler_base import FileContextManager
+from .compiler import Compiler
+from .preprocessor import AstCache
+from .parser import Parser
+from .cache import BuildCache
+from .output import get_binary
+from .output import get_mapfile
+from .output import write_file
+from .settings import module_path
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST = 'xcomp.json'
+DEFAULT_CACHE_DIR = '.xcomp-cache'
+
+
+class ProjectException(Exception):
+    pass
+
+
+@attrs(auto_attribs=True)
+class Target(object):
+    name: str
+    source: str
+    output: str
+    include: List[str] = Factory(list)
+    segments: List[str] = Factory(list)
+    out_format: str = 'raw'
+    mapfile: str = None
+
+
+@attrs(auto_attribs=True)
+class TargetResult(object):
+    name: str
+    status: str
+    elapsed: float
+    error: str = None
+
+
+# per-process state for build workers
+_worker_ast_cache = None
+
+
+def _init_worker():
+    global _worker_ast_cache
+    _worker_ast_cache = AstCache()
+    _worker_ast_cache.parser = Parser()
+
+
+def build_target(target, cache_dir=None):
+    """Builds a single target and returns a TargetResult."""
+    if _worker_ast_cache is None:
+        _init_worker()
+    start = time.perf_counter()
+    try:
+        cache = BuildCache(cache_dir) if cache_dir else None
+        ctx_manager = FileContextManager(target.include)
+        compiler = Compiler(ctx_manager, _worker_ast_cache)
+        compiler.compile_file(target.source, cache=cache)
+
+        for filename in [target.output, target.mapfile]:
+            if filename:
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+        written = write_file(target.output,
+                get_binary(compiler, target.segments, target.out_format))
+        if target.mapfile:
+            written = write_file(target.mapfile, get_mapfile(compiler)) or written
+
+        if cache and cache.hits:
+            status = 'cached' if written else 'up to date'
+        else:
+            status = 'built'
+        return TargetResult(target.name, status, time.perf_counter() - start)
+    except Exception as e:
+        log.debug('target %s failed', target.name, exc_info=True)
+        return TargetResult(target.name, 'failed',
+                time.perf_counter() - start, str(e))
+
+
+class Project(object):
+    def __init__(self, filename=DEFAULT_MANIFEST):
+        self.filename = filename
+        self.path = os.path.dirname(os.path.abspath(filename))
+        try:
+            with open(filename) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ProjectException(f'Cannot load project "{filename}": {e}')
+
+        include = [self._path(x) for x in manifest.get('include', [])]
+        self.cache_dir = self._path(manifest.get('cache_dir', DEFAULT_CACHE_DIR))
+        self.targets = {}
+        for name, spec in manifest.get('targets', {}).items():
+            if 'source' not in spec:
+                raise ProjectException(f'Target "{name}" has no source')
+            self.targets[name] = Target(name,
+                    source=self._path(spec['source']),
+                    output=self._path(spec.get('output', f'{name}.bin')),
+                    include=[self._path(x) for x in spec.get('include', [])] +
+                        include + [self.path, module_path],
+                    segments=spec.get('segments', []),
+                    out_format=spec.get('out_format', 'raw'),
+                    mapfile=self._path(spec['mapfile']) if 'mapfile' in spec else None)
+
+    def _path(self, path):
+        return os.path.join(self.path, os.path.expanduser(path))
+
+    def build(self, names=None, jobs=None, use_cache=True):
+        """Builds the named targets, or all targets, yielding a TargetResult
+        for each in order."""
+
+        names = names or list(self.targets.keys())
+        for name in names:
+            if name not in self.targets:
+                raise ProjectException(f'Unknown target "{name}"')
+        targets = [self.targets[x] for x in names]
+        cache_dir = self.cache_dir if use_cache else None
+
+        if jobs == 1 or len(targets) == 1:
+            for target in targets:
+                yield build_target(target, cache_dir)
+            return
+
+        with ProcessPoolExecutor(max_workers=jobs,
+                initializer=_init_worker) as executor:
+            futures = [executor.submit(build_target, x, cache_dir)
+                    for x in targets]
+            for future in futures:
+                yield future.result()
@@ -87,6 +87,8 @@ class ReduceParser(object):
 
         self.grammar = Grammar(grammar)
         self.grammar.unwrapped_exceptions = unwrapped_exceptions or []
+        self._trace = log.isEnabledFor(logging.DEBUG)
+        self._ignored = {}
 
     def error(self, line, column, context, msg):
         ''' Raises an exeption around the provided arguments. '''
@@ -122,6 +124,8 @@ class ReduceParser(object):
         '''
 
         self.context = context or '<internal>'
+        # trace logging is checked once per parse; visit() only tests the flag
+        self._trace = log.isEnabledFor(logging.DEBUG)
         parser = self.grammar if not rule else self.grammar[rule]
         try:
             return self.visit(parser.parse(text, pos))
@@ -137,14 +141,20 @@ class ReduceParser(object):
         Any rule named __ignored in the grammer is used to conduct
         this test.  The provided name is passed to this special rule
         as the text to parse.  The function returns True if that parse
-        is a success, and False if not.
+        is a success, and False if not.  Results are cached per name.
         '''
 
+        try:
+            return self._ignored[name]
+        except KeyError:
+            pass
         try:
             self.grammar['__ignored'].parse(name)
-            return True
+            ignored = True
         except:
-            return False
+            ignored = False
+        self._ignored[name] = ignored
+        return ignored
 
     def visit(self, node):
         '''
@@ -164,8 +174,9 @@ class ReduceParser(object):
         if not isinstance(node, Node):
             return node
 
-        log.debug('ReduceParser(dbg): %s type: %s, text: %s, children: %s',
-                node.expr_name, type(node.expr), node.text, len(node.children))
+        if self._trace:
+            log.debug('ReduceParser(dbg): %s type: %s, text: %s, children: %s',
+                    node.expr_name, type(node.expr), node.text, len(node.children))
         values = TokenList()
         if isinstance(node.expr, (expressions.Regex, expressions.Literal)):
             values.append(Token.fromNode(node, context=self.context))
@@ -180,8 +191,9 @@ class ReduceParser(object):
                     else:
                         values.append(n)
         fn = getattr(self, f'visit_{node.expr_name}', None)
-        log.debug('ReduceParser(dbg): FN visit_%s == %s(%s)', node.expr_name,
-                fn, values)
+        if self._trace:
+            log.debug('ReduceParser(dbg): FN visit_%s == %s(%s)', node.expr_name,
+                    fn, values)
         if fn:
             return fn(Pos.fromNode(node, context=self.context), *values)
         else:
@@ -0,0 +1,142 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+Persistent compile server over a local Unix domain socket.
+
+The server keeps the grammar, parsed ASTs and file contents warm between
+requests.  Each request carries the command line and working directory of a
+client, and is run in its own thread by a fresh Application whose output is
+captured and sent back.  Shared state is limited to the AstCache and the
+FileStore, both of which are safe to use from several threads.  ASTs of
+files that change on disk are dropped from the AstCache, so it does not
+grow with every edit.  Log levels are per request, and each request's log
+records are sent back with its output.
+
+The socket is only usable by the user that started the server, and
+clients refuse to use a socket owned by anyone else, or open to them.
+
+The protocol is one JSON object per line: the client sends
+{"argv": [...], "cwd": "...", "ansimode": bool, "defaults": {...}} and the
+server replies with {"output": "...", "result": bool}.  The defaults are the
+client's command-line defaults, as set by its XCOMP_* environment, which are
+used in place of the server's own.
+"""
+
+import os
+import io
+import json
+import logging
+import threading
+import socketserver
+from .compiler_base import FileContextManager
+from .preprocessor import AstCache
+from .watch import Watcher
+from .client import is_running
+
+log = logging.getLogger(__name__)
+
+
+class FileStore(object):
+    '''File contents shared between requests that use the same include paths.
+
+       Requests check out a session of a shared FileContextManager, after
+       any files that changed on disk have been dropped from it, and from
+       the ast_cache if one is given, and check it back in afterwards so
+       that the files it read are watched.
+    '''
+
+    def __init__(self, include_paths, ast_cache=None):
+        self.lock = threading.Lock()
+        self.ctx_manager = FileContextManager(list(include_paths), validate=True)
+        self.watcher = Watcher(self.ctx_manager)
+        self.ast_cache = ast_cache
+
+    def checkout(self):
+        with self.lock:
+            for filename in self.watcher.changed():
+                self.ctx_manager.invalidate(filename)
+                if self.ast_cache is not None:
+                    self.ast_cache.invalidate(filename)
+                del self.watcher.mtimes[filename]
+            return self.ctx_manager.session()
+
+    def checkin(self, ctx_manager):
+        with self.lock:
+            for filename in ctx_manager.dependencies:
+                if filename not in self.watcher.mtimes:
+                    # use the state the file had when it was read, so that
+                    # a change made since is still picked up
+                    state = ctx_manager.stats.get(filename, None)
+                    self.watcher.mtimes[filename] = state or \
+                            self.watcher.stat(filename)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        from .cli import Application
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        server = self.server
+        stream = io.StringIO()
+        stores = []
+
+        def ctx_factory(include_paths):
+            store = server.get_store(include_paths)
+            ctx_manager = store.checkout()
+            stores.append((store, ctx_manager))
+            return ctx_manager
+
+        app = Application(cwd=request.get('cwd'), stream=stream,
+                ansimode=request.get('ansimode', False),
+                defaults=request.get('defaults', None),
+                ast_cache=server.ast_cache, ctx_factory=ctx_factory)
+        try:
+            result = app.run(request.get('argv', []))
+        except SystemExit as e:
+            result = e.code == 0
+        for store, ctx_manager in stores:
+            store.checkin(ctx_manager)
+        response = {'output': stream.getvalue(), 'result': result is not False}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            if is_running(path):
+                raise Exception(f'A server is already listening on {path}')
+            os.unlink(path)
+        super().__init__(path, RequestHandler)
+        self.path = path
+        self.ast_cache = AstCache()
+        self.stores = {}
+        self.lock = threading.Lock()
+
+    def server_bind(self):
+        # the socket is created with mode 0600, as clients only connect to a
+        # socket that no other user can use
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def get_store(self, include_paths):
+        key = tuple(include_paths)
+        with self.lock:
+            if key not in self.stores:
+                self.stores[key] = FileStore(key, self.ast_cache)
+            return self.stores[key]
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -4,6 +4,7 @@
 
 import os
 import shlex
+import tempfile
 from .utils import to_bool
 from .utils import is_piped
 
@@ -50,6 +51,12 @@ cli_defaults = {
     'output': os.environ.get('XCOMP_OUTPUT', './out.bin'),
     'out_format': os.environ.get('XCOMP_OUT_FORMAT', 'raw'),
     'mapfile': os.environ.get('XCOMP_MAPFILE', ''),
+    'cache_dir': os.environ.get('XCOMP_CACHE_DIR', ''),
+    'cache_size': int(os.environ.get('XCOMP_CACHE_SIZE', 64 * 1024 * 1024)),
+    'index_dir': os.environ.get('XCOMP_INDEX_DIR', ''),
+    'project': os.environ.get('XCOMP_PROJECT', 'xcomp.json'),
+    'socket': os.environ.get('XCOMP_SERVER',
+        os.path.join(tempfile.gettempdir(), f'xcomp-{getattr(os, "getuid", lambda: 0)()}.sock')),
 }
 
 # style for diff output
@@ -57,5 +64,6 @@ diff_style = {
     '-': 'removed',
     '+': 'added',
     '?': 'missing',
+    '@': 'missing',
     ' ': 'common',
 }
@@ -3,8 +3,10 @@
 # Published under the BSD license.  See LICENSE For details.
 
 import os
+import sys
 import stat
-from inspect import signature
+import codecs
+import functools
 
 
 def to_bool(value):
@@ -35,6 +37,36 @@ def is8bit(value):
     return lobyte(value) == value
 
 
+def parse_address(text):
+    ''' Parses a 16 bit address written as $FFFF, 0xFFFF or decimal. '''
+    try:
+        if text.startswith('$'):
+            value = int(text[1:], 16)
+        else:
+            value = int(text, 0)
+    except ValueError:
+        raise ValueError(f'invalid address: {text}')
+    if not 0 <= value <= 0xFFFF:
+        raise ValueError(f'address out of range: {text}')
+    return value
+
+
+class HexBytes(object):
+    ''' Formats a byte sequence as hex when converted to a string.
+
+    Use as a logging argument so the formatting is only done if the record
+    is emitted.
+    '''
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return ' '.join([f'{x:x}' for x in self.value])
+
+
 def stringbytes(value, encoding):
     return list([x for x in bytes(value, encoding)])
 
@@ -48,6 +80,8 @@ def mapped_args(fn):
     Function wrapper that only passes kwargs that map to the wrapped function.
     '''
 
+    from inspect import signature
+
     def impl(**kwargs):
         fn_kwargs={}
         for k in signature(fn).parameters:
@@ -66,30 +100,62 @@ def fixture(name, handler):
     return wrapper
 
 
-def print_hex(printer, data, start=0, end=0xFFFF, stride=16):
-    for line_start in range(start, end, stride):
-        line_end = min(line_start + stride, end)
-        line = data[line_start:line_end]
-
-        byte_str = ' '.join([f'{x:02X}' for x in line])
-        byte_str += ' '  * ((stride * 3) - len(byte_str))
-
-        #encoding = 'petscii-c64en-uc'
-        #print(type(line), len(line))
-        #print('firstchar', bytes(line[0]))
-        #linechars = []
-        #for ii in range(len(line)):
-        #    ch = line[ii]
-        #    print('ch', ii, ch, bytes([ch]))
-        #    try:
-        #        linechars.append(bytes([ch]).decode('utf-8')) #.encode('utf-8'))
-        #    except:
-        #        linechars.append('.')
-        #print('linechars', linechars) #.encode('utf-8'))
-
-        utf_filter = lambda ch: chr(ch) if ch > 32 else '.'
-        #text = ''.join(map(utf_filter, line))
-        text = ''
-        printer.text(f'{line_start:04X}  {byte_str} {text}').nl()
-
-
+# character sets for the text column of a hex dump
+hex_charsets = ['ascii', 'petscii-c64en-uc', 'petscii-c64en-lc', 'screencode-c64-uc',
+        'screencode-c64-lc']
+
+
+@functools.lru_cache()
+def hex_table(charset='ascii'):
+    ''' Returns a 256 character string that maps each byte value to its
+        character in the text column of a hex dump. '''
+    if charset == 'ascii':
+        return ''.join(chr(x) if 0x20 <= x < 0x7F else '.' for x in range(256))
+    try:
+        info = codecs.lookup(charset)
+    except LookupError:
+        # the cbmcodecs search function can miss names that Python has
+        # normalized, so fall back to its own registry
+        import cbmcodecs
+        info = cbmcodecs.petscii_codecs.get(charset, None)
+        if info is None:
+            raise Exception(f'Unknown character set "{charset}"')
+    table = []
+    for x in range(256):
+        try:
+            ch = info.decode(bytes([x]))[0]
+        except UnicodeError:
+            ch = ''
+        table.append(ch if len(ch) == 1 and ch.isprintable() else '.')
+    return ''.join(table)
+
+
+def format_hex(data, start=0, end=0xFFFF, stride=16, charset='ascii', collapse=True):
+    ''' Returns the lines of a hex dump of data[start:end].
+
+        The whole range is converted at once, then sliced into lines.  If
+        collapse is set, runs of lines identical to the one before are shown
+        as a single '*'; the last line is always shown. '''
+    block = memoryview(data)[start:end]
+    digits = block.hex(' ').upper() + ' '
+    text = str(block, 'latin-1').translate(hex_table(charset))
+    width = stride * 3
+    count = len(block)
+    lines = []
+    previous = None
+    for offset in range(0, count, stride):
+        row = digits[offset * 3:(offset + stride) * 3]
+        if collapse and row == previous and offset + stride < count:
+            if lines[-1] != '*':
+                lines.append('*')
+            continue
+        previous = row
+        lines.append(f'{start + offset:04X}  {row:{width}} {text[offset:offset + stride]}')
+    return lines
+
+
+def print_hex(printer, data, start=0, end=0xFFFF, stride=16, charset='ascii',
+        collapse=True):
+    lines = format_hex(data, start, end, stride, charset, collapse)
+    if lines:
+        printer.text('\n'.join(lines) + '\n')
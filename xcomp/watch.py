@@ -0,0 +1,66 @@
+# Copyright (c) 2020, Eric Anderton
+# All rights reserved.
+# Published under the BSD license.  See LICENSE For details.
+
+"""
+File watching for rebuild-on-save workflows.
+
+The include closure of a compile is taken from the dependencies recorded by
+the FileContextManager, so only files that were actually read are watched.
+Files are polled with os.stat, which works on every platform and filesystem
+and is cheap for the few dozen files a program typically includes.
+"""
+
+import os
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Watcher(object):
+    def __init__(self, ctx_manager, interval=0.1):
+        self.ctx_manager = ctx_manager
+        self.interval = interval
+        self.mtimes = {}
+
+    def stat(self, filename):
+        """Returns a tuple that changes whenever filename is modified."""
+        full_filename = self.ctx_manager.search_file(filename)
+        if not full_filename:
+            return None
+        try:
+            st = os.stat(full_filename)
+        except OSError:
+            return None
+        return (full_filename, st.st_mtime_ns, st.st_size)
+
+    def snapshot(self):
+        """Returns the current state of every file in the include closure."""
+        return {x: self.stat(x) for x in self.ctx_manager.dependencies}
+
+    def update(self, before=None):
+        """Records the current state of every file in the include closure.
+
+        States in before, a snapshot taken ahead of a compile, are kept for
+        the files they cover, so that a file saved during the compile is
+        still seen as changed.
+        """
+        mtimes = self.snapshot()
+        if before:
+            mtimes.update((k, v) for k, v in before.items() if k in mtimes)
+        self.mtimes = mtimes
+
+    def changed(self):
+        """Returns the names of files that changed since the last update."""
+        return [name for name, state in self.mtimes.items()
+                if self.stat(name) != state]
+
+    def wait(self):
+        """Blocks until a watched file changes, and returns the changed names."""
+        while True:
+            changed = self.changed()
+            if changed:
+                log.debug('changed: %s', changed)
+                return changed
+            time.sleep(self.interval)